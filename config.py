@@ -1,4 +1,152 @@
+import os
+
+from botocore.config import Config as BotocoreConfig
 from strands.models import BedrockModel
 
 MODEL_ID = "us.anthropic.claude-sonnet-4-20250514-v1:0"
-MODEL = BedrockModel(model_id=MODEL_ID)
\ No newline at end of file
+
+# Proveedor del modelo: "bedrock" (AWS) o "mock" (servidor local que imita la API Converse
+# de Bedrock, ver demo-agentcore/benchmarks/modelo_mock.py) para pruebas de carga sin
+# credenciales ni consumo de tokens
+MODEL_PROVIDER = os.environ.get("MODEL_PROVIDER", "bedrock")
+MODEL_ENDPOINT_URL = os.environ.get("MODEL_ENDPOINT_URL", "http://localhost:8089")
+
+# Cliente de Bedrock: el read_timeout corta una llamada cuyo stream deja de enviar datos y
+# botocore no reintenta (los reintentos ante throttling los hace solo
+# demo-agentcore/utils/resiliencia_utils.py)
+MODEL_READ_TIMEOUT_SEGUNDOS = 45
+MODEL_BOTO_CONFIG = BotocoreConfig(
+    connect_timeout=5,
+    read_timeout=MODEL_READ_TIMEOUT_SEGUNDOS,
+    retries={"max_attempts": 1, "mode": "standard"}
+)
+
+if MODEL_PROVIDER == "mock":
+    import boto3
+
+    # El servidor mock no valida la firma: credenciales ficticias para que boto3 firme
+    MODEL = BedrockModel(
+        model_id=MODEL_ID,
+        endpoint_url=MODEL_ENDPOINT_URL,
+        boto_client_config=MODEL_BOTO_CONFIG,
+        boto_session=boto3.Session(aws_access_key_id="mock", aws_secret_access_key="mock", region_name="us-east-1")
+    )
+elif MODEL_PROVIDER == "bedrock":
+    MODEL = BedrockModel(model_id=MODEL_ID, boto_client_config=MODEL_BOTO_CONFIG)
+else:
+    raise ValueError(f"MODEL_PROVIDER desconocido: {MODEL_PROVIDER}")
+
+# Resolver con reglas en código las rutas inequívocas (sin llamar al orquestador)
+ROUTING_DETERMINISTA = True
+
+# Ejecutar el agente de buró en paralelo con financiero + scoring
+BURO_CONCURRENTE = True
+BURO_MAX_WORKERS = 8  # mínimo: el pool se amplía a CONCURRENCIA_MAX_SOLICITUDES
+
+# Pool de agentes: por defecto una instancia nueva por invocación (historial vacío).
+# Con AGENTES_POR_USUARIO cada user_id conserva una ventana acotada de mensajes.
+AGENTES_POR_USUARIO = False
+MAX_SESIONES_AGENTES = 256
+VENTANA_MENSAJES_AGENTE = 10
+
+# Cache de respuestas (TTL + LRU) para agentes con input determinado por datos estáticos.
+# Solo aplica con instancias por invocación (sin historial de sesión).
+CACHE_RESPUESTAS = True
+CACHE_BACKEND = "memoria"  # "memoria" o "sqlite"
+CACHE_RUTA_SQLITE = "/tmp/creditbot_cache.sqlite"
+CACHE_TTL_SEGUNDOS = 3600
+CACHE_MAX_ENTRADAS = 1024
+AGENTES_CACHEABLES = ("buro", "verificador", "financiero")
+
+# La oferta se calcula y redacta en código; el agente ofertador solo pule la redacción si se activa
+OFERTADOR_LLM = False
+
+# Resúmenes de rechazo / datos insuficientes con plantillas; el orquestador solo redacta si se activa
+RESUMEN_LLM = False
+
+# Prompts de análisis documental compactos: JSON minificado, tablas en markdown/CSV,
+# sin texto ya presente en las tablas y con presupuesto de tokens por sección
+PROMPT_COMPACTO = True
+FORMATO_TABLAS_PROMPT = "markdown"  # "markdown", "csv" o "json"
+PRESUPUESTO_TOKENS_TEXTO = 3000
+PRESUPUESTO_TOKENS_TABLAS = 6000
+PRESUPUESTO_TOKENS_DATOS = 3000
+REPORTE_COMPACTACION = True
+
+# Almacén de clientes y reportes de buró: "fixture" (dicts de la demo) o "sqlite"
+# (indexado por NIT; se siembra con la demo si está vacío y admite carga masiva CSV/JSONL)
+ALMACEN_BACKEND = os.environ.get("ALMACEN_BACKEND", "fixture")
+ALMACEN_RUTA_SQLITE = os.environ.get("ALMACEN_RUTA_SQLITE", "/tmp/creditbot_datos.sqlite")
+
+# Memo de consultar_cliente: por solicitud y LRU de proceso (invalidado al cambiar el almacén)
+CACHE_CLIENTES_MAX = 4096
+
+# Rechazar NITs cuyo dígito de verificación DIAN no corresponde (los NITs de la demo
+# no tienen DV válido, por eso viene desactivado: solo se registra una advertencia)
+VALIDAR_DIGITO_VERIFICACION = os.environ.get("VALIDAR_DIGITO_VERIFICACION", "false").lower() == "true"
+
+# Salida estructurada (tool use con esquema pydantic) para los agentes que responden JSON;
+# si el modelo no la soporta o falla, se vuelve a la respuesta en texto + parse_json
+SALIDA_ESTRUCTURADA = True
+AGENTES_SALIDA_ESTRUCTURADA = ("orquestador", "financiero", "scoring", "buro")
+
+# Resiliencia de las llamadas al modelo: deadline por agente (segundos), reintentos con
+# backoff exponencial + jitter ante throttling y circuit breaker por agente
+TIMEOUT_AGENTES = {
+    "orquestador": 20,
+    "verificador": 20,
+    "conversacional": 20,
+    "ofertador": 20,
+    "financiero": 45,
+    "scoring": 45,
+    "buro": 30
+}
+TIMEOUT_AGENTE_DEFECTO = 30
+REINTENTOS_MAX = 3
+BACKOFF_BASE_SEGUNDOS = 0.5
+BACKOFF_MAX_SEGUNDOS = 8
+CIRCUITO_UMBRAL_FALLOS = 5
+CIRCUITO_ENFRIAMIENTO_SEGUNDOS = 30
+LLAMADAS_MODELO_MAX_WORKERS = 128
+
+# Presupuesto de latencia por solicitud: cuando queda menos del margen, las etapas
+# opcionales (pulido de oferta, resumen con LLM) usan la versión en código
+PRESUPUESTO_SOLICITUD_SEGUNDOS = 90
+MARGEN_ETAPAS_OPCIONALES_SEGUNDOS = 15
+
+# Solicitudes en curso por proceso: límite de hilos de anyio para el entrypoint síncrono
+# (40 por defecto); las que lo superan esperan turno
+CONCURRENCIA_MAX_SOLICITUDES = 64
+
+# Estado de conversación en el servidor (payloads con "session_token"): "memoria" o "sqlite"
+SESIONES_BACKEND = os.environ.get("SESIONES_BACKEND", "memoria")
+SESIONES_RUTA_SQLITE = os.environ.get("SESIONES_RUTA_SQLITE", "/tmp/creditbot_sesiones.sqlite")
+SESIONES_TTL_SEGUNDOS = 86400
+SESIONES_MAX = 10000
+
+# Historial de conversación medido en tokens: ventana guardada, porción del prompt
+# conversacional y resumen acumulado de los mensajes desalojados
+HISTORIAL_PRESUPUESTO_TOKENS = 1500
+HISTORIAL_PROMPT_TOKENS = 600
+RESUMEN_HISTORIAL_TOKENS = 250
+MENSAJE_RESUMEN_TOKENS = 40
+
+# Telemetría: spans de OpenTelemetry por agente y flujo (si el paquete está instalado;
+# el contenedor corre bajo opentelemetry-instrument) e histogramas de latencia en proceso
+TELEMETRIA_OTEL = True
+TELEMETRIA_MUESTRAS = 2048
+
+# Logging estructurado: nivel (DEBUG, INFO, WARNING, ERROR), formato "json" o "texto",
+# fracción de solicitudes que conservan sus logs DEBUG, redacción de NITs y escritura
+# en un hilo aparte para no bloquear la solicitud
+LOG_NIVEL = os.environ.get("LOG_NIVEL", "INFO").upper()
+LOG_FORMATO = os.environ.get("LOG_FORMATO", "json")
+LOG_MUESTREO_DEBUG = 0.1
+LOG_REDACTAR_PII = True
+LOG_ASINCRONO = True
+
+# Reevaluación masiva de cartera (reevaluacion_cartera.py): workers en paralelo, NITs
+# en vuelo por worker y cada cuántos resultados se fuerza la escritura a disco
+CARTERA_MAX_WORKERS = 16
+CARTERA_PENDIENTES_POR_WORKER = 2
+CARTERA_FSYNC_CADA = 50
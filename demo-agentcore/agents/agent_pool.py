@@ -0,0 +1,300 @@
+# agents/agent_pool.py
+# Pool de instancias de agentes: historial aislado por invocación o por usuario
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+
+from config import (
+    AGENTES_POR_USUARIO,
+    MAX_SESIONES_AGENTES,
+    VENTANA_MENSAJES_AGENTE,
+    CACHE_RESPUESTAS,
+    CACHE_BACKEND,
+    CACHE_RUTA_SQLITE,
+    CACHE_TTL_SEGUNDOS,
+    CACHE_MAX_ENTRADAS,
+    AGENTES_CACHEABLES,
+    SALIDA_ESTRUCTURADA,
+    AGENTES_SALIDA_ESTRUCTURADA
+)
+from utils.main_utils import parse_json
+from utils.cache_utils import CacheMemoria, CacheSQLite, configurar_cache, consultar_con_cache
+from utils.resiliencia_utils import invocar_resiliente, callback_con_abandono, es_falla_servicio, TiempoAgotadoError, CircuitoAbiertoError
+from utils.historial_utils import registrar_llamada_modelo
+from utils.prompt_utils import estimar_tokens
+from utils.telemetria_utils import medir_etapa, anotar_etapa
+from utils.log_utils import obtener_logger
+from utils.streaming_utils import streaming_activo, crear_callback_tokens, emitir_evento
+from agents.orquestador import crear_orquestador, DecisionOrquestador
+from agents.financiero import crear_financiero, SalidaFinanciero
+from agents.scoring import crear_scoring, SalidaScoring
+from agents.buro import crear_buro, SalidaBuro
+from agents.ofertador import crear_ofertador
+from agents.verificador import crear_verificador
+from agents.conversacional import crear_conversacional
+
+logger = obtener_logger(__name__)
+
+FABRICAS_AGENTES = {
+    "orquestador": crear_orquestador,
+    "financiero": crear_financiero,
+    "scoring": crear_scoring,
+    "buro": crear_buro,
+    "ofertador": crear_ofertador,
+    "verificador": crear_verificador,
+    "conversacional": crear_conversacional
+}
+
+# Esquema pydantic de los agentes que responden JSON
+MODELOS_SALIDA = {
+    "orquestador": DecisionOrquestador,
+    "financiero": SalidaFinanciero,
+    "scoring": SalidaScoring,
+    "buro": SalidaBuro
+}
+
+# Respuestas de texto que solo se cachean si contienen el JSON que espera el llamador
+# (la salida estructurada ya llega validada por su esquema)
+VALIDADORES_CACHE = {
+    "financiero": lambda texto: parse_json(texto, esquema="financiero") is not None,
+    "buro": lambda texto: parse_json(texto, esquema="buro") is not None
+}
+
+# (nombre_agente, user_id) -> {"agente": Agent, "lock": Lock}, en orden LRU
+_sesiones = OrderedDict()
+_lock_pool = threading.Lock()
+_estadisticas = {"creados": 0, "reutilizados": 0, "desalojados": 0}
+_estadisticas_estructuradas = {"estructuradas": 0, "fallbacks_texto": 0}
+
+# Cache de respuestas para agentes cuyo input está determinado por datos estáticos
+if CACHE_RESPUESTAS:
+    if CACHE_BACKEND == "sqlite":
+        configurar_cache(CacheSQLite(CACHE_RUTA_SQLITE, CACHE_MAX_ENTRADAS, CACHE_TTL_SEGUNDOS))
+    else:
+        configurar_cache(CacheMemoria(CACHE_MAX_ENTRADAS, CACHE_TTL_SEGUNDOS))
+
+
+def crear_agente(nombre, **kwargs):
+    """
+    Crea una instancia nueva del agente indicado
+
+    Sin reintentos de strands (los hace invocar_resiliente) y con un callback que corta
+    el stream cuando la llamada se abandona por deadline
+    """
+    if nombre not in FABRICAS_AGENTES:
+        raise ValueError(f"Agente desconocido: {nombre}")
+
+    kwargs["callback_handler"] = callback_con_abandono(kwargs.get("callback_handler"))
+    kwargs.setdefault("retry_strategy", None)
+
+    with _lock_pool:
+        _estadisticas["creados"] += 1
+    return FABRICAS_AGENTES[nombre](**kwargs)
+
+
+def _obtener_sesion(nombre, user_id):
+    """
+    Devuelve la entrada del pool para (agente, usuario), creándola si no existe
+    Las sesiones menos usadas se desalojan al superar MAX_SESIONES_AGENTES
+    """
+    clave = (nombre, user_id)
+
+    with _lock_pool:
+        sesion = _sesiones.get(clave)
+        if sesion:
+            _sesiones.move_to_end(clave)
+            _estadisticas["reutilizados"] += 1
+            return sesion
+
+    # Historial acotado: solo se conservan los últimos mensajes de la sesión
+    agente = crear_agente(
+        nombre,
+        conversation_manager=SlidingWindowConversationManager(window_size=VENTANA_MENSAJES_AGENTE)
+    )
+    sesion = {"agente": agente, "lock": threading.Lock()}
+
+    with _lock_pool:
+        sesion = _sesiones.setdefault(clave, sesion)
+        _sesiones.move_to_end(clave)
+        while len(_sesiones) > MAX_SESIONES_AGENTES:
+            _sesiones.popitem(last=False)
+            _estadisticas["desalojados"] += 1
+
+    return sesion
+
+
+def _llamar_modelo(nombre, funcion):
+    """
+    Llamada resiliente al modelo, registrada en el turno con su latencia y uso de tokens
+    (la salida estructurada no expone el uso: solo se registra la latencia)
+    """
+    inicio = time.perf_counter()
+    resultado = invocar_resiliente(nombre, funcion)
+    uso = getattr(getattr(resultado, "metrics", None), "accumulated_usage", None)
+    registrar_llamada_modelo(nombre, (time.perf_counter() - inicio) * 1000, uso)
+    if uso:
+        anotar_etapa(input_tokens=uso.get("inputTokens", 0), output_tokens=uso.get("outputTokens", 0))
+    return resultado
+
+
+def _consultar_cache(clave_agente, nombre, prompt, llamar, validar=None):
+    """
+    consultar_con_cache que además registra los aciertos en el turno (sin latencia de modelo)
+    """
+    llamado = []
+
+    def llamar_registrando():
+        llamado.append(True)
+        return llamar()
+
+    respuesta = consultar_con_cache(clave_agente, prompt, llamar_registrando, validar)
+    anotar_etapa(cache_hit=not llamado)
+    if not llamado:
+        registrar_llamada_modelo(nombre, 0, cache=True)
+    return respuesta
+
+
+def _atributos_llamada(nombre, prompt, estructurada):
+    return {
+        "agent": nombre,
+        "structured": estructurada,
+        "prompt_chars": len(prompt),
+        "prompt_tokens": estimar_tokens(prompt)
+    }
+
+
+def invocar_agente(nombre, prompt, user_id=None, streaming=False):
+    """
+    Llama al agente y devuelve el texto de su respuesta
+
+    Por defecto cada invocación usa una instancia nueva (historial vacío), de modo que el
+    tamaño del prompt no crece con las solicitudes atendidas por el proceso. Con
+    AGENTES_POR_USUARIO cada user_id conserva una ventana acotada de mensajes.
+
+    Con streaming=True y una solicitud en modo streaming, el texto se emite token a
+    token a medida que el modelo lo genera.
+
+    La llamada al modelo tiene deadline, reintentos ante throttling y circuit breaker
+    (ver utils.resiliencia_utils) y se mide en la etapa "agente.<nombre>".
+    """
+    with medir_etapa(f"agente.{nombre}", **_atributos_llamada(nombre, prompt, False)):
+        return _invocar_agente(nombre, prompt, user_id, streaming)
+
+
+def _invocar_agente(nombre, prompt, user_id, streaming):
+    emitir_tokens = streaming and streaming_activo()
+
+    if AGENTES_POR_USUARIO and user_id:
+        sesion = _obtener_sesion(nombre, user_id)
+        # Un Agent no admite llamadas concurrentes sobre el mismo historial
+        def llamar_sesion():
+            with sesion["lock"]:
+                return sesion["agente"](prompt)
+
+        resultado = _llamar_modelo(nombre, llamar_sesion)
+        texto = resultado.message['content'][0]['text']
+        if emitir_tokens:
+            # La instancia de sesión ya tiene su callback: se emite el texto completo
+            emitir_evento("token", agent=nombre, data=texto)
+        return texto
+
+    # Sin historial, la respuesta depende solo del prompt: se puede cachear
+    def llamar():
+        if emitir_tokens:
+            agente = crear_agente(nombre, callback_handler=crear_callback_tokens(nombre))
+        else:
+            agente = crear_agente(nombre)
+        resultado = _llamar_modelo(nombre, lambda: agente(prompt))
+        return resultado.message['content'][0]['text']
+
+    if CACHE_RESPUESTAS and nombre in AGENTES_CACHEABLES and not emitir_tokens:
+        return _consultar_cache(nombre, nombre, prompt, llamar, VALIDADORES_CACHE.get(nombre))
+
+    return llamar()
+
+
+def invocar_agente_estructurado(nombre, prompt, user_id=None):
+    """
+    Llama al agente en modo salida estructurada (tool use con el esquema de MODELOS_SALIDA)
+    y devuelve el objeto validado como dict
+
+    Returns:
+        dict, o None si el modo está desactivado para el agente o la llamada falla
+        (el llamador usa entonces invocar_agente + parse_json)
+    """
+    if not SALIDA_ESTRUCTURADA or nombre not in AGENTES_SALIDA_ESTRUCTURADA or nombre not in MODELOS_SALIDA:
+        return None
+
+    with medir_etapa(f"agente.{nombre}", **_atributos_llamada(nombre, prompt, True)) as atributos:
+        objeto = _invocar_agente_estructurado(nombre, prompt, user_id)
+        atributos["parse_ok"] = objeto is not None
+        return objeto
+
+
+def _invocar_agente_estructurado(nombre, prompt, user_id):
+    modelo_salida = MODELOS_SALIDA[nombre]
+
+    def llamar():
+        if AGENTES_POR_USUARIO and user_id:
+            sesion = _obtener_sesion(nombre, user_id)
+
+            def llamar_sesion():
+                with sesion["lock"]:
+                    return sesion["agente"].structured_output(modelo_salida, prompt)
+
+            resultado = _llamar_modelo(nombre, llamar_sesion)
+        else:
+            agente = crear_agente(nombre)
+            resultado = _llamar_modelo(nombre, lambda: agente.structured_output(modelo_salida, prompt))
+        return json.dumps(resultado.model_dump(exclude_none=True), ensure_ascii=False)
+
+    try:
+        if CACHE_RESPUESTAS and nombre in AGENTES_CACHEABLES and not (AGENTES_POR_USUARIO and user_id):
+            # Clave distinta a la del modo texto: el valor cacheado es el objeto serializado
+            respuesta = _consultar_cache(f"{nombre}:estructurado", nombre, prompt, llamar)
+        else:
+            respuesta = llamar()
+        objeto = json.loads(respuesta)
+    except (TiempoAgotadoError, CircuitoAbiertoError):
+        # Repetir en modo texto no ayuda si el servicio está lento o caído
+        raise
+    except Exception as e:
+        if es_falla_servicio(e):
+            raise
+        logger.warning("Salida estructurada de %s no disponible, se usa texto: %s", nombre, e)
+        with _lock_pool:
+            _estadisticas_estructuradas["fallbacks_texto"] += 1
+        return None
+
+    with _lock_pool:
+        _estadisticas_estructuradas["estructuradas"] += 1
+    return objeto
+
+
+def liberar_sesiones_usuario(user_id):
+    """
+    Elimina del pool todas las instancias asociadas a un usuario
+    """
+    with _lock_pool:
+        claves = [clave for clave in _sesiones if clave[1] == user_id]
+        for clave in claves:
+            del _sesiones[clave]
+    return len(claves)
+
+
+def obtener_estadisticas_pool():
+    """
+    Estadísticas del pool de agentes
+    """
+    with _lock_pool:
+        return {
+            **_estadisticas,
+            **_estadisticas_estructuradas,
+            "sesiones_activas": len(_sesiones),
+            "max_sesiones": MAX_SESIONES_AGENTES,
+            "por_usuario": AGENTES_POR_USUARIO
+        }
@@ -1,4 +1,7 @@
 # agents/buro.py
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
 from strands import Agent
 from config import MODEL
 
@@ -86,7 +89,41 @@ INSTRUCCIONES CRÍTICAS:
 Responde SOLO con el JSON, sin explicaciones adicionales ni formato markdown.
 """
 
-buro = Agent(
-    model=MODEL,
-    system_prompt=system_prompt
-)
+
+class DeudasSistema(BaseModel):
+    total_deudas: Optional[float] = None
+    numero_entidades: Optional[int] = None
+    nivel_endeudamiento: Optional[str] = Field(None, description="bajo, medio o alto")
+
+
+class ImpactoDecision(BaseModel):
+    peso_positivo: Optional[float] = Field(None, description="0 a 100")
+    peso_negativo: Optional[float] = Field(None, description="0 a 100")
+    factor_determinante: Optional[str] = None
+
+
+class SalidaBuro(BaseModel):
+    """
+    Esquema de salida estructurada del agente de buró
+    """
+    score_buro: Optional[int] = None
+    interpretacion_score: str
+    comportamiento_general: str
+    deudas_sistema: Optional[DeudasSistema] = None
+    alertas_identificadas: List[str] = []
+    fortalezas: List[str] = []
+    recomendacion_buro: str = Field(description="FAVORABLE, OBSERVAR, DESFAVORABLE o RECHAZAR")
+    justificacion: Optional[str] = None
+    impacto_decision: ImpactoDecision
+    observaciones: Optional[str] = None
+
+
+def crear_buro(**kwargs):
+    """
+    Agente de buró que interpreta el reporte de centrales de riesgo de un NIT
+    """
+    return Agent(
+        model=MODEL,
+        system_prompt=system_prompt,
+        **kwargs
+    )
@@ -97,7 +97,12 @@ NUNCA:
 Responde SIEMPRE de forma inteligente, contextual y adaptada al cliente específico.
 """
 
-conversacional = Agent(
-    model=MODEL,
-    system_prompt=system_prompt
-)
\ No newline at end of file
+def crear_conversacional(**kwargs):
+    """
+    Agente conversacional para saludos, consultas de productos y preguntas generales
+    """
+    return Agent(
+        model=MODEL,
+        system_prompt=system_prompt,
+        **kwargs
+    )
@@ -1,3 +1,6 @@
+from typing import Optional
+
+from pydantic import BaseModel
 from strands import Agent
 from config import MODEL
 
@@ -28,7 +31,29 @@ Entrega **solo** un JSON limpio, sin markdown ni explicaciones, con este formato
 }
 """
 
-financiero = Agent(
-    model=MODEL,
-    system_prompt=system_prompt
-)
+
+class RatiosFinancieros(BaseModel):
+    debt_equity: Optional[float] = None
+    current_ratio: Optional[float] = None
+    ebitda_margin: Optional[float] = None
+    interest_coverage: Optional[float] = None
+    roa: Optional[float] = None
+    revenue_growth: Optional[float] = None
+
+
+class SalidaFinanciero(BaseModel):
+    """
+    Esquema de salida estructurada del agente financiero
+    """
+    ratios_2023: RatiosFinancieros
+
+
+def crear_financiero(**kwargs):
+    """
+    Agente financiero que calcula ratios a partir de los datos extraídos del documento
+    """
+    return Agent(
+        model=MODEL,
+        system_prompt=system_prompt,
+        **kwargs
+    )
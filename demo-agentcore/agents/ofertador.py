@@ -143,7 +143,12 @@ Responde SIEMPRE: evaluación breve + oferta limpia + pregunta directa de contin
 NO hagas preguntas adicionales innecesarias.
 """
 
-ofertador = Agent(
-    model=MODEL,
-    system_prompt=system_prompt
-)
\ No newline at end of file
+def crear_ofertador(**kwargs):
+    """
+    Agente ofertador, usado solo para pulir la redacción de una oferta ya calculada
+    """
+    return Agent(
+        model=MODEL,
+        system_prompt=system_prompt,
+        **kwargs
+    )
@@ -1,4 +1,7 @@
 # agents/orquestador.py
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
 from strands import Agent
 from config import MODEL
 
@@ -98,7 +101,24 @@ Para resumen (SOLO TEXTO):
 Analiza cuidadosamente cada solicitud, revisa el contexto completo, y decide el mejor agente. Responde SOLO con el formato apropiado según el tipo de respuesta.
 """
 
-orquestador = Agent(
-    model=MODEL,
-    system_prompt=system_prompt
-)
\ No newline at end of file
+
+class DecisionOrquestador(BaseModel):
+    """
+    Esquema de salida estructurada del orquestador: una ruta o un resumen, no ambos
+    """
+    next_agent: Optional[Literal["conversacional", "verificador", "ofertador", "financiero", "scoring", "end"]] = Field(
+        None, description="Agente siguiente cuando la respuesta es una decisión de routing"
+    )
+    info: Optional[str] = Field(None, description="Razón breve de la decisión")
+    resumen: Optional[str] = Field(None, description="Texto narrativo cuando la respuesta es un resumen")
+
+
+def crear_orquestador(**kwargs):
+    """
+    Orquestador que elige la ruta del turno cuando las reglas no la resuelven
+    """
+    return Agent(
+        model=MODEL,
+        system_prompt=system_prompt,
+        **kwargs
+    )
@@ -1,3 +1,6 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
 from strands import Agent
 from config import MODEL
 
@@ -173,7 +176,51 @@ EJEMPLOS DE RESPUESTAS ESPERADAS:
 Responde SOLO con el JSON limpio, sin explicaciones adicionales ni formato markdown.
 """
 
-scoring = Agent(
-    model=MODEL,
-    system_prompt=system_prompt
-)
\ No newline at end of file
+
+class DetallesScoring(BaseModel):
+    liquidez_score: Optional[float] = None
+    liquidez_analisis: Optional[str] = None
+    apalancamiento_score: Optional[float] = None
+    apalancamiento_analisis: Optional[str] = None
+    rentabilidad_score: Optional[float] = None
+    rentabilidad_analisis: Optional[str] = None
+    crecimiento_score: Optional[float] = None
+    crecimiento_analisis: Optional[str] = None
+    gestion_score: Optional[float] = None
+    gestion_analisis: Optional[str] = None
+
+
+class SalidaScoring(BaseModel):
+    """
+    Esquema de salida estructurada del agente de scoring
+    """
+    score: int = Field(description="Score de 0 a 1000")
+    decision: str = Field(description="APROBADO, CONDICIONAL o RECHAZADO")
+    condiciones: Optional[str] = None
+    monto_recomendado: Optional[float] = Field(None, description="Monto en pesos colombianos")
+    monto_formato: Optional[str] = None
+    capacidad_pago_mensual: Optional[float] = None
+    plazo_maximo_meses: Optional[int] = None
+    tasa_recomendada: Optional[str] = None
+    limite_aplicado: Optional[str] = None
+    detalles: Optional[DetallesScoring] = None
+    fortalezas_principales: List[str] = []
+    areas_mejora: List[str] = []
+    factores_riesgo: List[str] = []
+    recomendaciones: List[str] = []
+    sector_analisis: Optional[str] = None
+    tendencias_identificadas: Optional[str] = None
+    justificacion_score: Optional[str] = None
+    justificacion_monto: Optional[str] = None
+    comparacion_solicitado: Optional[str] = None
+
+
+def crear_scoring(**kwargs):
+    """
+    Agente de scoring que asigna el puntaje y la decisión crediticia
+    """
+    return Agent(
+        model=MODEL,
+        system_prompt=system_prompt,
+        **kwargs
+    )
@@ -52,7 +52,12 @@ INSTRUCCIONES CRÍTICAS:
 Responde reconociendo la información ya proporcionada y siendo eficiente.
 """
 
-verificador = Agent(
-    model=MODEL,
-    system_prompt=system_prompt
-)
\ No newline at end of file
+def crear_verificador(**kwargs):
+    """
+    Agente verificador que redacta el saludo a partir del resultado de la consulta del cliente
+    """
+    return Agent(
+        model=MODEL,
+        system_prompt=system_prompt,
+        **kwargs
+    )
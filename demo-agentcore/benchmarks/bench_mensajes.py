@@ -0,0 +1,398 @@
+# benchmarks/bench_mensajes.py
+# Microbenchmark: extractor de features en una pasada vs. funciones originales
+#
+# Uso (desde demo-agentcore/, con la raíz del repo en PYTHONPATH para config.py):
+#   PYTHONPATH=.. python -m benchmarks.bench_mensajes [iteraciones]
+
+import contextlib
+import io
+import sys
+import time
+
+from utils.mensaje_utils import extraer_features_mensaje
+
+MENSAJES = [
+    "Hola, buenos días",
+    "Mi NIT es 900123456-7 y necesito un crédito de capital de trabajo por 500 millones",
+    "Somos la empresa Constructora Andina SAS con 12 años en el sector de construcción",
+    "Quiero una línea de crédito rotativa de $300MM para inventario",
+    "Necesito financiamiento de 2 mil millones para expansión de la planta, NIT 800.987.654-3",
+    "Buscamos factoring sobre nuestra cartera de cuentas por cobrar, unos $750,000,000 COP",
+    "¿Cuánto es el monto máximo que me pueden prestar? Tenemos una tienda de retail",
+    "Listo, ¿cuáles son los siguientes pasos para formalizar y firmar?",
+    "Les comparto el pdf con los documentos financieros de la compañía Tech Solutions",
+    "Un crédito hipotecario para comprar una oficina, quinientos millones aprox",
+    "Clínica San Rafael Ltda, sector salud, 25 años de operación, 900123456",
+    "sí, acepto la oferta",
+    "EMPRESA INDUSTRIAS DEL VALLE, necesitamos 5 MIL MILLONES",
+    "La COMPAÑÍA Agro Campo S.A. requiere mil millones para maquinaria",
+]
+
+
+# --- Implementaciones originales (copiadas para comparar resultados y tiempos) ---
+
+def legacy_extraer_nit_de_mensaje(mensaje):
+    """
+    Extrae el NIT del mensaje del usuario usando expresiones regulares
+    """
+    import re
+    
+    # Patrones comunes para NITs en Colombia
+    patrones_nit = [
+        r'\b(\d{9}-\d)\b',  # Formato: 123456789-0
+        r'\b(\d{9})\b',     # Solo números: 123456789
+        r'\b(\d{3}\.?\d{3}\.?\d{3}-\d)\b',  # Con puntos: 123.456.789-0
+    ]
+    
+    for patron in patrones_nit:
+        match = re.search(patron, mensaje)
+        if match:
+            nit_encontrado = match.group(1)
+            # Limpiar y formatear
+            nit_limpio = nit_encontrado.replace(".", "").replace(" ", "")
+            return nit_limpio
+    
+    return None
+
+
+def legacy_extraer_info_credito_del_mensaje(mensaje):
+    """
+    Extrae información completa usando comprensión de lenguaje natural de Claude
+    VERSIÓN MEJORADA - Sin regex, con comprensión contextual
+    """
+    import re
+    
+    info = {}
+    mensaje_lower = mensaje.lower()
+    
+    print(f"[LOG] Analizando mensaje para extracción: {mensaje[:100]}...")
+    
+    # EXTRAER TIPO DE CRÉDITO usando comprensión natural
+    tipos_credito = {
+        # Más específico a menos específico
+        "capital de trabajo": "crédito empresarial",
+        "crédito de capital de trabajo": "crédito empresarial", 
+        "crédito empresarial": "crédito empresarial",
+        "crédito comercial": "crédito empresarial",
+        "credito empresarial": "crédito empresarial",
+        "credito comercial": "crédito empresarial",
+        "empresarial": "crédito empresarial",
+        "comercial": "crédito empresarial",
+        "expansión": "crédito empresarial",
+        "expansion": "crédito empresarial",
+        "crecimiento": "crédito empresarial",
+        "inversión": "crédito empresarial",
+        "inversion": "crédito empresarial",
+        "financiamiento": "crédito empresarial",
+        
+        # Línea rotativa
+        "línea de crédito": "línea rotativa",
+        "linea de credito": "línea rotativa", 
+        "línea rotativa": "línea rotativa",
+        "linea rotativa": "línea rotativa",
+        "rotativo": "línea rotativa",
+        "rotativa": "línea rotativa",
+        
+        # Hipotecario
+        "hipotecario": "hipotecario comercial",
+        "hipoteca": "hipotecario comercial",
+        "inmueble": "hipotecario comercial",
+        "propiedad": "hipotecario comercial",
+        
+        # Factoring
+        "factoring": "factoring",
+        "cartera": "factoring",
+        "cuentas por cobrar": "factoring"
+    }
+    
+    for palabra_clave, tipo_estandar in tipos_credito.items():
+        if palabra_clave in mensaje_lower:
+            info["tipo_credito"] = tipo_estandar
+            info["tipo_original"] = palabra_clave
+            print(f"[LOG] Tipo detectado: {palabra_clave} -> {tipo_estandar}")
+            break
+    
+    # EXTRAER MONTO usando comprensión natural mejorada
+    # Patrones más inteligentes y flexibles
+    patrones_monto = [
+        # Números con palabras explícitas
+        r'(\d{1,4})\s*mil\s*millones?',  # 5 mil millones
+        r'(\d{1,3}(?:[.,]\d{3})*)\s*millones?',  # 500 millones, 1.000 millones
+        r'\$\s*(\d{1,3}(?:[.,]\d{3})*)\s*millones?',  # $500 millones
+        
+        # Formato con M
+        r'\$?\s*(\d{1,4})\s*[Mm](?:[Mm])?',  # 500M, $300MM
+        
+        # Números grandes sin millones explícito
+        r'\$\s*(\d{3,}(?:[.,]\d{3})*)',  # $500,000,000
+        
+        # Casos especiales en texto
+        r'quinientos?\s*millones?',  # quinientos millones -> 500
+        r'mil\s*millones?',  # mil millones -> 1000 (cuando no hay número antes)
+    ]
+    
+    for i, patron in enumerate(patrones_monto):
+        match = re.search(patron, mensaje, re.IGNORECASE)
+        if match:
+            if patron == r'quinientos?\s*millones?':
+                numero = 500
+            elif patron == r'mil\s*millones?':
+                numero = 1000
+            else:
+                numero_str = match.group(1).replace('.', '').replace(',', '')
+                try:
+                    numero = int(numero_str)
+                except ValueError:
+                    continue
+            
+            # Calcular monto final
+            if 'mil millones' in match.group(0).lower():
+                monto_final = numero * 1000000000
+                formato = f"${numero} mil millones"
+            elif 'millones' in match.group(0).lower() or 'M' in match.group(0):
+                monto_final = numero * 1000000  
+                formato = f"${numero}M"
+            elif numero >= 100000000:  # Si es un número grande sin palabra
+                monto_final = numero
+                formato = f"${numero//1000000}M"
+            else:
+                monto_final = numero * 1000000
+                formato = f"${numero}M"
+            
+            # Validar rango razonable
+            if monto_final < 1000000:  # Menos de 1M
+                print(f"[WARNING] Monto muy pequeño: ${monto_final:,}")
+                continue
+            elif monto_final > 50000000000:  # Más de 50 mil millones
+                print(f"[WARNING] Monto muy grande: ${monto_final:,}")
+                monto_final = 5000000000  # Limitar a 5 mil millones
+                formato = "$5,000M"
+            
+            info["monto_solicitado"] = monto_final
+            info["monto_formato"] = formato
+            
+            print(f"[LOG] Monto detectado (patrón {i+1}): {match.group(0)} -> ${monto_final:,}")
+            break
+    
+    # EXTRAER PROPÓSITO usando comprensión natural
+    propositos = {
+        "capital de trabajo": "capital de trabajo",
+        "flujo de caja": "capital de trabajo", 
+        "inventario": "capital de trabajo",
+        "operativo": "capital de trabajo",
+        "operación": "capital de trabajo",
+        "expansión": "expansión",
+        "expansion": "expansión", 
+        "crecimiento": "expansión",
+        "ampliación": "expansión",
+        "inversión": "inversión",
+        "inversion": "inversión",
+        "equipos": "compra de equipos",
+        "maquinaria": "compra de equipos",
+        "tecnología": "compra de equipos",
+        "inmueble": "compra de inmueble",
+        "local": "compra de inmueble",
+        "oficina": "compra de inmueble"
+    }
+    
+    for palabra_clave, proposito_estandar in propositos.items():
+        if palabra_clave in mensaje_lower:
+            info["proposito"] = proposito_estandar
+            print(f"[LOG] Propósito detectado: {proposito_estandar}")
+            break
+    
+    print(f"[LOG] Información extraída: {info}")
+    return info
+
+
+def legacy_extract_user_info(user_message):
+    """Extrae información relevante del mensaje del usuario"""
+    info = {}
+    message_lower = user_message.lower()
+    
+    # Detectar nombre de empresa
+    import re
+    company_patterns = [
+        r"empresa\s+([A-Za-z][A-Za-z\s&.,]+?)(?:\s|$|,)",
+        r"compañía\s+([A-Za-z][A-Za-z\s&.,]+?)(?:\s|$|,)",
+        r"([A-Za-z][A-Za-z\s&.,]*?)\s+(?:s\.a\.s\.|sas|ltda|s\.a\.|sa)(?:\s|$|,)"
+    ]
+    
+    for pattern in company_patterns:
+        match = re.search(pattern, user_message, re.IGNORECASE)
+        if match:
+            info["company_name"] = match.group(1).strip()
+            break
+    
+    # Detectar sector empresarial
+    sectors_map = {
+        "construcción": ["construcción", "construc", "obra", "inmobiliaria", "constructor"],
+        "comercio": ["comercio", "ventas", "retail", "tienda", "almacén"],
+        "servicios": ["servicios", "consultoría", "asesoría", "consulting"],
+        "manufactura": ["manufactura", "producción", "fábrica", "industrial", "manufactur"],
+        "tecnología": ["tecnología", "software", "desarrollo", "IT", "tech"],
+        "salud": ["salud", "médico", "clínica", "hospital", "farmac"],
+        "transporte": ["transporte", "logística", "carga", "fletes"],
+        "agricultura": ["agricultura", "agrícola", "campo", "agro", "cultivo"]
+    }
+    
+    for sector, keywords in sectors_map.items():
+        if any(keyword in message_lower for keyword in keywords):
+            info["sector"] = sector
+            break
+    
+    # Detectar años de operación
+    years_match = re.search(r"(\d+)\s+años", message_lower)
+    if years_match:
+        info["years_operating"] = int(years_match.group(1))
+    
+    # Detectar etapa de conversación
+    if any(word in message_lower for word in ["documentos", "subir", "pdf", "archivo"]):
+        info["stage"] = "document_upload"
+    elif any(word in message_lower for word in ["monto", "cuánto", "cantidad", "simulación"]):
+        info["stage"] = "amount_inquiry"
+    elif any(word in message_lower for word in ["siguiente", "pasos", "formalizar", "firmar"]):
+        info["stage"] = "formalization"
+    
+    return info
+
+
+def legacy_extraer_tipo_producto(mensaje, contexto):
+    """
+    Extrae el tipo de producto crediticio del mensaje o contexto
+    """
+    mensaje_lower = mensaje.lower()
+    
+    # Detectar tipos específicos en el mensaje
+    if any(word in mensaje_lower for word in ["hipotecario", "hipoteca", "inmueble", "local", "oficina"]):
+        return "hipotecario_comercial"
+    elif any(word in mensaje_lower for word in ["rotativo", "rotativa", "línea", "linea", "flexible"]):
+        return "linea_credito_rotativa"  
+    elif any(word in mensaje_lower for word in ["factoring", "cartera", "cuentas por cobrar", "descuento"]):
+        return "factoring"
+    elif any(word in mensaje_lower for word in ["empresarial", "comercial", "capital", "expansion", "inversion"]):
+        return "credito_empresarial"
+    
+    # Si no se detecta tipo específico, usar contexto
+    sector = contexto.get("sector", "")
+    if sector == "construccion":
+        return "credito_empresarial"  # Créditos de construcción son empresariales
+    elif sector == "comercio":
+        return "linea_credito_rotativa"  # Comercio suele necesitar rotativo
+    else:
+        return "credito_empresarial"  # Default
+
+
+def legacy_extraer_monto_solicitado(mensaje):
+    """
+    Extrae el monto solicitado del mensaje usando regex
+    """
+    import re
+    
+    # Patrones para detectar montos
+    patrones_monto = [
+        r'(\d{1,3}(?:\.\d{3})*(?:\.\d{3})*)\s*(?:millones?|mill?)',  # 500 millones
+        r'\$\s*(\d{1,3}(?:\.\d{3})*(?:\.\d{3})*)\s*(?:millones?|mill?)',  # $500 millones
+        r'(\d{1,3}(?:\,\d{3})*(?:\,\d{3})*)\s*(?:millones?|mill?)',  # 500,000 millones (formato US)
+        r'\$\s*(\d{1,3}(?:\,\d{3})*(?:\,\d{3})*)\s*(?:COP|cop|pesos?)?',  # $500,000,000
+        r'(\d{1,3}(?:\.\d{3})*)\s*(?:mil millones?)',  # 5 mil millones
+    ]
+    
+    for patron in patrones_monto:
+        match = re.search(patron, mensaje, re.IGNORECASE)
+        if match:
+            numero_str = match.group(1).replace('.', '').replace(',', '')
+            try:
+                numero = int(numero_str)
+                
+                # Ajustar según el patrón encontrado
+                if 'millones' in match.group(0).lower():
+                    if 'mil millones' in match.group(0).lower():
+                        return numero * 1000000000  # mil millones
+                    else:
+                        return numero * 1000000  # millones normales
+                else:
+                    return numero  # Número directo en pesos
+                    
+            except ValueError:
+                continue
+    
+    return None  # No se encontró monto específico
+
+
+
+# --- Comparación ---
+
+def features_legacy(mensaje):
+    contexto = {}
+    return (
+        legacy_extraer_nit_de_mensaje(mensaje),
+        legacy_extraer_info_credito_del_mensaje(mensaje),
+        legacy_extract_user_info(mensaje),
+        legacy_extraer_tipo_producto(mensaje, contexto),
+        legacy_extraer_monto_solicitado(mensaje),
+    )
+
+
+def features_nuevas(mensaje):
+    features = extraer_features_mensaje(mensaje)
+
+    info_credito = {}
+    if features.tipo_credito:
+        info_credito["tipo_credito"] = features.tipo_credito
+        info_credito["tipo_original"] = features.tipo_original
+    if features.monto_solicitado is not None:
+        info_credito["monto_solicitado"] = features.monto_solicitado
+        info_credito["monto_formato"] = features.monto_formato
+    if features.proposito:
+        info_credito["proposito"] = features.proposito
+
+    info_usuario = {}
+    for campo in ("company_name", "sector", "years_operating", "stage"):
+        valor = getattr(features, campo)
+        if valor is not None:
+            info_usuario[campo] = valor
+
+    return (
+        features.nit,
+        info_credito,
+        info_usuario,
+        features.tipo_producto or "credito_empresarial",
+        features.monto_pesos,
+    )
+
+
+def medir(funcion, iteraciones, limpiar_cache=False):
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        if limpiar_cache:
+            extraer_features_mensaje.cache_clear()
+        for mensaje in MENSAJES:
+            funcion(mensaje)
+    total = time.perf_counter() - inicio
+    return total / (iteraciones * len(MENSAJES)) * 1e6  # µs por mensaje
+
+
+def main():
+    iteraciones = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    # Los prints de las funciones originales se descartan para no sesgar la medición
+    with contextlib.redirect_stdout(io.StringIO()):
+        diferencias = [m for m in MENSAJES if features_legacy(m) != features_nuevas(m)]
+        legacy = medir(features_legacy, iteraciones)
+        sin_memo = medir(features_nuevas, iteraciones, limpiar_cache=True)
+        con_memo = medir(features_nuevas, iteraciones)
+
+    print(f"Mensajes: {len(MENSAJES)} | iteraciones: {iteraciones}")
+    print(f"Resultados idénticos: {'sí' if not diferencias else 'NO'}")
+    for mensaje in diferencias:
+        print(f"  diferencia en: {mensaje!r}")
+    print(f"Funciones originales:       {legacy:8.1f} µs/mensaje")
+    print(f"Extractor (sin memo):       {sin_memo:8.1f} µs/mensaje ({legacy / sin_memo:.1f}x)")
+    print(f"Extractor (memoizado):      {con_memo:8.1f} µs/mensaje ({legacy / con_memo:.1f}x)")
+
+    return 1 if diferencias else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
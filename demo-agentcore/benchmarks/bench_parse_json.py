@@ -0,0 +1,148 @@
+# benchmarks/bench_parse_json.py
+# Benchmark de parse_json: extractor de una pasada vs. implementación original
+#
+# Uso (desde demo-agentcore/, con la raíz del repo en PYTHONPATH para config.py):
+#   PYTHONPATH=.. python -m benchmarks.bench_parse_json [iteraciones]
+#
+# corpus_salidas_llm.jsonl reúne salidas mal formadas con la forma de las que devuelven
+# los agentes (texto antes/después, markdown, llaves en strings, JSON inválido previo,
+# salidas truncadas). Se agregan variantes escaladas para ver el crecimiento con el tamaño.
+
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+from utils.main_utils import clean_markdown, cumple_esquema, parse_json
+
+RUTA_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus_salidas_llm.jsonl")
+
+
+# --- Implementación original (copiada para comparar) ---
+
+def legacy_parse_json(text: str, fallback=None):
+    """
+    Parsea JSON de forma segura con fallback, incluyendo extracción de JSON de texto mixto
+    """
+    try:
+        if not text:
+            return fallback
+            
+        cleaned_text = clean_markdown(text)
+        
+        # Intentar parsear directamente
+        try:
+            return json.loads(cleaned_text)
+        except json.JSONDecodeError:
+            pass
+        
+        # Intentar extraer JSON del texto si está mezclado
+        lines = cleaned_text.strip().split('\n')
+        
+        # Buscar líneas que parezcan JSON
+        for line in lines:
+            line = line.strip()
+            if line.startswith('{') and line.endswith('}'):
+                try:
+                    return json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+        
+        # Buscar bloques JSON multilinea
+        json_start = -1
+        brace_count = 0
+        
+        for i, char in enumerate(cleaned_text):
+            if char == '{':
+                if json_start == -1:
+                    json_start = i
+                brace_count += 1
+            elif char == '}':
+                brace_count -= 1
+                if brace_count == 0 and json_start != -1:
+                    json_candidate = cleaned_text[json_start:i+1]
+                    try:
+                        return json.loads(json_candidate)
+                    except json.JSONDecodeError:
+                        json_start = -1
+                        continue
+        
+        print(f"[WARNING] No se pudo extraer JSON válido de: {text[:200]}...")
+        return fallback
+        
+    except Exception as e:
+        print(f"[ERROR] Error inesperado en parse_json: {e}")
+        print(f"[ERROR] Texto era: {text[:200]}...")
+        return fallback
+
+
+# --- Corpus ---
+
+def cargar_corpus():
+    with open(RUTA_CORPUS, encoding="utf-8") as archivo:
+        return [json.loads(linea) for linea in archivo if linea.strip()]
+
+
+def casos_escalados(repeticiones):
+    """
+    Prosa larga con llaves y comillas sueltas antes del JSON real
+    """
+    relleno = 'El cliente dijo "hola {equipo}" y envió {anexos} con datos {"parcial": ' * repeticiones
+    return [
+        {"nombre": f"prosa_con_llaves_x{repeticiones}", "esquema": "orquestador",
+         "salida": relleno + '\n{"next_agent": "conversacional", "info": "consulta"}'},
+        {"nombre": f"objeto_truncado_x{repeticiones}", "esquema": "scoring",
+         "salida": '{"score": 700, "detalles": {' + '"x": {"y": 1}, ' * repeticiones
+                   + '\nReintento: {"score": 700, "decision": "APROBADO"}'},
+    ]
+
+
+def es_correcto(resultado, caso):
+    if caso["nombre"] == "sin_json" or caso["nombre"].endswith("resumen_narrativo"):
+        return resultado is None
+    return cumple_esquema(resultado, caso["esquema"])
+
+
+def medir(funcion, caso, iteraciones):
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        funcion(caso)
+    return (time.perf_counter() - inicio) / iteraciones * 1e6  # µs
+
+
+def main():
+    iteraciones = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    corpus = cargar_corpus() + casos_escalados(50) + casos_escalados(500)
+
+    nuevo = lambda caso: parse_json(caso["salida"], None, esquema=caso["esquema"])
+    original = lambda caso: legacy_parse_json(caso["salida"], None)
+
+    print(f"{'caso':42} {'orig µs':>9} {'nuevo µs':>9}  orig  nuevo")
+    aciertos_original = aciertos_nuevo = 0
+    total_original = total_nuevo = 0.0
+
+    with contextlib.redirect_stdout(io.StringIO()) as silencio:
+        filas = []
+        for caso in corpus:
+            ok_original = es_correcto(original(caso), caso)
+            ok_nuevo = es_correcto(nuevo(caso), caso)
+            t_original = medir(original, caso, iteraciones)
+            t_nuevo = medir(nuevo, caso, iteraciones)
+            filas.append((caso["nombre"], t_original, t_nuevo, ok_original, ok_nuevo))
+
+    for nombre, t_original, t_nuevo, ok_original, ok_nuevo in filas:
+        aciertos_original += ok_original
+        aciertos_nuevo += ok_nuevo
+        total_original += t_original
+        total_nuevo += t_nuevo
+        print(f"{nombre:42} {t_original:9.1f} {t_nuevo:9.1f}  {'ok' if ok_original else '--':>4}  {'ok' if ok_nuevo else '--':>5}")
+
+    print(f"\nCorrectos: original {aciertos_original}/{len(corpus)}, nuevo {aciertos_nuevo}/{len(corpus)}")
+    print(f"Tiempo total: original {total_original:.1f} µs, nuevo {total_nuevo:.1f} µs")
+    return 0 if aciertos_nuevo >= aciertos_original else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
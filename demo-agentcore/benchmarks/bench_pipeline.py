@@ -0,0 +1,330 @@
+# benchmarks/bench_pipeline.py
+# Benchmark offline del pipeline completo: reproduce corpus_pipeline.jsonl (turnos de
+# conversación, documentos, respuestas SÍ/NO a la oferta) a través de entrypoint.invoke
+# con los agentes reales (strands Agent) sobre un modelo que devuelve las respuestas
+# grabadas en respuestas_grabadas.json, sin red.
+#
+# La grabación está en la capa del modelo (ModeloGrabado reemplaza a BedrockModel), así
+# que el tiempo medido incluye la creación del Agent, su event loop y el parseo del stream.
+#
+# Reporta throughput por ruta, latencia por etapa (telemetría del pipeline) y memoria
+# asignada por solicitud (tracemalloc, en una pasada aparte para no afectar los tiempos),
+# y compara contra baseline_pipeline.json: sale con código 1 si hay regresiones o si un
+# caso no deja la conversación en el estado esperado.
+#
+# Uso (desde demo-agentcore/, con la raíz del repo en PYTHONPATH para config.py):
+#   PYTHONPATH=.. python -m benchmarks.bench_pipeline [--iteraciones N] [--latencia-ms MS]
+#   PYTHONPATH=.. python -m benchmarks.bench_pipeline --actualizar-baseline
+#
+# Con --latencia-ms 0 (por defecto) el tiempo medido es solo el overhead en Python. Los
+# tiempos se normalizan con una carga de calibración para comparar entre máquinas.
+
+import argparse
+import contextlib
+import copy
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+
+from strands.event_loop import streaming
+from strands.models import Model
+from strands.tools import convert_pydantic_to_tool_spec
+
+import agents.agent_pool as agent_pool
+import entrypoint
+from benchmarks.modelo_mock import MARCAS_AGENTES
+from utils.log_utils import configurar_logging
+from utils.prompt_utils import estimar_tokens
+from utils.telemetria_utils import obtener_snapshot_telemetria, reiniciar_telemetria
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RUTA_CORPUS = os.path.join(DIRECTORIO, "corpus_pipeline.jsonl")
+RUTA_RESPUESTAS = os.path.join(DIRECTORIO, "respuestas_grabadas.json")
+RUTA_BASELINE = os.path.join(DIRECTORIO, "baseline_pipeline.json")
+
+with open(RUTA_RESPUESTAS, encoding="utf-8") as archivo:
+    RESPUESTAS_GRABADAS = json.load(archivo)
+
+LATENCIA_SEGUNDOS = 0.0
+
+
+class ModeloGrabado(Model):
+    """
+    Modelo de strands que responde con la salida grabada del agente (detectado por su
+    system prompt) en el mismo formato de eventos que ConverseStream: texto palabra por
+    palabra o un toolUse cuando se pide salida estructurada. La latencia sintética
+    bloquea el hilo como el SDK real.
+    """
+
+    def __init__(self):
+        self.config = {"model_id": "grabado"}
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    @staticmethod
+    def _agente(system_prompt):
+        for marca, agente in MARCAS_AGENTES:
+            if marca in (system_prompt or ""):
+                return agente
+        return "conversacional"
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        if LATENCIA_SEGUNDOS:
+            time.sleep(LATENCIA_SEGUNDOS)
+        respuesta = RESPUESTAS_GRABADAS[self._agente(system_prompt)]
+        tokens_entrada = estimar_tokens(json.dumps(messages, ensure_ascii=False, default=str)) + estimar_tokens(system_prompt)
+
+        yield {"messageStart": {"role": "assistant"}}
+        if tool_specs:
+            if "estructurada" not in respuesta:
+                raise ValueError("sin salida estructurada grabada")
+            entrada = json.dumps(respuesta["estructurada"], ensure_ascii=False)
+            yield {"contentBlockStart": {"start": {"toolUse": {"toolUseId": f"tooluse_{uuid.uuid4().hex[:20]}",
+                                                               "name": tool_specs[0]["name"]}}}}
+            yield {"contentBlockDelta": {"delta": {"toolUse": {"input": entrada}}}}
+            motivo, salida = "tool_use", entrada
+        else:
+            salida = respuesta["texto"]
+            for palabra in salida.split(" "):
+                yield {"contentBlockDelta": {"delta": {"text": palabra + " "}}}
+            motivo = "end_turn"
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": motivo}}
+        tokens_salida = estimar_tokens(salida)
+        yield {"metadata": {
+            "usage": {"inputTokens": tokens_entrada, "outputTokens": tokens_salida, "totalTokens": tokens_entrada + tokens_salida},
+            "metrics": {"latencyMs": int(LATENCIA_SEGUNDOS * 1000)}
+        }}
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        # Mismo camino que BedrockModel.structured_output: stream con la herramienta del esquema
+        tool_spec = convert_pydantic_to_tool_spec(output_model)
+        evento = None
+        async for evento in streaming.process_stream(self.stream(prompt, [tool_spec], system_prompt)):
+            yield evento
+        _, mensaje, _, _ = evento["stop"]
+        for bloque in mensaje["content"]:
+            if bloque.get("toolUse") and bloque["toolUse"]["name"] == tool_spec["name"]:
+                yield {"output": output_model(**bloque["toolUse"]["input"])}
+                return
+        raise ValueError("sin toolUse en la respuesta grabada")
+
+
+def instalar_modelo_grabado():
+    """
+    Reemplaza el modelo de todas las fábricas de agentes (las fábricas y el Agent son los reales)
+    """
+    modelo = ModeloGrabado()
+    for fabrica in agent_pool.FABRICAS_AGENTES.values():
+        sys.modules[fabrica.__module__].MODEL = modelo
+
+
+def cargar_corpus():
+    with open(RUTA_CORPUS, encoding="utf-8") as archivo:
+        return [json.loads(linea) for linea in archivo if linea.strip()]
+
+
+def calibrar(repeticiones=15):
+    """
+    Tiempo (ms) de una carga fija en Python puro: JSON, regex y dicts, como el pipeline
+    """
+    import re
+    patron = re.compile(r"\b\d{9}-?\d?\b")
+    documento = {"ratios": {f"r{i}": i * 1.5 for i in range(40)}, "texto": "NIT 900123456-7 monto 500 millones " * 40}
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(300):
+            copia = json.loads(json.dumps(documento))
+            patron.findall(copia["texto"])
+            sorted(copia["ratios"].items(), key=lambda par: par[1])
+        duracion = (time.perf_counter() - inicio) * 1000
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor
+
+
+def ejecutar(caso, indice):
+    payload = copy.deepcopy(caso["payload"])
+    payload["user_id"] = f"bench_{indice}"
+    return entrypoint.invoke(payload)
+
+
+def cumple_esperado(caso, resultado):
+    """
+    La solicitud tuvo éxito y dejó el contexto como indica "esperado" en el corpus
+    (p. ej. la etapa tras una respuesta SÍ/NO a la oferta)
+    """
+    if not resultado.get("success"):
+        return False
+    contexto = resultado.get("conversation_context") or {}
+    return all(contexto.get(clave) == valor for clave, valor in caso.get("esperado", {}).items())
+
+
+def medir_throughput(corpus, iteraciones, rondas):
+    """
+    Ejecuta cada caso iteraciones veces por ronda y agrupa los tiempos por ruta,
+    quedándose con la ronda más rápida de cada ruta (menos ruido en CI)
+    """
+    for caso in corpus:
+        ejecutar(caso, 0)  # calentamiento: imports perezosos, regex compiladas, caches de proceso
+
+    mejor = {}
+    for _ in range(rondas):
+        por_ruta = defaultdict(lambda: {"solicitudes": 0, "exitos": 0, "segundos": 0.0})
+        for caso in corpus:
+            metricas = por_ruta[caso["ruta"]]
+            for i in range(iteraciones):
+                inicio = time.perf_counter()
+                resultado = ejecutar(caso, i)
+                metricas["segundos"] += time.perf_counter() - inicio
+                metricas["solicitudes"] += 1
+                metricas["exitos"] += 1 if cumple_esperado(caso, resultado) else 0
+        for ruta, metricas in por_ruta.items():
+            if ruta not in mejor or metricas["segundos"] < mejor[ruta]["segundos"]:
+                mejor[ruta] = metricas
+    return mejor
+
+
+def medir_asignaciones(corpus, iteraciones):
+    """
+    Pico de memoria asignada por solicitud y memoria retenida al final, por ruta
+    """
+    por_ruta = defaultdict(lambda: {"pico_kb": 0.0, "retenido_kb": 0.0, "solicitudes": 0})
+    tracemalloc.start()
+    try:
+        for caso in corpus:
+            metricas = por_ruta[caso["ruta"]]
+            for i in range(iteraciones):
+                antes, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                ejecutar(caso, i)
+                despues, pico = tracemalloc.get_traced_memory()
+                metricas["pico_kb"] = max(metricas["pico_kb"], (pico - antes) / 1024)
+                metricas["retenido_kb"] += (despues - antes) / 1024
+                metricas["solicitudes"] += 1
+    finally:
+        tracemalloc.stop()
+    return por_ruta
+
+
+def resumir(throughput, asignaciones, calibracion_ms):
+    rutas = {}
+    for ruta, metricas in sorted(throughput.items()):
+        ms_por_solicitud = metricas["segundos"] * 1000 / metricas["solicitudes"]
+        memoria = asignaciones.get(ruta, {"pico_kb": 0.0, "retenido_kb": 0.0, "solicitudes": 1})
+        rutas[ruta] = {
+            "solicitudes": metricas["solicitudes"],
+            "exitos": metricas["exitos"],
+            "sol_por_segundo": round(metricas["solicitudes"] / metricas["segundos"], 1),
+            "ms_por_solicitud": round(ms_por_solicitud, 3),
+            "ms_normalizado": round(ms_por_solicitud / calibracion_ms, 4),
+            "pico_kb": round(memoria["pico_kb"], 1),
+            "retenido_kb": round(memoria["retenido_kb"] / max(memoria["solicitudes"], 1), 2)
+        }
+    return rutas
+
+
+def comparar(rutas, baseline, tolerancia_tiempo, tolerancia_memoria):
+    """
+    Regresiones respecto a la baseline: tiempo normalizado y pico de memoria por ruta
+    """
+    regresiones = []
+    for ruta, actual in rutas.items():
+        anterior = baseline.get("rutas", {}).get(ruta)
+        if anterior is None:
+            continue
+        if actual["ms_normalizado"] > anterior["ms_normalizado"] * (1 + tolerancia_tiempo):
+            regresiones.append(f"{ruta}: tiempo {actual['ms_normalizado']} vs. {anterior['ms_normalizado']} (normalizado)")
+        if actual["pico_kb"] > anterior["pico_kb"] * (1 + tolerancia_memoria) + 16:
+            regresiones.append(f"{ruta}: memoria pico {actual['pico_kb']} KB vs. {anterior['pico_kb']} KB")
+        if actual["exitos"] < actual["solicitudes"]:
+            regresiones.append(f"{ruta}: {actual['solicitudes'] - actual['exitos']} solicitudes fallidas o con estado inesperado")
+    return regresiones
+
+
+def reportar(rutas, etapas, calibracion_ms):
+    print(f"Calibración: {calibracion_ms:.1f} ms, latencia sintética {LATENCIA_SEGUNDOS * 1000:.0f} ms por llamada")
+    print(f"\n{'ruta':<18} {'sol/s':>9} {'ms/sol':>9} {'normalizado':>12} {'pico KB':>9} {'retenido KB':>12} {'ok':>9}")
+    for ruta, metricas in rutas.items():
+        print(f"{ruta:<18} {metricas['sol_por_segundo']:>9.1f} {metricas['ms_por_solicitud']:>9.2f} "
+              f"{metricas['ms_normalizado']:>12.4f} {metricas['pico_kb']:>9.1f} {metricas['retenido_kb']:>12.2f} "
+              f"{metricas['exitos']:>4}/{metricas['solicitudes']:<4}")
+
+    print(f"\n{'etapa':<28} {'total':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cache':>6}")
+    for etapa, metricas in etapas.items():
+        if metricas["p50_ms"] is None:
+            continue  # etapas sin latencia (parseo)
+        print(f"{etapa:<28} {metricas['total']:>7} {metricas['p50_ms']:>9.2f} {metricas['p95_ms']:>9.2f} "
+              f"{metricas['p99_ms']:>9.2f} {metricas['cache_hits']:>6}")
+
+
+def principal():
+    global LATENCIA_SEGUNDOS
+
+    parser = argparse.ArgumentParser(description="Benchmark offline del pipeline con respuestas grabadas")
+    parser.add_argument("--iteraciones", type=int, default=50, help="repeticiones de cada caso del corpus")
+    parser.add_argument("--rondas", type=int, default=3, help="rondas de medición (se reporta la más rápida)")
+    parser.add_argument("--latencia-ms", type=float, default=0, help="latencia sintética por llamada al modelo")
+    parser.add_argument("--tolerancia-tiempo", type=float, default=0.3, help="regresión si el tiempo sube más de esta fracción")
+    parser.add_argument("--tolerancia-memoria", type=float, default=0.2, help="regresión si la memoria pico sube más de esta fracción")
+    parser.add_argument("--log-nivel", default="INFO", help="nivel de logging durante la medición")
+    parser.add_argument("--baseline", default=RUTA_BASELINE)
+    parser.add_argument("--actualizar-baseline", action="store_true", help="guarda los resultados como nueva baseline")
+    args = parser.parse_args()
+
+    LATENCIA_SEGUNDOS = args.latencia_ms / 1000
+    instalar_modelo_grabado()
+    # Sin cache de respuestas: cada iteración recorre el pipeline completo
+    agent_pool.CACHE_RESPUESTAS = False
+
+    corpus = cargar_corpus()
+    calibracion_ms = calibrar()
+
+    # Los logs se formatean como en producción pero se descartan para no medir la consola
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        configurar_logging(nivel=args.log_nivel, asincrono=False)
+        reiniciar_telemetria()
+        throughput = medir_throughput(corpus, args.iteraciones, args.rondas)
+        etapas = obtener_snapshot_telemetria()
+        asignaciones = medir_asignaciones(corpus, max(1, args.iteraciones // 5))
+    configurar_logging()
+
+    rutas = resumir(throughput, asignaciones, calibracion_ms)
+    reportar(rutas, etapas, calibracion_ms)
+
+    if args.actualizar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as archivo:
+            json.dump({"calibracion_ms": round(calibracion_ms, 2), "latencia_ms": args.latencia_ms, "rutas": rutas}, archivo, ensure_ascii=False, indent=2)
+            archivo.write("\n")
+        print(f"\nBaseline actualizada: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nSin baseline en {args.baseline}: ejecutar con --actualizar-baseline")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as archivo:
+        baseline = json.load(archivo)
+    if baseline.get("latencia_ms", 0) != args.latencia_ms:
+        print(f"\nLa baseline se midió con {baseline.get('latencia_ms', 0)} ms de latencia sintética: no se compara")
+        return 0
+    regresiones = comparar(rutas, baseline, args.tolerancia_tiempo, args.tolerancia_memoria)
+    if regresiones:
+        print("\nREGRESIONES respecto a la baseline:")
+        for regresion in regresiones:
+            print(f"  - {regresion}")
+        return 1
+    print("\nSin regresiones respecto a la baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(principal())
@@ -0,0 +1,106 @@
+# benchmarks/carga_entrypoint.py
+# Prueba de carga: solicitudes concurrentes por proceso contra /invocations del entrypoint
+# síncrono (el runtime lo despacha con run_in_threadpool) con el límite de hilos de anyio
+# por defecto (40) vs. la app de entrypoint.py, cuyo lifespan lo sube a
+# CONCURRENCIA_MAX_SOLICITUDES. Las solicitudes pasan por el despacho real de la app
+# (httpx + ASGITransport, sin red) y los agentes se reemplazan por agentes con latencia
+# simulada, sin llamadas a Bedrock.
+#
+# Uso (desde demo-agentcore/, con la raíz del repo en PYTHONPATH para config.py):
+#   PYTHONPATH=.. python -m benchmarks.carga_entrypoint [solicitudes] [latencia_ms]
+
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+import httpx
+from bedrock_agentcore.runtime import BedrockAgentCoreApp
+
+import agents.agent_pool as agent_pool
+import entrypoint
+
+SOLICITUDES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+LATENCIA_SEGUNDOS = (int(sys.argv[2]) if len(sys.argv) > 2 else 300) / 1000
+
+
+class _ResultadoSimulado:
+    def __init__(self, texto):
+        self.message = {"role": "assistant", "content": [{"text": texto}]}
+
+
+class AgenteSimulado:
+    """
+    Agente con la latencia de una llamada al modelo (bloquea el hilo como el SDK real)
+    """
+
+    def __init__(self, **kwargs):
+        pass
+
+    def __call__(self, prompt):
+        time.sleep(LATENCIA_SEGUNDOS)
+        return _ResultadoSimulado("Cliente verificado. ¿Qué tipo de crédito necesita?")
+
+    def structured_output(self, modelo_salida, prompt):
+        raise NotImplementedError("sin salida estructurada en la prueba de carga")
+
+
+def payload(i):
+    # Ruta determinista al verificador: una llamada al modelo por solicitud
+    return {
+        "type": "message",
+        "message": "Hola, mi NIT es 900123456-7",
+        "user_id": f"carga_{i}",
+        "conversation_context": {}
+    }
+
+
+def crear_app(handler):
+    app = BedrockAgentCoreApp()
+    app.entrypoint(handler)
+    return app
+
+
+async def medir(app):
+    """
+    Envía SOLICITUDES solicitudes concurrentes a /invocations de la app, dentro de su
+    lifespan (ASGITransport no lo ejecuta por sí solo)
+    """
+    transporte = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transporte, base_url="http://carga", timeout=None) as cliente:
+        async def enviar(datos):
+            respuesta = await cliente.post("/invocations", json=datos)
+            return respuesta.json() if respuesta.status_code == 200 else {}
+
+        inicio = time.perf_counter()
+        # Los logs del pipeline se descartan para no medir la consola
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultados = await asyncio.gather(*(enviar(payload(i)) for i in range(SOLICITUDES)))
+        duracion = time.perf_counter() - inicio
+    exitos = sum(1 for r in resultados if isinstance(r, dict) and r.get("success"))
+    return duracion, exitos
+
+
+def reportar(nombre, duracion, exitos):
+    print(f"{nombre:<30} {duracion:8.2f}s  {SOLICITUDES / duracion:8.1f} sol/s  ({exitos}/{SOLICITUDES} ok)")
+
+
+async def principal():
+    print(f"{SOLICITUDES} solicitudes concurrentes, {LATENCIA_SEGUNDOS * 1000:.0f} ms por llamada al modelo, "
+          f"{os.cpu_count()} CPUs")
+    # Primero con el límite por defecto: el lifespan de entrypoint.app lo sube para el
+    # resto del loop
+    antes, exitos = await medir(crear_app(entrypoint.invoke))
+    reportar("límite por defecto (40)", antes, exitos)
+    despues, exitos = await medir(entrypoint.app)
+    reportar(f"límite {entrypoint.CONCURRENCIA_MAX_SOLICITUDES}", despues, exitos)
+    print(f"Mejora: {antes / despues:.1f}x")
+
+
+if __name__ == "__main__":
+    agent_pool.FABRICAS_AGENTES = {nombre: AgenteSimulado for nombre in agent_pool.FABRICAS_AGENTES}
+    agent_pool.CACHE_RESPUESTAS = False
+    asyncio.run(principal())
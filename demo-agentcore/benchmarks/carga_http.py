@@ -0,0 +1,112 @@
+# benchmarks/carga_http.py
+# Prueba de carga de punta a punta contra el contenedor (BedrockAgentCoreApp en :8080)
+# con el modelo mock: envía los payloads de corpus_pipeline.jsonl a /invocations con N
+# clientes concurrentes y reporta throughput, latencias por ruta y errores.
+#
+# Uso (desde demo-agentcore/, con la raíz del repo en PYTHONPATH para config.py):
+#   python -m benchmarks.modelo_mock --mediana-ms 900 --prob-throttling 0.02 &
+#   MODEL_PROVIDER=mock python -m entrypoint &        (o el contenedor con esas variables)
+#   PYTHONPATH=.. python -m benchmarks.carga_http --concurrencia 64 --duracion 60
+
+import argparse
+import copy
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.telemetria_utils import percentil
+
+RUTA_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus_pipeline.jsonl")
+
+
+def cargar_corpus():
+    with open(RUTA_CORPUS, encoding="utf-8") as archivo:
+        return [json.loads(linea) for linea in archivo if linea.strip()]
+
+
+def enviar(url, payload, timeout):
+    datos = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    solicitud = urllib.request.Request(url, data=datos, headers={"Content-Type": "application/json"})
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(solicitud, timeout=timeout) as respuesta:
+            cuerpo = json.loads(respuesta.read() or b"{}")
+        exito = not isinstance(cuerpo, dict) or cuerpo.get("success", True)
+        return (time.perf_counter() - inicio) * 1000, "ok" if exito else "fallida"
+    except urllib.error.HTTPError as e:
+        return (time.perf_counter() - inicio) * 1000, f"http_{e.code}"
+    except Exception as e:
+        return (time.perf_counter() - inicio) * 1000, type(e).__name__
+
+
+def cliente(indice, corpus, args, fin, resultados, lock):
+    """
+    Envía solicitudes en bucle (recorriendo el corpus) hasta el fin de la prueba
+    """
+    i = indice
+    while time.monotonic() < fin:
+        caso = corpus[i % len(corpus)]
+        payload = copy.deepcopy(caso["payload"])
+        payload["user_id"] = f"carga_{indice}_{i}"
+        latencia_ms, estado = enviar(args.url, payload, args.timeout)
+        with lock:
+            resultados[caso["ruta"]].append((latencia_ms, estado))
+        i += len(corpus)
+
+
+def estadisticas_mock(url_mock):
+    try:
+        with urllib.request.urlopen(f"{url_mock}/estadisticas", timeout=5) as respuesta:
+            return json.loads(respuesta.read())
+    except Exception:
+        return None
+
+
+def principal():
+    parser = argparse.ArgumentParser(description="Carga HTTP sobre /invocations con el modelo mock")
+    parser.add_argument("--url", default="http://localhost:8080/invocations")
+    parser.add_argument("--url-mock", default="http://localhost:8089")
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--duracion", type=float, default=30, help="segundos de carga")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    corpus = cargar_corpus()
+    resultados = defaultdict(list)
+    lock = threading.Lock()
+
+    print(f"{args.concurrencia} clientes durante {args.duracion:.0f}s contra {args.url}")
+    inicio = time.perf_counter()
+    fin = time.monotonic() + args.duracion
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as executor:
+        for indice in range(args.concurrencia):
+            executor.submit(cliente, indice, corpus, args, fin, resultados, lock)
+    duracion = time.perf_counter() - inicio
+
+    total = sum(len(muestras) for muestras in resultados.values())
+    print(f"\n{total} solicitudes en {duracion:.1f}s: {total / duracion:.1f} sol/s\n")
+    print(f"{'ruta':<18} {'total':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errores':>8}")
+    for ruta, muestras in sorted(resultados.items()):
+        latencias = sorted(latencia for latencia, _ in muestras)
+        errores = sum(1 for _, estado in muestras if estado != "ok")
+        print(f"{ruta:<18} {len(muestras):>7} {percentil(latencias, 50):>9.0f} {percentil(latencias, 95):>9.0f} "
+              f"{percentil(latencias, 99):>9.0f} {errores:>8}")
+
+    estados = defaultdict(int)
+    for muestras in resultados.values():
+        for _, estado in muestras:
+            estados[estado] += 1
+    print(f"\nEstados: {dict(estados)}")
+
+    mock = estadisticas_mock(args.url_mock)
+    if mock:
+        print(f"Modelo mock: {json.dumps(mock, ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    principal()
@@ -0,0 +1,287 @@
+# benchmarks/modelo_mock.py
+# Servidor local que imita la API Converse / ConverseStream de Bedrock Runtime para
+# pruebas de carga del entrypoint completo sin credenciales ni consumo de tokens.
+#
+# Responde según el agente (detectado por su system prompt) con las salidas de
+# respuestas_grabadas.json: JSON de routing, ratios, scoring y buró, o texto de oferta,
+# verificación y conversación. Con toolConfig (salida estructurada) responde con un
+# toolUse de la herramienta pedida. La latencia sigue una distribución configurable y
+# se pueden inyectar errores (throttling, 5xx) y respuestas lentas.
+#
+# Uso (desde demo-agentcore/):
+#   python -m benchmarks.modelo_mock --puerto 8089 --latencia lognormal --mediana-ms 900
+#   MODEL_PROVIDER=mock MODEL_ENDPOINT_URL=http://localhost:8089 python ../entrypoint.py
+#
+# GET /estadisticas devuelve las llamadas atendidas por agente y los errores inyectados.
+
+import argparse
+import json
+import os
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RUTA_RESPUESTAS = os.path.join(DIRECTORIO, "respuestas_grabadas.json")
+
+with open(RUTA_RESPUESTAS, encoding="utf-8") as archivo:
+    RESPUESTAS_GRABADAS = json.load(archivo)
+
+# Marca del system prompt de cada agente (el conversacional es el caso por defecto)
+MARCAS_AGENTES = (
+    ("ORQUESTADOR", "orquestador"),
+    ("AGENTE FINANCIERO", "financiero"),
+    ("AGENTE SCORING", "scoring"),
+    ("AGENTE BURÓ", "buro"),
+    ("AGENTE OFERTADOR", "ofertador"),
+    ("AGENTE VERIFICADOR", "verificador")
+)
+
+# Errores de Bedrock que se pueden inyectar: (status HTTP, x-amzn-ErrorType)
+ERRORES_INYECTABLES = {
+    "throttling": (429, "ThrottlingException"),
+    "interno": (500, "InternalServerException"),
+    "no_disponible": (503, "ServiceUnavailableException")
+}
+
+
+class ConfiguracionMock:
+    """
+    Distribución de latencia e inyección de errores del servidor
+    """
+
+    def __init__(self, latencia="lognormal", mediana_ms=800, sigma=0.5, ms_por_token=0,
+                 prob_throttling=0.0, prob_error=0.0, prob_lenta=0.0, latencia_lenta_ms=60000, semilla=None):
+        self.latencia = latencia
+        self.mediana_ms = mediana_ms
+        self.sigma = sigma
+        self.ms_por_token = ms_por_token
+        self.prob_throttling = prob_throttling
+        self.prob_error = prob_error
+        self.prob_lenta = prob_lenta
+        self.latencia_lenta_ms = latencia_lenta_ms
+        self._random = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def muestrear_latencia_ms(self):
+        """
+        Latencia hasta el primer token: "fija", "uniforme" (±50% de la mediana) o "lognormal"
+        """
+        with self._lock:
+            if self._random.random() < self.prob_lenta:
+                return self.latencia_lenta_ms
+            if self.latencia == "fija":
+                return self.mediana_ms
+            if self.latencia == "uniforme":
+                return self._random.uniform(self.mediana_ms * 0.5, self.mediana_ms * 1.5)
+            return self._random.lognormvariate(0, self.sigma) * self.mediana_ms
+
+    def muestrear_error(self):
+        with self._lock:
+            sorteo = self._random.random()
+            if sorteo < self.prob_throttling:
+                return "throttling"
+            if sorteo < self.prob_throttling + self.prob_error:
+                return self._random.choice(("interno", "no_disponible"))
+            return None
+
+
+_lock_estadisticas = threading.Lock()
+ESTADISTICAS = {"llamadas": {}, "errores": {}, "streaming": 0, "estructuradas": 0}
+
+
+def _contar(grupo, clave):
+    with _lock_estadisticas:
+        ESTADISTICAS[grupo][clave] = ESTADISTICAS[grupo].get(clave, 0) + 1
+
+
+def detectar_agente(cuerpo):
+    system_prompt = " ".join(bloque.get("text", "") for bloque in cuerpo.get("system", []))
+    for marca, agente in MARCAS_AGENTES:
+        if marca in system_prompt:
+            return agente
+    return "conversacional"
+
+
+def estimar_tokens_cuerpo(cuerpo):
+    return max(1, len(json.dumps(cuerpo, ensure_ascii=False)) // 4)
+
+
+def construir_contenido(agente, cuerpo):
+    """
+    Bloque de contenido de la respuesta: toolUse si se pidió salida estructurada, texto si no
+
+    Returns:
+        (bloque, stop_reason)
+    """
+    respuesta = RESPUESTAS_GRABADAS.get(agente, RESPUESTAS_GRABADAS["conversacional"])
+    herramientas = (cuerpo.get("toolConfig") or {}).get("tools") or []
+    if herramientas:
+        nombre = herramientas[0]["toolSpec"]["name"]
+        entrada = respuesta.get("estructurada", {})
+        return {"toolUse": {"toolUseId": f"tooluse_{uuid.uuid4().hex[:20]}", "name": nombre, "input": entrada}}, "tool_use"
+    return {"text": respuesta["texto"]}, "end_turn"
+
+
+def codificar_evento(tipo, payload):
+    """
+    Mensaje en formato application/vnd.amazon.eventstream (preludio, headers, payload y CRCs)
+    """
+    headers = b""
+    for nombre, valor in ((":event-type", tipo), (":content-type", "application/json"), (":message-type", "event")):
+        nombre_bytes = nombre.encode("utf-8")
+        valor_bytes = valor.encode("utf-8")
+        headers += struct.pack(">B", len(nombre_bytes)) + nombre_bytes + struct.pack(">BH", 7, len(valor_bytes)) + valor_bytes
+
+    datos = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    preludio = struct.pack(">II", 12 + len(headers) + len(datos) + 4, len(headers))
+    mensaje = preludio + struct.pack(">I", zlib.crc32(preludio)) + headers + datos
+    return mensaje + struct.pack(">I", zlib.crc32(mensaje))
+
+
+def eventos_stream(bloque, stop_reason, uso, latencia_ms):
+    """
+    Secuencia de eventos de ConverseStream para un bloque de contenido
+    """
+    yield "messageStart", {"role": "assistant"}
+    if "toolUse" in bloque:
+        herramienta = bloque["toolUse"]
+        yield "contentBlockStart", {"contentBlockIndex": 0, "start": {"toolUse": {"toolUseId": herramienta["toolUseId"], "name": herramienta["name"]}}}
+        yield "contentBlockDelta", {"contentBlockIndex": 0, "delta": {"toolUse": {"input": json.dumps(herramienta["input"], ensure_ascii=False)}}}
+    else:
+        palabras = bloque["text"].split(" ")
+        for indice, palabra in enumerate(palabras):
+            yield "contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": palabra if indice == 0 else f" {palabra}"}}
+    yield "contentBlockStop", {"contentBlockIndex": 0}
+    yield "messageStop", {"stopReason": stop_reason}
+    yield "metadata", {"usage": uso, "metrics": {"latencyMs": int(latencia_ms)}}
+
+
+class ManejadorConverse(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    configuracion = ConfiguracionMock()
+
+    def log_message(self, formato, *args):
+        pass  # sin una línea por solicitud: el servidor se usa bajo carga
+
+    def _responder_json(self, status, cuerpo, headers=None):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        for nombre, valor in (headers or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _escribir_chunk(self, datos):
+        self.wfile.write(f"{len(datos):X}\r\n".encode("ascii") + datos + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/estadisticas":
+            with _lock_estadisticas:
+                self._responder_json(200, ESTADISTICAS)
+        else:
+            self._responder_json(404, {"message": "No encontrado"})
+
+    def do_POST(self):
+        partes = unquote(self.path).strip("/").split("/")
+        if len(partes) < 3 or partes[0] != "model" or partes[-1] not in ("converse", "converse-stream"):
+            self._responder_json(404, {"message": f"Operación no soportada: {self.path}"})
+            return
+
+        cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        agente = detectar_agente(cuerpo)
+        streaming = partes[-1] == "converse-stream"
+        configuracion = self.configuracion
+
+        error = configuracion.muestrear_error()
+        if error:
+            _contar("errores", error)
+            status, tipo_error = ERRORES_INYECTABLES[error]
+            self._responder_json(status, {"message": f"Error inyectado: {tipo_error}"}, {"x-amzn-ErrorType": tipo_error})
+            return
+
+        _contar("llamadas", agente)
+        latencia_ms = configuracion.muestrear_latencia_ms()
+        time.sleep(latencia_ms / 1000)
+
+        bloque, stop_reason = construir_contenido(agente, cuerpo)
+        tokens_entrada = estimar_tokens_cuerpo(cuerpo)
+        tokens_salida = max(1, len(json.dumps(bloque, ensure_ascii=False)) // 4)
+        uso = {"inputTokens": tokens_entrada, "outputTokens": tokens_salida, "totalTokens": tokens_entrada + tokens_salida}
+
+        if stop_reason == "tool_use":
+            with _lock_estadisticas:
+                ESTADISTICAS["estructuradas"] += 1
+
+        if not streaming:
+            self._responder_json(200, {
+                "output": {"message": {"role": "assistant", "content": [bloque]}},
+                "stopReason": stop_reason,
+                "usage": uso,
+                "metrics": {"latencyMs": int(latencia_ms)}
+            })
+            return
+
+        with _lock_estadisticas:
+            ESTADISTICAS["streaming"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for tipo, payload in eventos_stream(bloque, stop_reason, uso, latencia_ms):
+            if tipo == "contentBlockDelta" and configuracion.ms_por_token:
+                time.sleep(configuracion.ms_por_token / 1000)
+            self._escribir_chunk(codificar_evento(tipo, payload))
+        self._escribir_chunk(b"")
+
+
+def crear_servidor(puerto=8089, configuracion=None, host="127.0.0.1"):
+    """
+    Servidor listo para serve_forever() (un hilo por conexión)
+    """
+    manejador = type("Manejador", (ManejadorConverse,), {"configuracion": configuracion or ConfiguracionMock()})
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def principal():
+    parser = argparse.ArgumentParser(description="Servidor mock de Bedrock Converse para pruebas de carga")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8089)
+    parser.add_argument("--latencia", choices=("fija", "uniforme", "lognormal"), default="lognormal")
+    parser.add_argument("--mediana-ms", type=float, default=800, help="latencia hasta el primer token")
+    parser.add_argument("--sigma", type=float, default=0.5, help="dispersión de la distribución lognormal")
+    parser.add_argument("--ms-por-token", type=float, default=0, help="pausa entre eventos de texto en streaming")
+    parser.add_argument("--prob-throttling", type=float, default=0.0, help="fracción de llamadas con ThrottlingException")
+    parser.add_argument("--prob-error", type=float, default=0.0, help="fracción de llamadas con error 500/503")
+    parser.add_argument("--prob-lenta", type=float, default=0.0, help="fracción de llamadas con latencia --latencia-lenta-ms")
+    parser.add_argument("--latencia-lenta-ms", type=float, default=60000)
+    parser.add_argument("--semilla", type=int, default=None)
+    args = parser.parse_args()
+
+    configuracion = ConfiguracionMock(
+        latencia=args.latencia, mediana_ms=args.mediana_ms, sigma=args.sigma, ms_por_token=args.ms_por_token,
+        prob_throttling=args.prob_throttling, prob_error=args.prob_error, prob_lenta=args.prob_lenta,
+        latencia_lenta_ms=args.latencia_lenta_ms, semilla=args.semilla
+    )
+    servidor = crear_servidor(args.puerto, configuracion, args.host)
+    print(f"[LOG] Modelo mock en http://{args.host}:{args.puerto} (latencia {args.latencia}, mediana {args.mediana_ms:.0f} ms)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    principal()
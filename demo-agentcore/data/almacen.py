@@ -0,0 +1,345 @@
+# data/almacen.py
+# Almacenamiento de clientes y reportes de buró indexado por NIT normalizado
+#
+# Carga masiva (sin reconstruir la imagen), con la raíz y demo-agentcore/ en PYTHONPATH:
+#   python -m data.almacen clientes cartera.csv
+#   python -m data.almacen buro reportes.jsonl
+
+import contextvars
+import csv
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import ALMACEN_BACKEND, ALMACEN_RUTA_SQLITE
+from .nit import parsear_nit
+
+# Logger plano bajo la raíz "creditbot" (ver utils/log_utils.py): importar utils desde
+# data/ cierra un ciclo utils/__init__ → verificador_utils → data.clientes_bd
+logger = logging.getLogger(f"creditbot.{__name__}")
+
+
+def clave_nit(nit):
+    """
+    Clave de indexación: la base del NIT como entero (None si el texto no es un NIT)
+    """
+    nit_normalizado = parsear_nit(nit)
+    return nit_normalizado.clave if nit_normalizado else None
+
+
+class AlmacenDict:
+    """
+    Backend en memoria sobre un dict literal (fixture de la demo)
+    """
+
+    def __init__(self, registros):
+        self._registros = registros
+        self._indice = {}
+        for nit, registro in registros.items():
+            clave = clave_nit(nit)
+            if clave is not None:
+                self._indice[clave] = registro
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def obtener(self, nit):
+        clave = clave_nit(nit)
+        return self._indice.get(clave) if clave is not None else None
+
+    def cargar_registros(self, registros):
+        """
+        Agrega o reemplaza registros {nit: datos}
+        """
+        with self._lock:
+            for nit, datos in registros.items():
+                clave = clave_nit(nit)
+                if clave is None:
+                    continue
+                self._registros[nit] = datos
+                self._indice[clave] = datos
+            self.version += 1
+        return len(registros)
+
+    def iterar(self):
+        return iter(list(self._registros.values()))
+
+    def iterar_con_nit(self):
+        return iter(list(self._registros.items()))
+
+    def tamano(self):
+        return len(self._indice)
+
+
+class AlmacenSQLite:
+    """
+    Backend SQLite: una fila por NIT con clave primaria (B-tree, búsqueda O(log n)) y
+    los datos como JSON, que solo se decodifica para la fila consultada
+    """
+
+    def __init__(self, ruta, tabla):
+        if not tabla.isidentifier():
+            raise ValueError(f"Nombre de tabla inválido: {tabla}")
+
+        self.ruta = ruta
+        self.tabla = tabla
+        self._lock = threading.Lock()
+
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute(
+            f"CREATE TABLE IF NOT EXISTS {tabla} ("
+            " clave INTEGER PRIMARY KEY,"
+            " nit TEXT NOT NULL,"
+            " datos TEXT NOT NULL)"
+        )
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS versiones (tabla TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+        self._conexion.commit()
+
+    @property
+    def version(self):
+        """
+        Versión de la tabla: cambia con cada carga (también si la hace otro proceso)
+        """
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT version FROM versiones WHERE tabla = ?", (self.tabla,)
+            ).fetchone()
+        return fila[0] if fila else 0
+
+    def obtener(self, nit):
+        clave = clave_nit(nit)
+        if clave is None:
+            return None
+        with self._lock:
+            fila = self._conexion.execute(
+                f"SELECT datos FROM {self.tabla} WHERE clave = ?", (clave,)
+            ).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def vacio(self):
+        with self._lock:
+            return self._conexion.execute(f"SELECT 1 FROM {self.tabla} LIMIT 1").fetchone() is None
+
+    def _insertar(self, filas):
+        """
+        Inserta (nit, datos) en una sola transacción y sube la versión de la tabla
+        Las filas con NIT inválido se omiten
+        """
+        total = 0
+        omitidos = 0
+        with self._lock:
+            with self._conexion:
+                for nit, datos in filas:
+                    nit_normalizado = parsear_nit(nit)
+                    if nit_normalizado is None:
+                        omitidos += 1
+                        continue
+                    self._conexion.execute(
+                        f"INSERT OR REPLACE INTO {self.tabla} (clave, nit, datos) VALUES (?, ?, ?)",
+                        (nit_normalizado.clave, nit_normalizado.formateado, json.dumps(datos, ensure_ascii=False))
+                    )
+                    total += 1
+                self._conexion.execute(
+                    "INSERT INTO versiones (tabla, version) VALUES (?, 1)"
+                    " ON CONFLICT(tabla) DO UPDATE SET version = version + 1",
+                    (self.tabla,)
+                )
+        if omitidos:
+            logger.warning("Almacén %s: %s filas omitidas por NIT inválido", self.tabla, omitidos)
+        return total
+
+    def cargar_registros(self, registros):
+        """
+        Agrega o reemplaza registros {nit: datos}
+        """
+        return self._insertar(registros.items())
+
+    def cargar_jsonl(self, ruta, campo_nit="nit"):
+        """
+        Carga un archivo JSONL (un objeto por línea con el NIT en campo_nit)
+        """
+        def filas():
+            with open(ruta, encoding="utf-8") as archivo:
+                for linea in archivo:
+                    if linea.strip():
+                        datos = json.loads(linea)
+                        yield datos.pop(campo_nit), datos
+
+        return self._insertar(filas())
+
+    def cargar_csv(self, ruta, campo_nit="nit"):
+        """
+        Carga un CSV con encabezados; las celdas con JSON (listas, dicts, números,
+        true/false/null) se decodifican, el resto se guarda como texto
+        """
+        def filas():
+            with open(ruta, encoding="utf-8", newline="") as archivo:
+                for fila in csv.DictReader(archivo):
+                    nit = fila.pop(campo_nit)
+                    yield nit, {columna: _valor_csv(valor) for columna, valor in fila.items()}
+
+        return self._insertar(filas())
+
+    def iterar(self):
+        """
+        Recorre los registros decodificando una fila a la vez
+        """
+        with self._lock:
+            filas = self._conexion.execute(f"SELECT datos FROM {self.tabla}").fetchall()
+        for (datos,) in filas:
+            yield json.loads(datos)
+
+    def iterar_con_nit(self):
+        """
+        Recorre los pares (nit, datos) decodificando una fila a la vez
+        """
+        with self._lock:
+            filas = self._conexion.execute(f"SELECT nit, datos FROM {self.tabla}").fetchall()
+        for nit, datos in filas:
+            yield nit, json.loads(datos)
+
+    def tamano(self):
+        with self._lock:
+            return self._conexion.execute(f"SELECT COUNT(*) FROM {self.tabla}").fetchone()[0]
+
+
+def _valor_csv(valor):
+    if valor is None or valor == "":
+        return None
+    try:
+        return json.loads(valor)
+    except ValueError:
+        return valor
+
+
+# Resultados ya resueltos en la solicitud en curso: {nombre_consulta: {"version", "valores"}}
+_consultas_solicitud = contextvars.ContextVar("consultas_solicitud", default=None)
+
+_NO_ENCONTRADO = object()
+
+
+@contextmanager
+def contexto_consultas():
+    """
+    Abre el ámbito de una solicitud: dentro de él cada NIT se resuelve una sola vez
+    (los hilos que copian el contexto, como el de buró, comparten el mismo ámbito)
+    """
+    token = _consultas_solicitud.set({})
+    try:
+        yield
+    finally:
+        _consultas_solicitud.reset(token)
+
+
+class ConsultaMemoizada:
+    """
+    Consulta por NIT con dos niveles de memo: la solicitud en curso y un LRU del proceso.
+    Las entradas del LRU se invalidan cuando cambia la versión del almacén.
+    """
+
+    def __init__(self, almacen, nombre, max_entradas=4096):
+        self.almacen = almacen
+        self.nombre = nombre
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # clave -> (version, registro)
+        self._lock = threading.Lock()
+        self.estadisticas = {"hits_solicitud": 0, "hits_proceso": 0, "misses": 0}
+
+    def _ambito_solicitud(self):
+        ambitos = _consultas_solicitud.get()
+        if ambitos is None:
+            return None
+        ambito = ambitos.get(self.nombre)
+        if ambito is None:
+            # La versión del almacén se lee una vez por solicitud
+            ambito = ambitos.setdefault(self.nombre, {"version": self.almacen.version, "valores": {}})
+        return ambito
+
+    def obtener(self, nit):
+        """
+        Registro del NIT (None si no existe)
+        """
+        clave = clave_nit(nit)
+        if clave is None:
+            return None
+        ambito = self._ambito_solicitud()
+
+        if ambito is not None:
+            registro = ambito["valores"].get(clave)
+            if registro is not None:
+                self.estadisticas["hits_solicitud"] += 1
+                return None if registro is _NO_ENCONTRADO else registro
+            version = ambito["version"]
+        else:
+            version = self.almacen.version
+
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] == version:
+                self._entradas.move_to_end(clave)
+                registro = entrada[1]
+                self.estadisticas["hits_proceso"] += 1
+            else:
+                registro = None
+
+        if registro is None:
+            registro = self.almacen.obtener(nit)
+            if registro is None:
+                registro = _NO_ENCONTRADO
+            with self._lock:
+                self.estadisticas["misses"] += 1
+                self._entradas[clave] = (version, registro)
+                self._entradas.move_to_end(clave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+
+        if ambito is not None:
+            ambito["valores"][clave] = registro
+
+        return None if registro is _NO_ENCONTRADO else registro
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+def crear_almacen(tabla, fixture):
+    """
+    Crea el almacén configurado (ALMACEN_BACKEND); el dict fixture sirve de datos de
+    demo y siembra la tabla SQLite si está vacía
+    """
+    if ALMACEN_BACKEND == "sqlite":
+        almacen = AlmacenSQLite(ALMACEN_RUTA_SQLITE, tabla)
+        if almacen.vacio():
+            almacen.cargar_registros(fixture)
+            logger.info("Almacén %s: sembrado con %s registros de demo", tabla, len(fixture))
+        return almacen
+
+    return AlmacenDict(fixture)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Carga masiva de clientes o reportes de buró")
+    parser.add_argument("tabla", choices=["clientes", "buro"])
+    parser.add_argument("archivo", help="Archivo .csv o .jsonl")
+    parser.add_argument("--campo-nit", default="nit")
+    parser.add_argument("--ruta", default=ALMACEN_RUTA_SQLITE)
+    args = parser.parse_args()
+
+    destino = AlmacenSQLite(args.ruta, args.tabla)
+    if args.archivo.endswith(".csv"):
+        cargados = destino.cargar_csv(args.archivo, args.campo_nit)
+    else:
+        cargados = destino.cargar_jsonl(args.archivo, args.campo_nit)
+    print(f"[LOG] {cargados} registros cargados en {args.ruta}:{args.tabla} (versión {destino.version})")
@@ -4,6 +4,8 @@
 import random
 from datetime import datetime, timedelta
 
+from .almacen import crear_almacen
+
 REPORTES_BURO = {
     # CLIENTES EXISTENTES DE NUESTRO BANCO
     "900123456-7": {  # Constructora Los Andes - Cliente premium
@@ -268,6 +270,9 @@ REPORTES_BURO = {
     }
 }
 
+# REPORTES_BURO queda como fixture de demo; las consultas pasan por el almacén
+ALMACEN_BURO = crear_almacen("buro", REPORTES_BURO)
+
 def consultar_buro(nit):
     """
     Simula la consulta a centrales de riesgo colombianas
@@ -278,17 +283,8 @@ def consultar_buro(nit):
     Returns:
         dict: Reporte completo de buró o None si no existe información
     """
-    # Limpiar el NIT
-    nit_limpio = nit.strip().replace("-", "").replace(".", "").replace(" ", "")
-    
-    # Formatear NIT
-    if len(nit_limpio) >= 9 and "-" not in nit:
-        nit_formateado = f"{nit_limpio[:-1]}-{nit_limpio[-1]}"
-    else:
-        nit_formateado = nit
-    
-    # Buscar en reportes de buró
-    reporte = REPORTES_BURO.get(nit_formateado)
+    # Búsqueda indexada por NIT normalizado (dict de demo o SQLite, según config)
+    reporte = ALMACEN_BURO.obtener(nit)
     
     if reporte:
         return reporte
@@ -1,6 +1,9 @@
 # data/clientes_bd.py
 # Simulación de base de datos interna de la entidad financiera
 
+from config import CACHE_CLIENTES_MAX
+from .almacen import crear_almacen, ConsultaMemoizada
+
 CLIENTES_BD = {
     # CLIENTES EXISTENTES - PERFIL PREMIUM
     "900123456-7": {
@@ -128,6 +131,12 @@ CLIENTES_BD = {
     }
 }
 
+# CLIENTES_BD queda como fixture de demo; las consultas pasan por el almacén
+ALMACEN_CLIENTES = crear_almacen("clientes", CLIENTES_BD)
+
+# Cada NIT se resuelve una vez por solicitud; entre solicitudes, LRU invalidado por versión
+CONSULTA_CLIENTES = ConsultaMemoizada(ALMACEN_CLIENTES, "clientes", CACHE_CLIENTES_MAX)
+
 def consultar_cliente(nit):
     """
     Simula la consulta a la base de datos interna de la entidad financiera
@@ -138,17 +147,8 @@ def consultar_cliente(nit):
     Returns:
         dict: Información del cliente o indicación de no encontrado
     """
-    # Limpiar el NIT de espacios y caracteres especiales
-    nit_limpio = nit.strip().replace("-", "").replace(".", "").replace(" ", "")
-    
-    # Agregar guión antes del último dígito si no lo tiene
-    if len(nit_limpio) >= 9 and "-" not in nit:
-        nit_formateado = f"{nit_limpio[:-1]}-{nit_limpio[-1]}"
-    else:
-        nit_formateado = nit
-    
-    # Buscar en la base de datos
-    cliente = CLIENTES_BD.get(nit_formateado)
+    # Búsqueda indexada por NIT normalizado (dict de demo o SQLite, según config)
+    cliente = CONSULTA_CLIENTES.obtener(nit)
     
     if cliente:
         return cliente
@@ -161,21 +161,29 @@ def consultar_cliente(nit):
             "observaciones": "Empresa nueva o información por verificar"
         }
 
+def nits_clientes_activos():
+    """
+    NITs de los clientes existentes (es_cliente=True), para la reevaluación de cartera
+    """
+    return [nit for nit, cliente in ALMACEN_CLIENTES.iterar_con_nit() if cliente.get("es_cliente", False)]
+
 def obtener_estadisticas_bd():
     """
     Obtiene estadísticas generales de la base de datos para reporting
     """
-    clientes_activos = sum(1 for c in CLIENTES_BD.values() if c.get("es_cliente", False))
-    prospectos = sum(1 for c in CLIENTES_BD.values() if not c.get("es_cliente", False))
-    
+    clientes_activos = 0
+    prospectos = 0
     sectores = {}
-    for cliente in CLIENTES_BD.values():
+    for cliente in ALMACEN_CLIENTES.iterar():
         if cliente.get("es_cliente", False):
+            clientes_activos += 1
             sector = cliente.get("sector", "no_definido")
             sectores[sector] = sectores.get(sector, 0) + 1
+        else:
+            prospectos += 1
     
     return {
-        "total_registros": len(CLIENTES_BD),
+        "total_registros": clientes_activos + prospectos,
         "clientes_activos": clientes_activos,
         "prospectos": prospectos,
         "sectores_activos": sectores
@@ -0,0 +1,82 @@
+# data/nit.py
+# NIT colombiano: normalización única, dígito de verificación DIAN y clave entera de indexación
+
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# Pesos DIAN, aplicados desde el dígito menos significativo de la base
+PESOS_DIAN = (3, 7, 13, 17, 19, 23, 29, 37, 41, 43, 47, 53, 59, 67, 71)
+
+_CARACTERES_IGNORADOS = str.maketrans("", "", ". \t")
+
+
+def calcular_digito_verificacion(base):
+    """
+    Dígito de verificación DIAN (módulo 11) de la base del NIT
+    """
+    suma = sum(int(digito) * peso for digito, peso in zip(reversed(base), PESOS_DIAN))
+    residuo = suma % 11
+    return residuo if residuo < 2 else 11 - residuo
+
+
+class NIT(NamedTuple):
+    """
+    NIT ya normalizado
+
+    base: dígitos sin el de verificación ("900123456")
+    dv: dígito de verificación informado (None si no vino)
+    clave: base como entero, clave canónica para almacenamiento e índices
+    """
+    base: str
+    dv: Optional[int]
+    clave: int
+
+    @property
+    def dv_calculado(self):
+        return calcular_digito_verificacion(self.base)
+
+    @property
+    def dv_valido(self):
+        """
+        True si no se informó DV o si coincide con el calculado
+        """
+        return self.dv is None or self.dv == self.dv_calculado
+
+    @property
+    def formateado(self):
+        """
+        Forma canónica "base-dv" (con el DV calculado si no se informó)
+        """
+        return f"{self.base}-{self.dv if self.dv is not None else self.dv_calculado}"
+
+
+@lru_cache(maxsize=4096)
+def parsear_nit(texto):
+    """
+    Normaliza un NIT escrito como "900123456-7", "900.123.456-7", "9001234567" o "900123456"
+
+    Sin guión, 10 dígitos se leen como base + DV y hasta 9 dígitos como base sin DV.
+
+    Returns:
+        NIT o None si no tiene forma de NIT
+    """
+    if texto is None:
+        return None
+
+    limpio = str(texto).strip().translate(_CARACTERES_IGNORADOS)
+
+    if "-" in limpio:
+        base, _, dv = limpio.partition("-")
+        if len(dv) != 1 or not dv.isdecimal():
+            return None
+        dv = int(dv)
+    elif len(limpio) == 10 and limpio.isdecimal():
+        base, dv = limpio[:-1], int(limpio[-1])
+    else:
+        base, dv = limpio, None
+
+    # Entre 8 y 10 dígitos en total, contando el DV
+    if not base.isdecimal() or not 8 <= len(base) + (dv is not None) <= 10:
+        return None
+
+    return NIT(base=base, dv=dv, clave=int(base))
@@ -0,0 +1,8 @@
+# tests/conftest.py
+# Los paquetes (agents, utils, data) viven en demo-agentcore; el utils.py de la raíz del
+# repo no debe ocultar el paquete utils
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
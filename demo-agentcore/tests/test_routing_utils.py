@@ -0,0 +1,59 @@
+# tests/test_routing_utils.py
+# Routing determinista con una oferta pendiente de respuesta
+
+import pytest
+
+from utils.routing_utils import decidir_ruta_determinista
+from utils.ofertador_utils import procesar_respuesta_continuidad
+
+CONTEXTO_ESPERANDO = {
+    "analysis_completed": True,
+    "decision": "approved",
+    "stage": "esperando_respuesta_oferta",
+}
+
+
+def _ruta(message, contexto):
+    return decidir_ruta_determinista({
+        "type": "message",
+        "message": message,
+        "conversation_context": contexto,
+    })[0]
+
+
+@pytest.mark.parametrize("message", [
+    "necesito saber la tasa exacta",
+    "¿y si pago antes?",
+    "no sé, déjame revisarlo",
+    "sí, pero ahora no",
+])
+def test_respuesta_no_clara_queda_para_el_orquestador(message):
+    assert procesar_respuesta_continuidad(message)["decision"] == "UNCLEAR"
+    assert _ruta(message, CONTEXTO_ESPERANDO) is None
+
+
+@pytest.mark.parametrize("message, decision", [
+    ("Sí, acepto la oferta", "SI"),
+    ("de acuerdo", "SI"),
+    ("No, gracias", "NO"),
+    ("Ahora no", "NO"),
+])
+def test_respuesta_clara_va_al_handler_de_la_oferta(message, decision):
+    assert procesar_respuesta_continuidad(message)["decision"] == decision
+    assert _ruta(message, CONTEXTO_ESPERANDO) == "respuesta_oferta"
+
+
+@pytest.mark.parametrize("contexto", [
+    {"stage": "proceso_formalizado", "respuesta_cliente": "SI"},
+    {"stage": "oferta_declinada", "respuesta_cliente": "NO"},
+    {"stage": "revision_manual_oferta", "oferta_generada": False},
+    {"stage": "conversacion_general", "oferta_generada": True},
+])
+def test_oferta_resuelta_no_vuelve_al_ofertador(contexto):
+    contexto = {"analysis_completed": True, "decision": "approved", **contexto}
+    assert _ruta("Muchas gracias", contexto) != "ofertador"
+
+
+def test_pre_aprobado_sin_oferta_va_al_ofertador():
+    contexto = {"analysis_completed": True, "decision": "approved", "stage": "post_analysis"}
+    assert _ruta("Muchas gracias", contexto) == "ofertador"
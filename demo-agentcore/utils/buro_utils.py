@@ -4,6 +4,11 @@
 import json
 from datetime import datetime
 
+from .main_utils import parse_json
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
+
 # Importar desde la estructura de paquetes
 try:
     from ..data.buro_simulado import consultar_buro, interpretar_score_buro, obtener_resumen_buro
@@ -254,13 +259,16 @@ def formatear_contexto_buro(contexto):
 def procesar_respuesta_buro(respuesta_agente, nit):
     """
     Procesa la respuesta del agente de buró y extrae información estructurada
+    (texto del modelo o dict ya validado por la salida estructurada)
     """
     try:
-        # Limpiar la respuesta de markdown si existe
-        respuesta_limpia = respuesta_agente.replace('```json', '').replace('```', '').strip()
-        
-        # Parsear JSON
-        resultado_buro = json.loads(respuesta_limpia)
+        if isinstance(respuesta_agente, dict):
+            resultado_buro = dict(respuesta_agente)
+        else:
+            # Parsear JSON (tolera markdown y texto alrededor del objeto)
+            resultado_buro = parse_json(respuesta_agente, esquema="buro")
+        if resultado_buro is None:
+            raise json.JSONDecodeError("No se encontró un objeto JSON", respuesta_agente or "", 0)
         
         # Validar campos requeridos
         campos_requeridos = [
@@ -280,8 +288,8 @@ def procesar_respuesta_buro(respuesta_agente, nit):
         return resultado_buro
         
     except json.JSONDecodeError as e:
-        print(f"[ERROR] Error parseando JSON del agente buró: {e}")
-        print(f"[ERROR] Respuesta recibida: {respuesta_agente[:200]}...")
+        logger.error("Error parseando JSON del agente buró: %s", e)
+        logger.debug("Respuesta recibida: %.200s...", respuesta_agente)
         
         # Respuesta de fallback
         return {
@@ -309,7 +317,7 @@ def procesar_respuesta_buro(respuesta_agente, nit):
         }
     
     except Exception as e:
-        print(f"[ERROR] Error inesperado procesando buró: {e}")
+        logger.exception("Error inesperado procesando buró: %s", e)
         return procesar_respuesta_buro("Error general", nit)
     
 def generar_contexto_decision(score_interno, score_buro, recomendacion_buro, decision_final):
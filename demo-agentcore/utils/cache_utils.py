@@ -0,0 +1,259 @@
+# utils/cache_utils.py
+# Cache de respuestas de agentes con entradas deterministas (buró, verificador, financiero)
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Contadores de aciertos/fallos por agente
+_lock_estadisticas = threading.Lock()
+ESTADISTICAS_CACHE = {}
+
+# Llamadas en curso por clave: los fallos simultáneos de la misma clave esperan a la primera
+_lock_en_vuelo = threading.Lock()
+_en_vuelo = {}
+
+
+def normalizar_prompt(prompt):
+    """
+    Normaliza el prompt para que diferencias de espacios no generen claves distintas
+    """
+    return " ".join(str(prompt).split())
+
+
+def clave_cache(agente, prompt):
+    """
+    Clave direccionada por contenido: hash del agente + prompt normalizado
+    """
+    contenido = f"{agente}\x00{normalizar_prompt(prompt)}"
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class CacheMemoria:
+    """
+    Backend en memoria con TTL y desalojo LRU
+    """
+
+    def __init__(self, max_entradas=1024, ttl_segundos=3600):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+
+            expira_en, valor = entrada
+            if expira_en < time.time():
+                del self._entradas[clave]
+                return None
+
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._entradas[clave] = (time.time() + self.ttl_segundos, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def tamano(self):
+        with self._lock:
+            return len(self._entradas)
+
+
+class CacheSQLite:
+    """
+    Backend en disco (SQLite) con TTL y desalojo LRU, compartible entre procesos
+    """
+
+    def __init__(self, ruta, max_entradas=10000, ttl_segundos=3600):
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._lock = threading.Lock()
+
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS respuestas ("
+            " clave TEXT PRIMARY KEY,"
+            " valor TEXT NOT NULL,"
+            " expira_en REAL NOT NULL,"
+            " accedido_en REAL NOT NULL)"
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_accedido ON respuestas (accedido_en)")
+        self._conexion.commit()
+
+    def obtener(self, clave):
+        ahora = time.time()
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT valor, expira_en FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+
+            valor, expira_en = fila
+            if expira_en < ahora:
+                self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self._conexion.commit()
+                return None
+
+            self._conexion.execute("UPDATE respuestas SET accedido_en = ? WHERE clave = ?", (ahora, clave))
+            self._conexion.commit()
+            return valor
+
+    def guardar(self, clave, valor):
+        ahora = time.time()
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, valor, expira_en, accedido_en) VALUES (?, ?, ?, ?)",
+                (clave, valor, ahora + self.ttl_segundos, ahora)
+            )
+            # Desalojar expirados y, si sobra, los menos usados recientemente
+            self._conexion.execute("DELETE FROM respuestas WHERE expira_en < ?", (ahora,))
+            self._conexion.execute(
+                "DELETE FROM respuestas WHERE clave IN ("
+                " SELECT clave FROM respuestas ORDER BY accedido_en DESC LIMIT -1 OFFSET ?)",
+                (self.max_entradas,)
+            )
+            self._conexion.commit()
+
+    def limpiar(self):
+        with self._lock:
+            self._conexion.execute("DELETE FROM respuestas")
+            self._conexion.commit()
+
+    def tamano(self):
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+
+
+_backend = None
+
+
+def configurar_cache(backend):
+    """
+    Define el backend de cache activo (CacheMemoria, CacheSQLite o compatible)
+    """
+    global _backend
+    _backend = backend
+
+
+def obtener_cache():
+    """
+    Devuelve el backend de cache activo (None si no se configuró)
+    """
+    return _backend
+
+
+def registrar_resultado_cache(agente, acierto, coalescida=False):
+    """
+    Actualiza los contadores de aciertos/fallos del agente (coalescida: la solicitud
+    esperó la llamada en curso de otra con la misma clave)
+    """
+    with _lock_estadisticas:
+        conteo = ESTADISTICAS_CACHE.setdefault(agente, {"hits": 0, "misses": 0, "coalescidas": 0})
+        if coalescida:
+            conteo["coalescidas"] += 1
+        else:
+            conteo["hits" if acierto else "misses"] += 1
+
+
+def consultar_con_cache(agente, prompt, funcion, validar=None):
+    """
+    Devuelve la respuesta cacheada para (agente, prompt) o ejecuta funcion() y la guarda
+
+    Solo se guarda una respuesta no vacía que pase validar(respuesta): una salida que no
+    se puede parsear no se sirve durante todo el TTL. Si otra solicitud ya está llamando
+    al modelo con la misma clave, se espera su resultado (o su excepción) en lugar de
+    repetir la llamada.
+
+    Args:
+        agente (str): Nombre del agente
+        prompt (str): Input enviado al agente
+        funcion (callable): Llamada real al agente, devuelve el texto de la respuesta
+        validar (callable): Opcional, True si la respuesta se puede cachear
+    """
+    if _backend is None:
+        return funcion()
+
+    clave = clave_cache(agente, prompt)
+    respuesta = _backend.obtener(clave)
+    if respuesta is not None:
+        registrar_resultado_cache(agente, True)
+        logger.debug("Cache hit para agente %s", agente)
+        return respuesta
+
+    with _lock_en_vuelo:
+        futuro = _en_vuelo.get(clave)
+        lider = futuro is None
+        if lider:
+            futuro = _en_vuelo[clave] = Future()
+
+    if not lider:
+        registrar_resultado_cache(agente, False, coalescida=True)
+        logger.debug("Llamada de %s coalescida con otra en curso", agente)
+        return futuro.result()
+
+    try:
+        # Otra solicitud pudo terminar y guardar entre la consulta y el registro en vuelo
+        respuesta = _backend.obtener(clave)
+        if respuesta is not None:
+            registrar_resultado_cache(agente, True)
+        else:
+            registrar_resultado_cache(agente, False)
+            respuesta = funcion()
+            if respuesta and (validar is None or validar(respuesta)):
+                _backend.guardar(clave, respuesta)
+            elif respuesta:
+                logger.warning("Respuesta de %s no cacheada: no pasó la validación", agente)
+        futuro.set_result(respuesta)
+        return respuesta
+    except BaseException as e:
+        futuro.set_exception(e)
+        raise
+    finally:
+        with _lock_en_vuelo:
+            _en_vuelo.pop(clave, None)
+
+
+def obtener_estadisticas_cache():
+    """
+    Aciertos, fallos y tasa de acierto por agente
+    """
+    with _lock_estadisticas:
+        por_agente = {}
+        for agente, conteo in ESTADISTICAS_CACHE.items():
+            total = conteo["hits"] + conteo["misses"] + conteo["coalescidas"]
+            por_agente[agente] = {
+                **conteo,
+                # Las coalescidas también evitaron una llamada al modelo
+                "hit_rate": round((conteo["hits"] + conteo["coalescidas"]) / total, 3) if total else 0.0
+            }
+
+    return {
+        "backend": type(_backend).__name__ if _backend else None,
+        "entradas": _backend.tamano() if _backend else 0,
+        "por_agente": por_agente
+    }
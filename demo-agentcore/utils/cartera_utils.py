@@ -0,0 +1,196 @@
+# utils/cartera_utils.py
+# Reevaluación masiva de la cartera: lista de NITs (con estados financieros opcionales)
+# evaluada por un pool de workers con paralelismo acotado, salida JSONL que sirve de
+# checkpoint para reanudar y exportación opcional a Parquet
+
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+
+from config import CARTERA_MAX_WORKERS, CARTERA_PENDIENTES_POR_WORKER, CARTERA_FSYNC_CADA
+from .verificador_utils import parsear_nit
+from .log_utils import obtener_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+logger = obtener_logger(__name__)
+
+# Columnas planas de la exportación (el resto del resultado va como JSON en "detalles")
+COLUMNAS_PARQUET = (
+    "nit", "estado", "nombre_empresa", "sector", "clasificacion_riesgo", "score_interno",
+    "fuente_score_interno", "score_buro", "recomendacion_buro", "score_combinado",
+    "decision_final", "decision", "error", "evaluado_en", "duracion_ms"
+)
+
+
+def _clave(nit):
+    nit_normalizado = parsear_nit(nit)
+    return nit_normalizado.clave if nit_normalizado else str(nit).strip()
+
+
+def cargar_nits(ruta):
+    """
+    NITs de un archivo: .csv (columna "nit"), .jsonl (campo "nit") o texto (uno por línea)
+    """
+    with open(ruta, encoding="utf-8") as archivo:
+        if ruta.endswith(".csv"):
+            return [fila["nit"] for fila in csv.DictReader(archivo) if fila.get("nit")]
+        if ruta.endswith(".jsonl"):
+            return [json.loads(linea)["nit"] for linea in archivo if linea.strip()]
+        return [linea.strip() for linea in archivo if linea.strip() and not linea.startswith("#")]
+
+
+def indexar_estados(directorio):
+    """
+    Archivos de estados financieros por NIT: <nit>.json con financial_data, tables y
+    extracted_text (la forma de un payload de documento)
+
+    Returns:
+        dict: clave del NIT -> ruta del archivo
+    """
+    if not directorio:
+        return {}
+    estados = {}
+    for nombre in os.listdir(directorio):
+        if nombre.endswith(".json"):
+            estados[_clave(nombre[:-5])] = os.path.join(directorio, nombre)
+    return estados
+
+
+def nits_procesados(ruta_salida):
+    """
+    Claves de los NITs ya evaluados en una corrida anterior (los errores se reintentan)
+    """
+    procesados = set()
+    if not os.path.exists(ruta_salida):
+        return procesados
+    with open(ruta_salida, encoding="utf-8") as archivo:
+        for linea in archivo:
+            try:
+                resultado = json.loads(linea)
+            except ValueError:
+                continue  # última línea truncada por una corrida interrumpida
+            if resultado.get("estado") != "error":
+                procesados.add(_clave(resultado["nit"]))
+    return procesados
+
+
+def _evaluar_nit(evaluar, nit, ruta_estados):
+    inicio = time.perf_counter()
+    try:
+        estados = None
+        if ruta_estados:
+            with open(ruta_estados, encoding="utf-8") as archivo:
+                estados = json.load(archivo)
+        resultado = evaluar(nit, estados)
+    except Exception as e:
+        logger.warning("Reevaluación de %s fallida: %s", nit, e)
+        resultado = {"nit": nit, "estado": "error", "error": f"{type(e).__name__}: {e}"}
+    resultado["evaluado_en"] = datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+    resultado["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    return resultado
+
+
+def reevaluar_cartera(nits, evaluar, ruta_salida, directorio_estados=None,
+                      max_workers=CARTERA_MAX_WORKERS, reanudar=True, detener=None):
+    """
+    Evalúa cada NIT con evaluar(nit, estados) en un pool de workers y agrega los
+    resultados a ruta_salida (una línea JSON por NIT, en orden de finalización)
+
+    Solo hay max_workers * CARTERA_PENDIENTES_POR_WORKER NITs en vuelo: la memoria no
+    crece con el tamaño de la cartera. Con reanudar se omiten los NITs que ya están en
+    la salida, de modo que una corrida interrumpida continúa donde quedó.
+
+    Args:
+        detener (threading.Event): si se activa, no se lanzan más NITs y se espera a
+        los que están en vuelo (la corrida queda lista para reanudar)
+
+    Returns:
+        dict: resumen de la corrida (total, omitidos, evaluados por estado, sol/s)
+    """
+    estados = indexar_estados(directorio_estados)
+    procesados = nits_procesados(ruta_salida) if reanudar else set()
+    vistos = set()
+    pendientes_nits = []
+    for nit in nits:
+        clave = _clave(nit)
+        if clave in procesados or clave in vistos:
+            continue
+        vistos.add(clave)
+        pendientes_nits.append(nit)
+
+    resumen = {"total": len(nits), "omitidos": len(nits) - len(pendientes_nits), "evaluados": 0, "por_estado": {}}
+    logger.info("Reevaluación de cartera: %s NITs, %s ya procesados o repetidos, %s workers",
+                len(nits), resumen["omitidos"], max_workers)
+
+    detener = detener or threading.Event()
+    limite_en_vuelo = max_workers * CARTERA_PENDIENTES_POR_WORKER
+    directorio = os.path.dirname(ruta_salida)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+
+    inicio = time.perf_counter()
+    siguiente = 0
+    en_vuelo = set()
+    with open(ruta_salida, "a", encoding="utf-8") as salida, \
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cartera") as executor:
+        while en_vuelo or (siguiente < len(pendientes_nits) and not detener.is_set()):
+            while siguiente < len(pendientes_nits) and len(en_vuelo) < limite_en_vuelo and not detener.is_set():
+                nit = pendientes_nits[siguiente]
+                en_vuelo.add(executor.submit(_evaluar_nit, evaluar, nit, estados.get(_clave(nit))))
+                siguiente += 1
+
+            terminados, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                resultado = futuro.result()
+                # Solo este hilo escribe: cada línea queda completa antes de la siguiente
+                salida.write(json.dumps(resultado, ensure_ascii=False, default=str) + "\n")
+                salida.flush()
+                resumen["evaluados"] += 1
+                estado = resultado.get("estado", "ok")
+                resumen["por_estado"][estado] = resumen["por_estado"].get(estado, 0) + 1
+                if resumen["evaluados"] % CARTERA_FSYNC_CADA == 0:
+                    os.fsync(salida.fileno())
+                    transcurrido = time.perf_counter() - inicio
+                    logger.info("Cartera: %s/%s evaluados (%.1f NIT/s)", resumen["evaluados"],
+                                len(pendientes_nits), resumen["evaluados"] / transcurrido)
+        os.fsync(salida.fileno())
+
+    duracion = time.perf_counter() - inicio
+    resumen["interrumpida"] = siguiente < len(pendientes_nits)
+    resumen["duracion_segundos"] = round(duracion, 1)
+    resumen["nits_por_segundo"] = round(resumen["evaluados"] / duracion, 2) if duracion > 0 else None
+    logger.info("Reevaluación de cartera terminada: %s", resumen)
+    return resumen
+
+
+def exportar_parquet(ruta_jsonl, ruta_parquet):
+    """
+    Consolida la salida JSONL en un archivo Parquet (requiere pyarrow); si un NIT aparece
+    más de una vez (reintentos tras error) se conserva su último resultado
+    """
+    if pa is None:
+        raise RuntimeError("La exportación a Parquet requiere pyarrow")
+
+    ultimos = {}
+    with open(ruta_jsonl, encoding="utf-8") as archivo:
+        for linea in archivo:
+            try:
+                resultado = json.loads(linea)
+            except ValueError:
+                continue
+            ultimos[_clave(resultado["nit"])] = resultado
+
+    columnas = {columna: [resultado.get(columna) for resultado in ultimos.values()] for columna in COLUMNAS_PARQUET}
+    columnas["alertas_criticas"] = [resultado.get("alertas_criticas") or [] for resultado in ultimos.values()]
+    columnas["detalles"] = [json.dumps(resultado.get("detalles"), ensure_ascii=False, default=str) for resultado in ultimos.values()]
+    pq.write_table(pa.table(columnas), ruta_parquet)
+    return len(ultimos)
@@ -0,0 +1,284 @@
+# utils/historial_utils.py
+# Historial de conversación medido en tokens: ventana de mensajes recientes, resumen
+# acumulado de los mensajes desalojados y hechos clave que nunca se pierden
+
+import contextvars
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from config import (
+    HISTORIAL_PRESUPUESTO_TOKENS,
+    HISTORIAL_PROMPT_TOKENS,
+    RESUMEN_HISTORIAL_TOKENS,
+    MENSAJE_RESUMEN_TOKENS
+)
+from .prompt_utils import estimar_tokens, truncar_por_presupuesto
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Entrada especial al inicio del historial con el resumen de los mensajes desalojados
+REMITENTE_RESUMEN = "resumen"
+
+# Hechos del contexto que se incluyen siempre en el prompt: (claves en orden de preferencia, etiqueta)
+HECHOS_FIJADOS = (
+    (("nit_empresa",), "NIT"),
+    (("nombre_empresa", "company_name"), "Empresa"),
+    (("tipo_credito",), "Crédito"),
+    (("monto_formato", "monto_solicitado"), "Monto solicitado"),
+    (("decision",), "Decisión"),
+    (("score",), "Score"),
+    (("tipo_producto_ofertado",), "Oferta"),
+    (("respuesta_cliente",), "Respuesta a la oferta")
+)
+
+# Tokens fijos por mensaje (remitente y separadores)
+_TOKENS_POR_MENSAJE = 4
+
+_FIN_ORACION = re.compile(r"(?<=[.!?])\s")
+
+# Turno en curso: instante de llegada y llamadas al modelo hechas para responderlo
+_turno_actual = contextvars.ContextVar("turno_actual", default=None)
+
+# Costo estimado de los últimos prompts por sección
+_lock_costos = threading.Lock()
+COSTOS_TURNOS = deque(maxlen=200)
+
+
+@contextmanager
+def contexto_turno():
+    """
+    Abre el turno de una solicitud: registra su llegada y acumula las llamadas al modelo
+    (los hilos que copian el contexto, como el de buró, comparten el mismo turno)
+    """
+    token = _turno_actual.set({
+        "recibido": datetime.now(timezone.utc),
+        "recibido_monotonic": time.monotonic(),
+        "llamadas": []
+    })
+    try:
+        yield
+    finally:
+        _turno_actual.reset(token)
+
+
+def registrar_llamada_modelo(agente, latencia_ms, uso=None, cache=False):
+    """
+    Registra una llamada al modelo en el turno en curso (no-op fuera de un turno)
+
+    Args:
+        uso (dict): accumulated_usage de strands (inputTokens, outputTokens)
+        cache (bool): la respuesta salió del cache de respuestas
+    """
+    turno = _turno_actual.get()
+    if turno is None:
+        return
+    uso = uso or {}
+    llamada = {
+        "agent": agente,
+        "latency_ms": round(latencia_ms, 1),
+        "input_tokens": uso.get("inputTokens", 0),
+        "output_tokens": uso.get("outputTokens", 0)
+    }
+    if cache:
+        llamada["cached"] = True
+    turno["llamadas"].append(llamada)
+
+
+def _marca_tiempo(instante):
+    return instante.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def ultimo_seq(historial):
+    """
+    Último número de secuencia del historial (0 si está vacío o no tiene secuencias)
+    """
+    return max((mensaje.get("seq", 0) for mensaje in historial or []), default=0)
+
+
+def crear_entradas_turno(historial, mensaje_usuario, respuesta_bot, agente=None):
+    """
+    Entradas de historial del turno en curso: marcas de tiempo reales (UTC y monotónica
+    del proceso), secuencia de la sesión y, en la respuesta, el agente que la produjo con
+    la latencia y el uso de tokens de sus llamadas al modelo
+    """
+    turno = _turno_actual.get()
+    ahora = datetime.now(timezone.utc)
+    ahora_monotonic = time.monotonic()
+    llamadas = list(turno["llamadas"]) if turno else []
+    seq = ultimo_seq(historial)
+
+    entrada_usuario = {
+        "sender": "user",
+        "message": mensaje_usuario,
+        "timestamp": _marca_tiempo(turno["recibido"] if turno else ahora),
+        "monotonic_ms": round((turno["recibido_monotonic"] if turno else ahora_monotonic) * 1000, 1),
+        "seq": seq + 1
+    }
+    entrada_bot = {
+        "sender": "bot",
+        "message": respuesta_bot,
+        "timestamp": _marca_tiempo(ahora),
+        "monotonic_ms": round(ahora_monotonic * 1000, 1),
+        "seq": seq + 2,
+        # Sin llamadas al modelo la respuesta salió de una plantilla en código
+        "agent": agente or (llamadas[-1]["agent"] if llamadas else "plantilla"),
+        "turn_latency_ms": round((ahora_monotonic - turno["recibido_monotonic"]) * 1000, 1) if turno else None,
+        "model_latency_ms": round(sum(llamada["latency_ms"] for llamada in llamadas), 1),
+        "usage": {
+            "input_tokens": sum(llamada["input_tokens"] for llamada in llamadas),
+            "output_tokens": sum(llamada["output_tokens"] for llamada in llamadas)
+        },
+        "stages": llamadas
+    }
+    return [entrada_usuario, entrada_bot]
+
+
+def tokens_mensaje(mensaje):
+    return estimar_tokens(mensaje.get("message") or "") + _TOKENS_POR_MENSAJE
+
+
+def separar_resumen(historial):
+    """
+    Separa la entrada de resumen (si existe) de los mensajes del historial
+    """
+    historial = historial or []
+    if historial and historial[0].get("sender") == REMITENTE_RESUMEN:
+        return historial[0], historial[1:]
+    return None, list(historial)
+
+
+def resumir_mensaje(mensaje, max_tokens=MENSAJE_RESUMEN_TOKENS):
+    """
+    Línea de resumen de un mensaje: remitente y primera oración, acotada en tokens
+    """
+    remitente = "Usuario" if mensaje.get("sender") == "user" else "CreditBot"
+    texto = " ".join((mensaje.get("message") or "").split())
+    primera_oracion = _FIN_ORACION.split(texto, maxsplit=1)[0]
+    limite = max_tokens * 4
+    if len(primera_oracion) > limite:
+        primera_oracion = primera_oracion[:limite].rsplit(" ", 1)[0] + "…"
+    return f"{remitente}: {primera_oracion}"
+
+
+def incorporar_al_resumen(resumen, desalojados, max_tokens=RESUMEN_HISTORIAL_TOKENS):
+    """
+    Agrega los mensajes desalojados al resumen acumulado sin recalcular lo anterior;
+    si el resumen supera su presupuesto se descartan sus líneas más antiguas
+    """
+    lineas = resumen["message"].split("\n") if resumen and resumen.get("message") else []
+    lineas.extend(resumir_mensaje(mensaje) for mensaje in desalojados)
+
+    while len(lineas) > 1 and estimar_tokens("\n".join(lineas)) > max_tokens:
+        lineas.pop(0)
+
+    return {
+        "sender": REMITENTE_RESUMEN,
+        "message": "\n".join(lineas),
+        "mensajes_resumidos": (resumen.get("mensajes_resumidos", 0) if resumen else 0) + len(desalojados),
+        "timestamp": desalojados[-1].get("timestamp")
+    }
+
+
+def agregar_mensajes(historial, nuevos, presupuesto_tokens=HISTORIAL_PRESUPUESTO_TOKENS):
+    """
+    Agrega mensajes al historial y desaloja los más antiguos hasta quedar dentro del
+    presupuesto de tokens (se conserva siempre el último intercambio). Solo cuando hay
+    desalojo se actualiza el resumen.
+    """
+    resumen, mensajes = separar_resumen(historial)
+    mensajes.extend(nuevos)
+
+    total = sum(tokens_mensaje(mensaje) for mensaje in mensajes)
+    desalojados = []
+    while len(mensajes) > len(nuevos) and total > presupuesto_tokens:
+        mensaje = mensajes.pop(0)
+        total -= tokens_mensaje(mensaje)
+        desalojados.append(mensaje)
+
+    if desalojados:
+        resumen = incorporar_al_resumen(resumen, desalojados)
+
+    return ([resumen] if resumen else []) + mensajes
+
+
+def hechos_fijados(contexto):
+    """
+    Líneas con los hechos clave del contexto (NIT, monto, decisión, oferta...)
+    """
+    hechos = []
+    for claves, etiqueta in HECHOS_FIJADOS:
+        for clave in claves:
+            valor = (contexto or {}).get(clave)
+            if valor not in (None, "", [], {}):
+                if isinstance(valor, int) and not isinstance(valor, bool) and valor >= 1_000_000:
+                    valor = f"${valor:,}"
+                hechos.append(f"- {etiqueta}: {valor}")
+                break
+    return hechos
+
+
+def construir_seccion_historial(historial, contexto, presupuesto_tokens=HISTORIAL_PROMPT_TOKENS):
+    """
+    Sección de historial para el prompt: hechos clave, resumen y los mensajes más
+    recientes que quepan en el presupuesto (cada uno acotado a la mitad del presupuesto)
+
+    Returns:
+        (texto, tokens por sección)
+    """
+    resumen, mensajes = separar_resumen(historial)
+    partes = []
+    costo = {"hechos": 0, "resumen": 0, "recientes": 0}
+
+    hechos = hechos_fijados(contexto)
+    if hechos:
+        bloque = "\nHECHOS CLAVE:\n" + "\n".join(hechos) + "\n"
+        costo["hechos"] = estimar_tokens(bloque)
+        partes.append(bloque)
+
+    if resumen and resumen.get("message"):
+        bloque = f"\nRESUMEN DE LA CONVERSACIÓN ANTERIOR ({resumen.get('mensajes_resumidos', 0)} mensajes):\n{resumen['message']}\n"
+        costo["resumen"] = estimar_tokens(bloque)
+        partes.append(bloque)
+
+    restante = presupuesto_tokens
+    recientes = []
+    for mensaje in reversed(mensajes):
+        remitente = "Usuario" if mensaje.get("sender") == "user" else "CreditBot"
+        texto = truncar_por_presupuesto(mensaje.get("message") or "", presupuesto_tokens // 2)
+        linea = f"{remitente}: {texto}\n"
+        tokens = estimar_tokens(linea)
+        if tokens > restante:
+            break
+        recientes.append(linea)
+        restante -= tokens
+
+    if recientes:
+        bloque = "\nHISTORIAL RECIENTE:\n" + "".join(reversed(recientes))
+        costo["recientes"] = estimar_tokens(bloque)
+        partes.append(bloque)
+
+    return "".join(partes), costo
+
+
+def registrar_costo_turno(agente, costo_secciones, total_tokens):
+    """
+    Registra y loguea el costo estimado en tokens del prompt de un turno
+    """
+    registro = {"agente": agente, "tokens_prompt": total_tokens, "secciones": costo_secciones}
+    with _lock_costos:
+        COSTOS_TURNOS.append(registro)
+    logger.debug("Prompt %s: ~%s tokens (%s)", agente, total_tokens, costo_secciones)
+    return registro
+
+
+def obtener_costos_turnos():
+    """
+    Copia de los últimos costos por turno
+    """
+    with _lock_costos:
+        return list(COSTOS_TURNOS)
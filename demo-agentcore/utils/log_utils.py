@@ -0,0 +1,209 @@
+# utils/log_utils.py
+# Logging estructurado: JSON por línea, niveles, id de correlación por solicitud,
+# muestreo de DEBUG, escritura en un hilo aparte (QueueHandler) y NITs redactados
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from config import LOG_NIVEL, LOG_FORMATO, LOG_MUESTREO_DEBUG, LOG_REDACTAR_PII, LOG_ASINCRONO
+
+RAIZ_LOGGERS = "creditbot"
+
+# Identificadores de la solicitud en curso (se propagan a los hilos que copian el contexto)
+_contexto_log = contextvars.ContextVar("contexto_log", default={})
+
+# NIT con o sin puntos y dígito de verificación (8 a 10 dígitos); se conservan los 3 últimos.
+# Los montos ($500000000) no se redactan
+_PATRON_NIT = re.compile(r"(?<![$\d.,])(?:\d{1,3}\.\d{3}\.|\d{5,7})(\d{3})(-\d)?\b")
+
+# Atributos estándar de LogRecord: todo lo demás viene de extra= y va como campo del JSON
+_ATRIBUTOS_REGISTRO = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def redactar(texto):
+    """
+    Reemplaza los NITs de un texto por su versión enmascarada (***456-7)
+    """
+    return _PATRON_NIT.sub(lambda m: f"***{m.group(1)}{m.group(2) or ''}", texto)
+
+
+def _redactar_valor(valor):
+    if isinstance(valor, str):
+        return redactar(valor)
+    if isinstance(valor, dict):
+        return {clave: _redactar_valor(v) for clave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_redactar_valor(v) for v in valor]
+    return valor
+
+
+@contextmanager
+def contexto_log(**campos):
+    """
+    Asocia campos (request_id, user_id...) a todos los logs emitidos dentro del bloque;
+    sin request_id se genera uno
+    """
+    campos = {clave: valor for clave, valor in campos.items() if valor is not None}
+    campos.setdefault("request_id", uuid.uuid4().hex[:16])
+    token = _contexto_log.set({**_contexto_log.get(), **campos})
+    try:
+        yield campos["request_id"]
+    finally:
+        _contexto_log.reset(token)
+
+
+def id_solicitud():
+    return _contexto_log.get().get("request_id")
+
+
+class FiltroContexto(logging.Filter):
+    """
+    Copia los campos de correlación al registro y aplica el muestreo de DEBUG por
+    solicitud (una solicitud muestreada conserva todos sus DEBUG)
+    """
+
+    def __init__(self, muestreo_debug=1.0):
+        super().__init__()
+        self.umbral_muestreo = int(muestreo_debug * 10000)
+
+    def filter(self, record):
+        campos = _contexto_log.get()
+        if record.levelno <= logging.DEBUG and self.umbral_muestreo < 10000:
+            clave = campos.get("request_id") or f"{record.created}"
+            if zlib.crc32(clave.encode("utf-8")) % 10000 >= self.umbral_muestreo:
+                return False
+        for clave, valor in campos.items():
+            if not hasattr(record, clave):
+                setattr(record, clave, valor)
+        return True
+
+
+class ColaNoBloqueante(logging.handlers.QueueHandler):
+    """
+    QueueHandler que solo resuelve el mensaje en el hilo de la solicitud; el formato
+    JSON y la escritura en stdout ocurren en el hilo del listener
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass  # con la cola llena se descarta el log antes que bloquear la solicitud
+
+
+class FormateadorJSON(logging.Formatter):
+    """
+    Una línea JSON por registro: ts, level, logger, msg, campos de correlación y extra=
+    """
+
+    def __init__(self, redactar_pii=True):
+        super().__init__()
+        self.redactar_pii = redactar_pii
+
+    def format(self, record):
+        documento = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_REGISTRO and not clave.startswith("_"):
+                documento[clave] = valor
+        if record.exc_text or record.exc_info:
+            documento["exc"] = record.exc_text or self.formatException(record.exc_info)
+
+        if self.redactar_pii:
+            documento = _redactar_valor(documento)
+        return json.dumps(documento, ensure_ascii=False, default=str)
+
+
+class FormateadorTexto(logging.Formatter):
+    """
+    Formato legible para desarrollo local: [NIVEL] mensaje (request_id)
+    """
+
+    def __init__(self, redactar_pii=True):
+        super().__init__()
+        self.redactar_pii = redactar_pii
+
+    def format(self, record):
+        linea = f"[{record.levelname}] {record.getMessage()}"
+        if getattr(record, "request_id", None):
+            linea += f" ({record.request_id})"
+        if record.exc_text:
+            linea += f"\n{record.exc_text}"
+        return redactar(linea) if self.redactar_pii else linea
+
+
+_listener = None
+
+
+def configurar_logging(nivel=LOG_NIVEL, formato=LOG_FORMATO, muestreo_debug=LOG_MUESTREO_DEBUG,
+                       redactar_pii=LOG_REDACTAR_PII, asincrono=LOG_ASINCRONO):
+    """
+    Configura el logger raíz de la aplicación ("creditbot"); se puede volver a llamar
+    para cambiar la configuración
+    """
+    global _listener
+
+    raiz = logging.getLogger(RAIZ_LOGGERS)
+    raiz.setLevel(nivel)
+    raiz.propagate = False
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(FormateadorJSON(redactar_pii) if formato == "json" else FormateadorTexto(redactar_pii))
+
+    if asincrono:
+        cola = ColaNoBloqueante(queue.Queue(maxsize=10000))
+        cola.addFilter(FiltroContexto(muestreo_debug))
+        raiz.addHandler(cola)
+        _listener = logging.handlers.QueueListener(cola.queue, salida, respect_handler_level=False)
+        _listener.start()
+    else:
+        salida.addFilter(FiltroContexto(muestreo_debug))
+        raiz.addHandler(salida)
+
+
+def detener_logging():
+    """
+    Vacía la cola y detiene el hilo de escritura
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def obtener_logger(nombre):
+    """
+    Logger de un módulo, bajo la raíz "creditbot"
+    """
+    return logging.getLogger(f"{RAIZ_LOGGERS}.{nombre}")
+
+
+configurar_logging()
+atexit.register(detener_logging)
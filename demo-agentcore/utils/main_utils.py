@@ -2,6 +2,12 @@
 # Funciones principales de utilidades (migradas del utils.py original)
 
 import json
+import re
+
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
+
 
 def clean_markdown(text: str) -> str:
     """
@@ -17,9 +23,123 @@ def clean_markdown(text: str) -> str:
         t = t.replace("```", "").strip()
     return t
 
-def parse_json(text: str, fallback=None):
+# Claves obligatorias (y tipos aceptados) del JSON que devuelve cada agente.
+# Un esquema vacío acepta cualquier objeto no vacío.
+ESQUEMAS_SALIDA = {
+    "orquestador": {"next_agent": (str,)},
+    "financiero": {},
+    "scoring": {"score": (int, float, str), "decision": (str,)},
+    "buro": {}
+}
+
+def cumple_esquema(objeto, esquema):
+    """
+    Verifica que el objeto sea un dict no vacío con las claves y tipos del esquema
+    """
+    if not isinstance(objeto, dict) or not objeto:
+        return False
+    if isinstance(esquema, str):
+        esquema = ESQUEMAS_SALIDA.get(esquema, {})
+    for clave, tipos in esquema.items():
+        if clave not in objeto or not isinstance(objeto[clave], tipos):
+            return False
+    return True
+
+
+# Únicos caracteres que cambian el estado del emparejamiento de llaves
+_CARACTERES_ESTRUCTURA = re.compile(r'[{}"\\]')
+
+_decodificador_json = json.JSONDecoder()
+
+# Un objeto JSON empieza con "{" seguido de una clave o de "}" (descarta "{texto}" sin decodificar)
+_INICIO_OBJETO = re.compile(r'\{\s*["}]')
+
+
+def _mapa_cierres(texto, inicio):
+    """
+    Para cada "{" desde `inicio`, la posición siguiente a su "}" de cierre, en una sola
+    pasada con pila e ignorando llaves dentro de strings. Las llaves sin cerrar no aparecen.
+    """
+    cierres = {}
+    abiertas = []
+    en_string = False
+    escapado_hasta = -1
+
+    for match in _CARACTERES_ESTRUCTURA.finditer(texto, inicio):
+        i = match.start()
+        caracter = texto[i]
+        if en_string:
+            if i <= escapado_hasta:
+                continue
+            if caracter == "\\":
+                escapado_hasta = i + 1
+            elif caracter == '"':
+                en_string = False
+        elif caracter == '"':
+            # Fuera de un objeto las comillas son prosa, no delimitan strings
+            en_string = bool(abiertas)
+        elif caracter == "{":
+            abiertas.append(i)
+        elif caracter == "}" and abiertas:
+            cierres[abiertas.pop()] = i + 1
+
+    return cierres
+
+
+def extraer_objeto_json(texto, esquema=None):
+    """
+    Primer objeto JSON válido (y que cumpla el esquema, si se indica) dentro de un texto mixto
+
+    Mientras los candidatos decodifican bien se usa raw_decode directamente (caso común:
+    un objeto con texto alrededor). Al primer candidato inválido se emparejan todas las
+    llaves en una pasada y desde ahí solo se decodifica cada tramo balanceado, saltando
+    hasta su cierre si falla: cada carácter se examina un número acotado de veces, O(n).
+    """
+    cierres = None
+    inicio = texto.find("{")
+
+    while inicio != -1:
+        if not _INICIO_OBJETO.match(texto, inicio):
+            inicio = texto.find("{", inicio + 1)
+            continue
+
+        if cierres is None:
+            try:
+                objeto, fin = _decodificador_json.raw_decode(texto, inicio)
+                if esquema is None or cumple_esquema(objeto, esquema):
+                    return objeto
+                inicio = texto.find("{", fin)
+                continue
+            except (json.JSONDecodeError, RecursionError):
+                cierres = _mapa_cierres(texto, inicio)
+
+        fin = cierres.get(inicio)
+        if fin is None:
+            # Llave sin cerrar (p. ej. salida truncada): probar la siguiente
+            inicio = texto.find("{", inicio + 1)
+            continue
+
+        # Decodificar solo el tramo balanceado: los errores no recorren el resto del texto
+        try:
+            objeto = json.loads(texto[inicio:fin])
+            if esquema is None or cumple_esquema(objeto, esquema):
+                return objeto
+        except (json.JSONDecodeError, RecursionError):
+            pass
+        inicio = texto.find("{", fin)
+
+    return None
+
+
+def parse_json(text: str, fallback=None, esquema=None):
     """
     Parsea JSON de forma segura con fallback, incluyendo extracción de JSON de texto mixto
+
+    Args:
+        text (str): Salida del modelo
+        fallback: Valor devuelto si no se encuentra un JSON válido
+        esquema (str | dict): Nombre de agente en ESQUEMAS_SALIDA o {clave: tipos}; si se
+            indica, solo se acepta un objeto que lo cumpla
     """
     try:
         if not text:
@@ -27,49 +147,26 @@ def parse_json(text: str, fallback=None):
             
         cleaned_text = clean_markdown(text)
         
-        # Intentar parsear directamente
-        try:
-            return json.loads(cleaned_text)
-        except json.JSONDecodeError:
-            pass
+        # Intentar parsear directamente (arrays o JSON limpio)
+        if cleaned_text[:1] == "[":
+            try:
+                resultado = json.loads(cleaned_text)
+                if esquema is None or cumple_esquema(resultado, esquema):
+                    return resultado
+            except json.JSONDecodeError:
+                pass
         
-        # Intentar extraer JSON del texto si está mezclado
-        lines = cleaned_text.strip().split('\n')
+        # Objeto limpio o mezclado con texto: un solo recorrido
+        resultado = extraer_objeto_json(cleaned_text, esquema)
+        if resultado is not None:
+            return resultado
         
-        # Buscar líneas que parezcan JSON
-        for line in lines:
-            line = line.strip()
-            if line.startswith('{') and line.endswith('}'):
-                try:
-                    return json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-        
-        # Buscar bloques JSON multilinea
-        json_start = -1
-        brace_count = 0
-        
-        for i, char in enumerate(cleaned_text):
-            if char == '{':
-                if json_start == -1:
-                    json_start = i
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-                if brace_count == 0 and json_start != -1:
-                    json_candidate = cleaned_text[json_start:i+1]
-                    try:
-                        return json.loads(json_candidate)
-                    except json.JSONDecodeError:
-                        json_start = -1
-                        continue
-        
-        print(f"[WARNING] No se pudo extraer JSON válido de: {text[:200]}...")
+        logger.warning("No se pudo extraer JSON válido de: %.200s...", text)
         return fallback
         
     except Exception as e:
-        print(f"[ERROR] Error inesperado en parse_json: {e}")
-        print(f"[ERROR] Texto era: {text[:200]}...")
+        logger.exception("Error inesperado en parse_json: %s", e)
+        logger.debug("Texto era: %.200s...", text)
         return fallback
 
 def extract_score_from_scoring(scoring_result):
@@ -111,34 +208,44 @@ def extract_decision_from_scoring(scoring_result):
     
     return str(decision)
 
-def formatear_explicacion_dual_analisis(score_interno, score_buro, decision_final, es_cliente_existente=False):
+def describir_score_interno(score_interno):
     """
-    Formatea explicación comprensible del análisis dual sin scores técnicos
-    Para simulación - no menciona entidades reales específicas
+    Score interno en lenguaje natural (sin números técnicos)
     """
-    
-    # Traducir score interno a lenguaje natural
     if score_interno >= 750:
-        desc_interno = "indicadores financieros excelentes con muy buena capacidad de pago"
+        return "indicadores financieros excelentes con muy buena capacidad de pago"
     elif score_interno >= 650:
-        desc_interno = "indicadores financieros sólidos y capacidad de pago adecuada"
+        return "indicadores financieros sólidos y capacidad de pago adecuada"
     elif score_interno >= 550:
-        desc_interno = "indicadores financieros aceptables"
+        return "indicadores financieros aceptables"
     else:
-        desc_interno = "indicadores financieros que requieren fortalecimiento"
-    
-    # Traducir score buró a lenguaje natural (SIN mencionar DataCrédito específicamente)
-    if score_buro:
-        if score_buro >= 700:
-            desc_buro = "excelente comportamiento crediticio en el sistema financiero"
-        elif score_buro >= 650:
-            desc_buro = "buen historial crediticio sin mayores incidencias"
-        elif score_buro >= 600:
-            desc_buro = "comportamiento crediticio aceptable"
-        else:
-            desc_buro = "historial crediticio con algunas observaciones"
+        return "indicadores financieros que requieren fortalecimiento"
+
+
+def describir_score_buro(score_buro):
+    """
+    Score de buró en lenguaje natural (SIN mencionar DataCrédito específicamente)
+    """
+    if not score_buro:
+        return "empresa nueva sin historial crediticio previo (no es negativo)"
+    elif score_buro >= 700:
+        return "excelente comportamiento crediticio en el sistema financiero"
+    elif score_buro >= 650:
+        return "buen historial crediticio sin mayores incidencias"
+    elif score_buro >= 600:
+        return "comportamiento crediticio aceptable"
     else:
-        desc_buro = "empresa nueva sin historial crediticio previo (no es negativo)"
+        return "historial crediticio con algunas observaciones"
+
+
+def formatear_explicacion_dual_analisis(score_interno, score_buro, decision_final, es_cliente_existente=False):
+    """
+    Formatea explicación comprensible del análisis dual sin scores técnicos
+    Para simulación - no menciona entidades reales específicas
+    """
+    
+    desc_interno = describir_score_interno(score_interno)
+    desc_buro = describir_score_buro(score_buro)
     
     # Construir explicación
     explicacion = f"""📊 **Análisis Interno**: Basado en tus estados financieros, tu empresa presenta {desc_interno}.
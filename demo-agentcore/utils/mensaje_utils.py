@@ -0,0 +1,370 @@
+# utils/mensaje_utils.py
+# Extracción de features del mensaje del usuario en una sola pasada (patrones precompilados)
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
+
+
+class AutomataPalabras:
+    """
+    Autómata Aho-Corasick: encuentra en una pasada todas las palabras clave contenidas
+    en un texto (misma semántica que `palabra in texto` para cada una)
+    """
+
+    def __init__(self, palabras):
+        self._transiciones = [{}]
+        self._fallo = [0]
+        self._salidas = [set()]
+
+        for palabra in palabras:
+            estado = 0
+            for caracter in palabra:
+                siguiente = self._transiciones[estado].get(caracter)
+                if siguiente is None:
+                    siguiente = len(self._transiciones)
+                    self._transiciones.append({})
+                    self._fallo.append(0)
+                    self._salidas.append(set())
+                    self._transiciones[estado][caracter] = siguiente
+                estado = siguiente
+            self._salidas[estado].add(palabra)
+
+        # Enlaces de fallo por BFS; cada estado hereda las salidas de su enlace
+        cola = deque(self._transiciones[0].values())
+        while cola:
+            estado = cola.popleft()
+            for caracter, siguiente in self._transiciones[estado].items():
+                cola.append(siguiente)
+                fallo = self._fallo[estado]
+                while fallo and caracter not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._transiciones[fallo].get(caracter, 0)
+                self._fallo[siguiente] = destino if destino != siguiente else 0
+                self._salidas[siguiente] |= self._salidas[self._fallo[siguiente]]
+
+    def buscar(self, texto):
+        """
+        Conjunto de palabras clave presentes en el texto
+        """
+        encontradas = set()
+        transiciones = self._transiciones
+        fallo = self._fallo
+        salidas = self._salidas
+        estado = 0
+
+        for caracter in texto:
+            while estado and caracter not in transiciones[estado]:
+                estado = fallo[estado]
+            estado = transiciones[estado].get(caracter, 0)
+            if salidas[estado]:
+                encontradas |= salidas[estado]
+
+        return encontradas
+
+
+# Diccionarios de palabras clave: el orden define la prioridad (gana la primera presente)
+TIPOS_CREDITO = {
+    # Más específico a menos específico
+    "capital de trabajo": "crédito empresarial",
+    "crédito de capital de trabajo": "crédito empresarial",
+    "crédito empresarial": "crédito empresarial",
+    "crédito comercial": "crédito empresarial",
+    "credito empresarial": "crédito empresarial",
+    "credito comercial": "crédito empresarial",
+    "empresarial": "crédito empresarial",
+    "comercial": "crédito empresarial",
+    "expansión": "crédito empresarial",
+    "expansion": "crédito empresarial",
+    "crecimiento": "crédito empresarial",
+    "inversión": "crédito empresarial",
+    "inversion": "crédito empresarial",
+    "financiamiento": "crédito empresarial",
+
+    # Línea rotativa
+    "línea de crédito": "línea rotativa",
+    "linea de credito": "línea rotativa",
+    "línea rotativa": "línea rotativa",
+    "linea rotativa": "línea rotativa",
+    "rotativo": "línea rotativa",
+    "rotativa": "línea rotativa",
+
+    # Hipotecario
+    "hipotecario": "hipotecario comercial",
+    "hipoteca": "hipotecario comercial",
+    "inmueble": "hipotecario comercial",
+    "propiedad": "hipotecario comercial",
+
+    # Factoring
+    "factoring": "factoring",
+    "cartera": "factoring",
+    "cuentas por cobrar": "factoring"
+}
+
+PROPOSITOS = {
+    "capital de trabajo": "capital de trabajo",
+    "flujo de caja": "capital de trabajo",
+    "inventario": "capital de trabajo",
+    "operativo": "capital de trabajo",
+    "operación": "capital de trabajo",
+    "expansión": "expansión",
+    "expansion": "expansión",
+    "crecimiento": "expansión",
+    "ampliación": "expansión",
+    "inversión": "inversión",
+    "inversion": "inversión",
+    "equipos": "compra de equipos",
+    "maquinaria": "compra de equipos",
+    "tecnología": "compra de equipos",
+    "inmueble": "compra de inmueble",
+    "local": "compra de inmueble",
+    "oficina": "compra de inmueble"
+}
+
+SECTORES = {
+    "construcción": ["construcción", "construc", "obra", "inmobiliaria", "constructor"],
+    "comercio": ["comercio", "ventas", "retail", "tienda", "almacén"],
+    "servicios": ["servicios", "consultoría", "asesoría", "consulting"],
+    "manufactura": ["manufactura", "producción", "fábrica", "industrial", "manufactur"],
+    "tecnología": ["tecnología", "software", "desarrollo", "IT", "tech"],
+    "salud": ["salud", "médico", "clínica", "hospital", "farmac"],
+    "transporte": ["transporte", "logística", "carga", "fletes"],
+    "agricultura": ["agricultura", "agrícola", "campo", "agro", "cultivo"]
+}
+
+ETAPAS = {
+    "document_upload": ["documentos", "subir", "pdf", "archivo"],
+    "amount_inquiry": ["monto", "cuánto", "cantidad", "simulación"],
+    "formalization": ["siguiente", "pasos", "formalizar", "firmar"]
+}
+
+TIPOS_PRODUCTO = {
+    "hipotecario_comercial": ["hipotecario", "hipoteca", "inmueble", "local", "oficina"],
+    "linea_credito_rotativa": ["rotativo", "rotativa", "línea", "linea", "flexible"],
+    "factoring": ["factoring", "cartera", "cuentas por cobrar", "descuento"],
+    "credito_empresarial": ["empresarial", "comercial", "capital", "expansion", "inversion"]
+}
+
+# Palabras que deben aparecer para que valga la pena correr las regex más costosas
+PREFILTROS = ("empresa", "compañía", "mil", "quiniento")
+
+# El mensaje se pasa a minúsculas, así que las palabras con mayúsculas (p. ej. "IT")
+# nunca coinciden; se conservan en los diccionarios con la misma semántica original
+_AUTOMATA = AutomataPalabras(
+    set(PREFILTROS) | set(TIPOS_CREDITO) | set(PROPOSITOS)
+    | {palabra for palabras in SECTORES.values() for palabra in palabras}
+    | {palabra for palabras in ETAPAS.values() for palabra in palabras}
+    | {palabra for palabras in TIPOS_PRODUCTO.values() for palabra in palabras}
+)
+
+# NIT: los patrones se prueban en orden (el primero que aparezca en el mensaje gana)
+PATRONES_NIT = [
+    re.compile(r'\b(\d{9}-\d)\b'),  # Formato: 123456789-0
+    re.compile(r'\b(\d{9})\b'),     # Solo números: 123456789
+    re.compile(r'\b(\d{3}\.?\d{3}\.?\d{3}-\d)\b'),  # Con puntos: 123.456.789-0
+]
+
+# Montos en lenguaje natural (verificador): (patrón, valor fijo o None si se lee el número)
+PATRONES_MONTO_CREDITO = [
+    (re.compile(r'(\d{1,4})\s*mil\s*millones?', re.IGNORECASE), None),  # 5 mil millones
+    (re.compile(r'(\d{1,3}(?:[.,]\d{3})*)\s*millones?', re.IGNORECASE), None),  # 500 millones, 1.000 millones
+    (re.compile(r'\$\s*(\d{1,3}(?:[.,]\d{3})*)\s*millones?', re.IGNORECASE), None),  # $500 millones
+    (re.compile(r'\$?\s*(\d{1,4})\s*[Mm](?:[Mm])?', re.IGNORECASE), None),  # 500M, $300MM
+    (re.compile(r'\$\s*(\d{3,}(?:[.,]\d{3})*)', re.IGNORECASE), None),  # $500,000,000
+    (re.compile(r'quinientos?\s*millones?', re.IGNORECASE), 500),  # quinientos millones -> 500
+    (re.compile(r'mil\s*millones?', re.IGNORECASE), 1000),  # mil millones -> 1000
+]
+
+# Montos en pesos (ofertador)
+PATRONES_MONTO_PESOS = [
+    re.compile(r'(\d{1,3}(?:\.\d{3})*(?:\.\d{3})*)\s*(?:millones?|mill?)', re.IGNORECASE),  # 500 millones
+    re.compile(r'\$\s*(\d{1,3}(?:\.\d{3})*(?:\.\d{3})*)\s*(?:millones?|mill?)', re.IGNORECASE),  # $500 millones
+    re.compile(r'(\d{1,3}(?:\,\d{3})*(?:\,\d{3})*)\s*(?:millones?|mill?)', re.IGNORECASE),  # 500,000 millones
+    re.compile(r'\$\s*(\d{1,3}(?:\,\d{3})*(?:\,\d{3})*)\s*(?:COP|cop|pesos?)?', re.IGNORECASE),  # $500,000,000
+    re.compile(r'(\d{1,3}(?:\.\d{3})*)\s*(?:mil millones?)', re.IGNORECASE),  # 5 mil millones
+]
+
+PATRONES_EMPRESA = [
+    re.compile(r"empresa\s+([A-Za-z][A-Za-z\s&.,]+?)(?:\s|$|,)", re.IGNORECASE),
+    re.compile(r"compañía\s+([A-Za-z][A-Za-z\s&.,]+?)(?:\s|$|,)", re.IGNORECASE),
+    re.compile(r"([A-Za-z][A-Za-z\s&.,]*?)\s+(?:s\.a\.s\.|sas|ltda|s\.a\.|sa)(?:\s|$|,)", re.IGNORECASE)
+]
+
+PATRON_ANOS = re.compile(r"(\d+)\s+años")
+
+PATRON_DIGITO = re.compile(r"\d")
+
+# Condición necesaria para el tercer patrón de empresa (sufijo societario como palabra)
+PATRON_SUFIJO_SOCIETARIO = re.compile(r"\s(?:s\.a\.s\.|sas|ltda|s\.a\.|sa)(?:\s|$|,)", re.IGNORECASE)
+
+
+class MessageFeatures(NamedTuple):
+    """
+    Features extraídas de un mensaje (inmutable: se comparte entre llamadas memoizadas)
+    """
+    nit: Optional[str] = None
+    tipo_credito: Optional[str] = None
+    tipo_original: Optional[str] = None
+    monto_solicitado: Optional[int] = None
+    monto_formato: Optional[str] = None
+    proposito: Optional[str] = None
+    monto_pesos: Optional[int] = None
+    tipo_producto: Optional[str] = None
+    company_name: Optional[str] = None
+    sector: Optional[str] = None
+    years_operating: Optional[int] = None
+    stage: Optional[str] = None
+
+
+def _primera_clave(diccionario, encontradas):
+    """
+    Primera clave (en orden de prioridad) presente en el mensaje
+    """
+    for palabra in diccionario:
+        if palabra in encontradas:
+            return palabra
+    return None
+
+
+def _primer_grupo(grupos, encontradas):
+    """
+    Primer grupo con alguna de sus palabras presente en el mensaje
+    """
+    for nombre, palabras in grupos.items():
+        if any(palabra in encontradas for palabra in palabras):
+            return nombre
+    return None
+
+
+def _extraer_nit(mensaje):
+    for patron in PATRONES_NIT:
+        match = patron.search(mensaje)
+        if match:
+            return match.group(1).replace(".", "").replace(" ", "")
+    return None
+
+
+def _extraer_monto_credito(mensaje):
+    """
+    Monto en lenguaje natural ("500 millones", "$300MM", "quinientos millones")
+    Devuelve (monto, formato) o (None, None)
+    """
+    for patron, valor_fijo in PATRONES_MONTO_CREDITO:
+        match = patron.search(mensaje)
+        if not match:
+            continue
+
+        if valor_fijo is not None:
+            numero = valor_fijo
+        else:
+            try:
+                numero = int(match.group(1).replace('.', '').replace(',', ''))
+            except ValueError:
+                continue
+
+        texto_match = match.group(0)
+        if 'mil millones' in texto_match.lower():
+            monto_final = numero * 1000000000
+            formato = f"${numero} mil millones"
+        elif 'millones' in texto_match.lower() or 'M' in texto_match:
+            monto_final = numero * 1000000
+            formato = f"${numero}M"
+        elif numero >= 100000000:  # Si es un número grande sin palabra
+            monto_final = numero
+            formato = f"${numero//1000000}M"
+        else:
+            monto_final = numero * 1000000
+            formato = f"${numero}M"
+
+        # Validar rango razonable
+        if monto_final < 1000000:  # Menos de 1M
+            logger.debug("Monto muy pequeño: $%s", monto_final)
+            continue
+        elif monto_final > 50000000000:  # Más de 50 mil millones
+            logger.debug("Monto muy grande: $%s", monto_final)
+            monto_final = 5000000000  # Limitar a 5 mil millones
+            formato = "$5,000M"
+
+        return monto_final, formato
+
+    return None, None
+
+
+def _extraer_monto_pesos(mensaje):
+    for patron in PATRONES_MONTO_PESOS:
+        match = patron.search(mensaje)
+        if not match:
+            continue
+        try:
+            numero = int(match.group(1).replace('.', '').replace(',', ''))
+        except ValueError:
+            continue
+
+        texto_match = match.group(0).lower()
+        if 'millones' in texto_match:
+            if 'mil millones' in texto_match:
+                return numero * 1000000000
+            return numero * 1000000
+        return numero
+    return None
+
+
+def _extraer_empresa(mensaje, encontradas):
+    """
+    Nombre de la empresa; cada patrón solo se evalúa si su palabra ancla está en el mensaje
+    """
+    anclas = (
+        "empresa" in encontradas,
+        "compañía" in encontradas,
+        PATRON_SUFIJO_SOCIETARIO.search(mensaje) is not None
+    )
+    for patron, ancla in zip(PATRONES_EMPRESA, anclas):
+        if not ancla:
+            continue
+        match = patron.search(mensaje)
+        if match:
+            return match.group(1).strip()
+    return None
+
+
+@lru_cache(maxsize=1024)
+def extraer_features_mensaje(mensaje):
+    """
+    Extrae todas las features del mensaje en una pasada (memoizado por mensaje)
+
+    Las palabras clave se buscan con un único recorrido del autómata sobre el mensaje en
+    minúsculas; los montos, NIT, empresa y años usan regex precompiladas.
+    """
+    mensaje = mensaje or ""
+    mensaje_lower = mensaje.lower()
+    encontradas = _AUTOMATA.buscar(mensaje_lower)
+    tiene_digitos = PATRON_DIGITO.search(mensaje) is not None
+
+    tipo_original = _primera_clave(TIPOS_CREDITO, encontradas)
+    proposito = _primera_clave(PROPOSITOS, encontradas)
+
+    # Sin dígitos ni montos en palabras no hay NIT, montos ni años que buscar
+    monto_solicitado, monto_formato = None, None
+    if tiene_digitos or "mil" in encontradas or "quiniento" in encontradas:
+        monto_solicitado, monto_formato = _extraer_monto_credito(mensaje)
+    years_match = PATRON_ANOS.search(mensaje_lower) if tiene_digitos else None
+
+    return MessageFeatures(
+        nit=_extraer_nit(mensaje) if tiene_digitos else None,
+        tipo_credito=TIPOS_CREDITO[tipo_original] if tipo_original else None,
+        tipo_original=tipo_original,
+        monto_solicitado=monto_solicitado,
+        monto_formato=monto_formato,
+        proposito=PROPOSITOS[proposito] if proposito else None,
+        monto_pesos=_extraer_monto_pesos(mensaje) if tiene_digitos else None,
+        tipo_producto=_primer_grupo(TIPOS_PRODUCTO, encontradas),
+        company_name=_extraer_empresa(mensaje, encontradas),
+        sector=_primer_grupo(SECTORES, encontradas),
+        years_operating=int(years_match.group(1)) if years_match else None,
+        stage=_primer_grupo(ETAPAS, encontradas)
+    )
@@ -2,8 +2,14 @@
 # Utilidades para el agente ofertador de créditos
 
 import math
+import re
 from datetime import datetime
 
+from .log_utils import obtener_logger
+from .main_utils import describir_score_interno, describir_score_buro
+
+logger = obtener_logger(__name__)
+
 def construir_input_ofertador(contexto_analisis, tipo_producto="credito_empresarial", monto_solicitado=None):
     """
     Construye el input para el agente ofertador basado en el análisis crediticio completado
@@ -17,8 +23,8 @@ def construir_input_ofertador(contexto_analisis, tipo_producto="credito_empresar
         str: Input formateado para el agente ofertador
     """
     
-    # Normalizar tipo de producto
-    tipo_producto = normalizar_tipo_producto(tipo_producto)
+    # Normalizar tipo de producto y calcular la oferta
+    tipo_producto, oferta_calculada = preparar_oferta(contexto_analisis, tipo_producto, monto_solicitado)
     
     # Extraer información del análisis
     score_final = contexto_analisis.get("score", 0)
@@ -31,31 +37,6 @@ def construir_input_ofertador(contexto_analisis, tipo_producto="credito_empresar
     es_cliente_existente = contexto_analisis.get("es_cliente_existente", False)
     sector = contexto_analisis.get("sector", "general")
     
-    # Calcular oferta base
-    try:
-        oferta_calculada = calcular_oferta_crediticia(
-            score_final, 
-            decision, 
-            tipo_producto, 
-            monto_solicitado,
-            es_cliente_existente,
-            sector
-        )
-    except Exception as e:
-        print(f"[ERROR] Error calculando oferta: {e}")
-        # Oferta de fallback
-        oferta_calculada = {
-            "monto_aprobado": 500000000,  # $500M default
-            "plazo_maximo_meses": 48,
-            "spread_porcentaje": 6.0,
-            "tasa_ea_porcentaje": 14.5,
-            "cuota_mensual": 15000000,
-            "garantias_requeridas": "Pagaré + Aval",
-            "dias_desembolso": 5,
-            "dtf_referencia": 8.5,
-            "beneficios_aplicables": ["Seguro de vida incluido"]
-        }
-    
     input_text = f"""
 GENERAR OFERTA CREDITICIA PERSONALIZADA
 
@@ -73,7 +54,7 @@ PRODUCTO SOLICITADO:
 - Monto solicitado: {f"${monto_solicitado:,} COP" if monto_solicitado else "Por determinar"}
 
 PARÁMETROS DE LA OFERTA CALCULADA:
-{formatear_parametros_oferta(oferta_calculada)}
+{formatear_parametros_oferta(oferta_calculada) if oferta_calculada else "- No disponibles: la oferta requiere revisión manual de un asesor"}
 
 BENEFICIOS ESPECÍFICOS DEL CLIENTE:
 {obtener_beneficios_cliente(contexto_analisis)}
@@ -96,6 +77,31 @@ La oferta debe reflejar que ya se completó todo el análisis crediticio y la de
     
     return input_text
 
+def preparar_oferta(contexto_analisis, tipo_producto="credito_empresarial", monto_solicitado=None):
+    """
+    Normaliza el producto y calcula los parámetros de la oferta a partir del análisis
+    
+    Returns:
+        tuple: (tipo_producto normalizado, dict con la oferta calculada, o None si no se
+        pudo calcular: la oferta pasa a revisión manual, nunca se inventan cifras)
+    """
+    tipo_producto = normalizar_tipo_producto(tipo_producto)
+    
+    try:
+        oferta_calculada = calcular_oferta_crediticia(
+            contexto_analisis.get("score", 0), 
+            contexto_analisis.get("decision", "pending"), 
+            tipo_producto, 
+            monto_solicitado,
+            contexto_analisis.get("es_cliente_existente", False),
+            contexto_analisis.get("sector", "general")
+        )
+    except Exception as e:
+        logger.exception("Error calculando oferta: %s", e)
+        oferta_calculada = None
+    
+    return tipo_producto, oferta_calculada
+
 def normalizar_tipo_producto(tipo_producto):
     """
     Normaliza los nombres de tipos de producto para consistencia
@@ -215,7 +221,7 @@ def calcular_monto_maximo_por_score(score, tipo_producto, monto_scoring=None):
     
     # Si el scoring ya calculó un monto, usarlo como referencia principal
     if monto_scoring and monto_scoring > 0:
-        print(f"[LOG] Usando monto del scoring: ${monto_scoring:,}")
+        logger.debug("Usando monto del scoring: $%s", monto_scoring)
         return int(monto_scoring)
     
     # Montos base REALISTAS por score (no más fantasías de $5 billones)
@@ -241,7 +247,7 @@ def calcular_monto_maximo_por_score(score, tipo_producto, monto_scoring=None):
     multiplicador = multiplicadores.get(tipo_producto, 1.0)
     monto_final = int(monto_base * multiplicador)
     
-    print(f"[LOG] Monto calculado - Score: {score}, Base: ${monto_base:,}, Tipo: {tipo_producto}, Final: ${monto_final:,}")
+    logger.debug("Monto calculado - Score: %s, Base: $%s, Tipo: %s, Final: $%s", score, monto_base, tipo_producto, monto_final)
     return monto_final
 
 def calcular_plazo_maximo(score, tipo_producto, sector):
@@ -416,44 +422,180 @@ def formatear_contexto_para_oferta(contexto):
     
     return contexto_texto
 
-def procesar_respuesta_continuidad(respuesta_usuario):
+# Nombres comerciales de los productos para la oferta
+NOMBRES_PRODUCTO = {
+    "credito_empresarial": "Crédito Empresarial",
+    "linea_credito_rotativa": "Línea de Crédito Rotativa",
+    "hipotecario_comercial": "Hipotecario Comercial",
+    "factoring": "Factoring"
+}
+
+# Condiciones especiales por sector (PERSONALIZACIÓN POR SECTOR del prompt del ofertador)
+CONDICIONES_SECTOR = {
+    "construccion": ("construcción", "Períodos de gracia según cronograma de obra"),
+    "agricultura": ("agricultura", "Cuotas estacionales ajustadas a cosechas"),
+    "comercio": ("comercio", "Opción de línea rotativa complementaria"),
+    "manufactura": ("manufactura", "Flexibilidad en fechas de pago según flujo")
+}
+
+def mensaje_oferta_no_disponible(nombre_empresa="tu empresa"):
+    """Mensaje cuando la oferta no se pudo calcular: pasa a revisión manual sin cifras"""
+    return f"""Hemos completado tu evaluación crediticia, pero en este momento no podemos generar automáticamente las condiciones de la oferta para {nombre_empresa}.
+
+📋 Tu solicitud pasó a revisión con un asesor comercial, que te contactará en máximo 24 horas con las condiciones definitivas (monto, plazo, tasa y garantías).
+
+No necesitas hacer nada más por ahora. ¡Gracias por tu paciencia!"""
+
+def renderizar_oferta(contexto_analisis, tipo_producto="credito_empresarial", monto_solicitado=None):
     """
-    Procesa la respuesta del usuario sobre continuar con la oferta
+    Genera el mensaje final de la oferta directamente desde los parámetros calculados,
+    con el formato del prompt del ofertador (evaluación + oferta + pregunta SÍ/NO)
+    
+    Returns:
+        str: Mensaje de oferta listo para el cliente, con cifras exactas (None si la
+        oferta no se pudo calcular, ver mensaje_oferta_no_disponible)
     """
-    respuesta_normalizada = respuesta_usuario.lower().strip()
+    tipo_producto, oferta = preparar_oferta(contexto_analisis, tipo_producto, monto_solicitado)
+    if oferta is None:
+        return None
     
-    # Palabras que indican SÍ
-    palabras_si = ["sí", "si", "yes", "dale", "perfecto", "excelente", "continuo", "continuar", 
-                   "acepto", "de acuerdo", "okay", "ok", "bueno", "claro", "afirmativo"]
+    score_final = contexto_analisis.get("score", 0) or 0
+    score_interno = contexto_analisis.get("score_interno", score_final) or score_final
+    nombre_empresa = contexto_analisis.get("nombre_empresa") or "tu empresa"
+    sector = contexto_analisis.get("sector", "general")
+    es_cliente_existente = contexto_analisis.get("es_cliente_existente", False)
     
-    # Palabras que indican NO
-    palabras_no = ["no", "not", "nope", "negativo", "paso", "ahora no", "después", 
-                   "lo pensaré", "más tarde", "rechazar", "declino"]
+    # Evaluación breve
+    texto = "Hemos completado tu evaluación crediticia integral:\n\n"
+    texto += f"📊 Análisis Interno: tu empresa presenta {describir_score_interno(score_interno)}.\n"
+    texto += f"🏦 Centrales de Riesgo: {describir_score_buro(contexto_analisis.get('score_buro'))}.\n"
     
-    # Detectar respuesta afirmativa
-    if any(palabra in respuesta_normalizada for palabra in palabras_si):
-        return {
-            "decision": "SI",
-            "tipo_respuesta": "afirmativa",
-            "siguiente_accion": "contacto_asesor"
-        }
+    if es_cliente_existente:
+        tiempo_relacion = contexto_analisis.get("tiempo_relacion_anos")
+        if tiempo_relacion:
+            texto += f"⭐ Como nuestro cliente desde hace {tiempo_relacion} años, tienes condiciones preferenciales.\n"
+        else:
+            texto += "⭐ Como nuestro cliente, tienes condiciones preferenciales.\n"
+    
+    texto += "\nPor estos resultados, puedo ofrecerte:\n\n"
+    
+    # Oferta limpia (sin markdown)
+    producto = NOMBRES_PRODUCTO.get(tipo_producto, "Crédito Empresarial")
+    condicion_sector = CONDICIONES_SECTOR.get(sector)
+    if condicion_sector:
+        producto += f" para {condicion_sector[0].title()}"
+    
+    plazo = oferta["plazo_maximo_meses"]
+    texto += "🏦 OFERTA CREDITICIA PRE-APROBADA\n\n"
+    texto += f"Producto: {producto}\n"
+    texto += f"Monto aprobado: ${oferta['monto_aprobado']:,} COP\n"
+    texto += f"Plazo máximo: {plazo} meses ({plazo / 12:.1f} años)\n"
+    texto += f"Tasa de interés: DTF + {oferta['spread_porcentaje']}% = {oferta['tasa_ea_porcentaje']}% E.A.\n"
+    texto += f"Cuota mensual estimada: ${oferta['cuota_mensual']:,} COP\n"
+    texto += f"Garantías requeridas: {oferta['garantias_requeridas']}\n"
+    texto += f"Beneficios incluidos: {', '.join(oferta['beneficios_aplicables'])}\n"
+    texto += f"Tiempo de desembolso: {oferta['dias_desembolso']} días hábiles\n"
+    
+    if condicion_sector:
+        texto += f"\nCondiciones especiales {condicion_sector[0]}: {condicion_sector[1]}\n"
+    
+    # Si pidió más de lo aprobado, explicarlo diplomáticamente
+    if monto_solicitado and monto_solicitado > oferta["monto_aprobado"]:
+        texto += (f"\nSolicitaste ${monto_solicitado // 1000000:,}M; con el perfil actual el monto máximo "
+                  f"que podemos aprobar es ${oferta['monto_aprobado'] // 1000000:,}M. "
+                  "Podemos revisar un monto mayor más adelante o por etapas.\n")
+    
+    # Pregunta directa de continuidad
+    if es_cliente_existente:
+        factor_clave = "tu trayectoria como cliente y tus " + describir_score_interno(score_interno)
+    else:
+        factor_clave = "tus " + describir_score_interno(score_interno)
     
-    # Detectar respuesta negativa
-    elif any(palabra in respuesta_normalizada for palabra in palabras_no):
-        return {
-            "decision": "NO", 
-            "tipo_respuesta": "negativa",
-            "siguiente_accion": "despedida_cordial"
-        }
+    texto += f"""
+Esta oferta de ${oferta['monto_aprobado'] // 1000000:,}M está diseñada para {nombre_empresa} considerando {factor_clave}.
+
+¿Te interesa continuar y que un asesor te contacte para formalizar?
+
+✅ Si respondes SÍ: Un asesor te contactará en máximo 24 horas para coordinar el desembolso en {oferta['dias_desembolso']} días hábiles.
+
+❌ Si respondes NO: Esta oferta estará disponible por 30 días sin compromiso.
+
+¿Procedemos con la formalización?"""
     
+    return texto
+
+def construir_input_pulido_oferta(contexto_analisis, tipo_producto, monto_solicitado, oferta_renderizada):
+    """
+    Input para el pulido opcional con el agente ofertador: redacta sobre la oferta ya calculada
+    """
+    return construir_input_ofertador(contexto_analisis, tipo_producto, monto_solicitado) + f"""
+OFERTA BASE YA GENERADA (las cifras son exactas, NO las recalcules ni las cambies):
+{oferta_renderizada}
+
+Mejora la redacción y la personalización manteniendo exactamente el mismo formato, cifras y pregunta de continuidad.
+"""
+
+# Palabras que indican SÍ / NO a la oferta
+PALABRAS_SI = ["sí", "si", "yes", "dale", "perfecto", "excelente", "continuo", "continuar",
+               "acepto", "de acuerdo", "okay", "ok", "bueno", "claro", "afirmativo"]
+PALABRAS_NO = ["no", "not", "nope", "negativo", "paso", "ahora no", "después",
+               "lo pensaré", "más tarde", "rechazar", "declino"]
+
+# Expresiones de duda: contienen "no"/"sí" pero no responden a la oferta
+EXPRESIONES_DUDA = ["no sé", "no se", "no entiendo", "no estoy seguro", "no estoy segura",
+                    "tal vez", "quizás", "quizas"]
+
+
+def _patron_palabras(palabras):
+    """Compila las palabras o frases como tokens completos (no subcadenas)"""
+    alternativas = "|".join(re.escape(palabra) for palabra in sorted(palabras, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternativas})(?!\w)")
+
+
+_PATRON_SI = _patron_palabras(PALABRAS_SI)
+_PATRON_NO = _patron_palabras(PALABRAS_NO)
+_PATRON_DUDA = _patron_palabras(EXPRESIONES_DUDA)
+
+
+def procesar_respuesta_continuidad(respuesta_usuario):
+    """
+    Procesa la respuesta del usuario sobre continuar con la oferta
+
+    Solo una respuesta clara cuenta como SÍ o NO: las palabras se comparan como tokens
+    completos ("necesito" no contiene un "si"), y las preguntas, las dudas o las respuestas
+    con ambas polaridades quedan como UNCLEAR.
+    """
+    respuesta_normalizada = (respuesta_usuario or "").lower().strip()
+
+    dice_si = bool(_PATRON_SI.search(respuesta_normalizada))
+    dice_no = bool(_PATRON_NO.search(respuesta_normalizada))
+    es_ambigua = ("?" in respuesta_normalizada or
+                  _PATRON_DUDA.search(respuesta_normalizada) or
+                  dice_si == dice_no)
+
     # Respuesta ambigua
-    else:
+    if es_ambigua:
         return {
             "decision": "UNCLEAR",
-            "tipo_respuesta": "ambigua", 
+            "tipo_respuesta": "ambigua",
             "siguiente_accion": "clarificar_intencion"
         }
 
+    # Detectar respuesta afirmativa
+    if dice_si:
+        return {
+            "decision": "SI",
+            "tipo_respuesta": "afirmativa",
+            "siguiente_accion": "contacto_asesor"
+        }
+
+    # Detectar respuesta negativa
+    return {
+        "decision": "NO",
+        "tipo_respuesta": "negativa",
+        "siguiente_accion": "despedida_cordial"
+    }
+
 def generar_mensaje_confirmacion_si():
     """Genera mensaje de confirmación cuando el cliente dice SÍ"""
     return """
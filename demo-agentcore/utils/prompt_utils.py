@@ -0,0 +1,301 @@
+# utils/prompt_utils.py
+# Compactación de prompts: serialización mínima de datos y tablas, sin texto redundante
+
+import json
+import re
+import threading
+from collections import deque
+
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Aproximación usada para presupuestos y reportes (sin tokenizer local)
+CARACTERES_POR_TOKEN = 4
+
+# Últimos reportes de compactación (antes/después) por prompt
+_lock_reportes = threading.Lock()
+REPORTES_COMPACTACION = deque(maxlen=100)
+
+_SEPARADORES_CELDA = re.compile(r"[\s|;:,\t]+")
+
+
+def estimar_tokens(texto):
+    """
+    Estima la cantidad de tokens de un texto (≈ 4 caracteres por token)
+    """
+    if not texto:
+        return 0
+    return (len(texto) + CARACTERES_POR_TOKEN - 1) // CARACTERES_POR_TOKEN
+
+
+def json_compacto(obj):
+    """
+    JSON minificado y sin escapar acentos (menos tokens que indent=2)
+    """
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _texto_celda(celda):
+    """
+    Texto de una celda, venga como valor simple o como dict estilo Textract
+    """
+    if isinstance(celda, dict):
+        for clave in ("text", "Text", "value", "valor"):
+            if clave in celda:
+                return str(celda[clave])
+        return json_compacto(celda)
+    if celda is None:
+        return ""
+    return str(celda)
+
+
+def _filas_tabla(tabla):
+    """
+    Normaliza una tabla a lista de filas (lista de textos). Devuelve None si no se reconoce.
+
+    Formatos soportados:
+        - lista de listas: [["Cuenta", "2023"], ["Activo", "100"]]
+        - lista de dicts: [{"cuenta": "Activo", "2023": 100}]
+        - dict con "rows": lista de listas o de dicts (con "headers" opcional)
+        - dict con "cells": celdas con row_index/column_index y text (estilo Textract)
+    """
+    if isinstance(tabla, dict):
+        if "cells" in tabla and isinstance(tabla["cells"], list):
+            posiciones = {}
+            for celda in tabla["cells"]:
+                if not isinstance(celda, dict):
+                    return None
+                fila = celda.get("row_index", celda.get("RowIndex"))
+                columna = celda.get("column_index", celda.get("ColumnIndex"))
+                if fila is None or columna is None:
+                    return None
+                posiciones[(int(fila), int(columna))] = _texto_celda(celda)
+            if not posiciones:
+                return []
+            n_filas = max(f for f, _ in posiciones) + 1
+            n_columnas = max(c for _, c in posiciones) + 1
+            minimo_fila = min(f for f, _ in posiciones)
+            minimo_columna = min(c for _, c in posiciones)
+            return [
+                [posiciones.get((f, c), "") for c in range(minimo_columna, n_columnas)]
+                for f in range(minimo_fila, n_filas)
+            ]
+
+        if "rows" in tabla and isinstance(tabla["rows"], list):
+            filas = _filas_tabla(tabla["rows"])
+            if filas is not None and tabla.get("headers"):
+                encabezados = [_texto_celda(h) for h in tabla["headers"]]
+                if not filas or filas[0] != encabezados:
+                    filas = [encabezados] + filas
+            return filas
+
+        return None
+
+    if isinstance(tabla, list):
+        if not tabla:
+            return []
+        if all(isinstance(fila, (list, tuple)) for fila in tabla):
+            return [[_texto_celda(c) for c in fila] for fila in tabla]
+        if all(isinstance(fila, dict) for fila in tabla):
+            encabezados = []
+            for fila in tabla:
+                for clave in fila:
+                    if clave not in encabezados:
+                        encabezados.append(clave)
+            return [[str(h) for h in encabezados]] + [
+                [_texto_celda(fila.get(h)) for h in encabezados] for fila in tabla
+            ]
+
+    return None
+
+
+def tabla_a_texto(tabla, formato="markdown"):
+    """
+    Renderiza una tabla como markdown o CSV; si el formato no se reconoce, JSON compacto
+    """
+    filas = _filas_tabla(tabla)
+    if filas is None:
+        return json_compacto(tabla)
+    if not filas:
+        return "(tabla vacía)"
+
+    ancho = max(len(fila) for fila in filas)
+    filas = [list(fila) + [""] * (ancho - len(fila)) for fila in filas]
+
+    if formato == "csv":
+        def celda_csv(valor):
+            valor = valor.replace("\n", " ").strip()
+            if any(c in valor for c in ',"'):
+                return '"' + valor.replace('"', '""') + '"'
+            return valor
+        return "\n".join(",".join(celda_csv(c) for c in fila) for fila in filas)
+
+    def celda_md(valor):
+        return valor.replace("\n", " ").replace("|", "/").strip()
+
+    lineas = ["| " + " | ".join(celda_md(c) for c in filas[0]) + " |",
+              "|" + "---|" * ancho]
+    lineas += ["| " + " | ".join(celda_md(c) for c in fila) + " |" for fila in filas[1:]]
+    return "\n".join(lineas)
+
+
+def tablas_a_texto(tablas, formato="markdown"):
+    """
+    Renderiza una lista de tablas, numeradas, en el formato indicado
+    """
+    if not tablas:
+        return "No se encontraron tablas"
+
+    bloques = []
+    for i, tabla in enumerate(tablas, 1):
+        titulo = (tabla.get("title") or tabla.get("titulo")) if isinstance(tabla, dict) else None
+        encabezado = f"Tabla {i}" + (f": {titulo}" if titulo else "")
+        bloques.append(f"{encabezado}\n{tabla_a_texto(tabla, formato)}")
+    return "\n\n".join(bloques)
+
+
+def _filas_como_tokens(tablas):
+    """
+    Valores (normalizados) de cada fila de las tablas: un conjunto por fila, para que
+    etiqueta y cifra solo coincidan si están en la misma fila
+    """
+    filas_tokens = []
+    for tabla in tablas or []:
+        for fila in _filas_tabla(tabla) or []:
+            tokens = {token for celda in fila for token in _SEPARADORES_CELDA.split(celda.lower()) if token}
+            if tokens:
+                filas_tokens.append(tokens)
+    return filas_tokens
+
+
+def _es_cifra(token):
+    return any(c.isdigit() for c in token)
+
+
+def eliminar_texto_redundante(texto, tablas):
+    """
+    Quita del texto extraído las líneas que repiten una fila de una tabla: todas sus
+    palabras y cifras están en la misma fila, con al menos una etiqueta y una cifra
+    ("Utilidad neta 500" se omite solo si la fila Utilidad neta dice 500)
+    """
+    if not texto or not tablas:
+        return texto or ""
+
+    filas_tokens = _filas_como_tokens(tablas)
+    if not filas_tokens:
+        return texto
+
+    # Índice etiqueta -> filas que la contienen, para no recorrer todas las filas por línea
+    filas_por_token = {}
+    for tokens in filas_tokens:
+        for token in tokens:
+            filas_por_token.setdefault(token, []).append(tokens)
+
+    lineas_conservadas = []
+    for linea in texto.splitlines():
+        tokens = {t for t in _SEPARADORES_CELDA.split(linea.lower()) if t}
+        etiquetas = [t for t in tokens if not _es_cifra(t)]
+        if etiquetas and len(etiquetas) < len(tokens):
+            candidatas = filas_por_token.get(etiquetas[0], ())
+            if any(tokens <= fila for fila in candidatas):
+                continue
+        lineas_conservadas.append(linea)
+
+    return "\n".join(lineas_conservadas)
+
+
+def truncar_por_presupuesto(texto, max_tokens):
+    """
+    Recorta el texto al presupuesto de tokens, cortando en un salto de línea si es posible
+    """
+    if not texto or not max_tokens or estimar_tokens(texto) <= max_tokens:
+        return texto or ""
+
+    limite = max_tokens * CARACTERES_POR_TOKEN
+    corte = texto.rfind("\n", 0, limite)
+    if corte < limite // 2:
+        corte = limite
+
+    omitidos = len(texto) - corte
+    return texto[:corte].rstrip() + f"\n[... {omitidos} caracteres omitidos por presupuesto ...]"
+
+
+def compactar_documento(financial_data, extracted_text, tables, formato="markdown",
+                        max_tokens_texto=None, max_tokens_tablas=None, max_tokens_datos=None,
+                        nombre_reporte=None):
+    """
+    Secciones compactas de un documento para los prompts de análisis
+
+    Cada sección tiene su propio presupuesto de tokens (None: sin límite); si alguna se
+    recorta queda marcada en el prompt y se registra un warning. Con nombre_reporte se
+    registra el tamaño de las secciones antes y después de compactar.
+
+    Returns:
+        dict: "datos" (JSON minificado), "texto" (sin líneas repetidas en las tablas) y
+        "tablas" (markdown/CSV, o JSON minificado con formato="json"), cada una recortada
+        a su presupuesto
+    """
+    tables = tables or []
+
+    if formato == "json":
+        tablas_texto = json_compacto(tables) if tables else "No se encontraron tablas"
+    else:
+        tablas_texto = tablas_a_texto(tables, formato)
+
+    texto = eliminar_texto_redundante(extracted_text or "", tables)
+
+    secciones = {}
+    for seccion, contenido, max_tokens in (("datos", json_compacto(financial_data), max_tokens_datos),
+                                           ("texto", texto, max_tokens_texto),
+                                           ("tablas", tablas_texto, max_tokens_tablas)):
+        secciones[seccion] = truncar_por_presupuesto(contenido, max_tokens)
+        if len(secciones[seccion]) < len(contenido):
+            logger.warning("Sección %s del documento recortada: ~%s tokens para un presupuesto de %s",
+                           seccion, estimar_tokens(contenido), max_tokens)
+
+    if nombre_reporte:
+        registrar_compactacion(
+            nombre_reporte,
+            estimar_tokens_sin_compactar(financial_data, extracted_text, tables),
+            sum(estimar_tokens(valor) for valor in secciones.values())
+        )
+
+    return secciones
+
+
+def estimar_tokens_sin_compactar(financial_data, extracted_text, tables):
+    """
+    Tokens que ocuparían las mismas secciones con la serialización original (indent=2)
+    """
+    return (
+        estimar_tokens(json.dumps(financial_data, indent=2))
+        + estimar_tokens(extracted_text or "")
+        + estimar_tokens(json.dumps(tables, indent=2))
+    )
+
+
+def registrar_compactacion(nombre_prompt, tokens_antes, tokens_despues):
+    """
+    Registra y loguea el tamaño de un prompt antes y después de compactarlo
+    """
+    reporte = {
+        "prompt": nombre_prompt,
+        "tokens_antes": tokens_antes,
+        "tokens_despues": tokens_despues,
+        "ahorro_porcentaje": round((1 - tokens_despues / tokens_antes) * 100, 1) if tokens_antes else 0.0
+    }
+
+    with _lock_reportes:
+        REPORTES_COMPACTACION.append(reporte)
+
+    logger.info("Prompt %s: ~%s → ~%s tokens (%s%% menos)", nombre_prompt, tokens_antes, tokens_despues, reporte["ahorro_porcentaje"])
+    return reporte
+
+
+def obtener_reportes_compactacion():
+    """
+    Copia de los últimos reportes de compactación
+    """
+    with _lock_reportes:
+        return list(REPORTES_COMPACTACION)
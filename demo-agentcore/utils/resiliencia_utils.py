@@ -0,0 +1,339 @@
+# utils/resiliencia_utils.py
+# Invocación resiliente de agentes: deadline por agente, reintentos con backoff ante
+# throttling, circuit breaker y presupuesto de latencia por solicitud
+
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+
+from config import (
+    TIMEOUT_AGENTES,
+    TIMEOUT_AGENTE_DEFECTO,
+    REINTENTOS_MAX,
+    BACKOFF_BASE_SEGUNDOS,
+    BACKOFF_MAX_SEGUNDOS,
+    CIRCUITO_UMBRAL_FALLOS,
+    CIRCUITO_ENFRIAMIENTO_SEGUNDOS,
+    MARGEN_ETAPAS_OPCIONALES_SEGUNDOS,
+    LLAMADAS_MODELO_MAX_WORKERS
+)
+
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Códigos de error de Bedrock que indican saturación transitoria (vale la pena reintentar)
+CODIGOS_THROTTLING = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException"
+}
+
+# Errores de conexión de botocore que también cuentan como falla del servicio
+ERRORES_CONEXION = {
+    "EndpointConnectionError",
+    "ConnectTimeoutError",
+    "ReadTimeoutError",
+    "ConnectionClosedError"
+}
+
+# Instante límite (time.monotonic) de la solicitud en curso; None sin presupuesto
+_limite_solicitud = contextvars.ContextVar("limite_solicitud", default=None)
+
+# Evento de la llamada al modelo en curso: se activa cuando vence su deadline
+_abandono_llamada = contextvars.ContextVar("abandono_llamada", default=None)
+
+# Hilos donde corren las llamadas al modelo, para poder abandonarlas al vencer el deadline
+_executor_llamadas = ThreadPoolExecutor(max_workers=LLAMADAS_MODELO_MAX_WORKERS, thread_name_prefix="modelo")
+
+_lock_estadisticas = threading.Lock()
+ESTADISTICAS_RESILIENCIA = {}  # agente -> {"llamadas", "reintentos", "timeouts", "errores", "circuito_abierto"}
+
+
+class TiempoAgotadoError(TimeoutError):
+    """
+    La llamada al agente superó su deadline o el presupuesto de la solicitud
+    """
+
+
+class LlamadaAbandonadaError(RuntimeError):
+    """
+    Se lanza dentro de una llamada abandonada por deadline para cortar el stream del modelo
+    """
+
+
+class CircuitoAbiertoError(RuntimeError):
+    """
+    El circuito del agente está abierto: la llamada se rechaza sin contactar al modelo
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por agente: tras CIRCUITO_UMBRAL_FALLOS fallos seguidos se abre y
+    rechaza llamadas durante el enfriamiento; luego deja pasar una de prueba (semiabierto)
+    """
+
+    def __init__(self, umbral_fallos=5, enfriamiento_segundos=30):
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento_segundos = enfriamiento_segundos
+        self._fallos = 0
+        self._abierto_desde = None
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        with self._lock:
+            return self._estado()
+
+    def _estado(self):
+        if self._abierto_desde is None:
+            return "cerrado"
+        if time.monotonic() - self._abierto_desde >= self.enfriamiento_segundos:
+            return "semiabierto"
+        return "abierto"
+
+    def permitir(self):
+        """
+        True si la llamada puede hacerse (en semiabierto solo pasa una llamada de prueba)
+        """
+        with self._lock:
+            estado = self._estado()
+            if estado == "cerrado":
+                return True
+            if estado == "semiabierto" and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+            return False
+
+    def registrar_exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_desde = None
+            self._prueba_en_curso = False
+
+    def liberar_prueba(self):
+        """
+        Error ajeno al servicio: no cambia el estado, solo libera la llamada de prueba
+        """
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._prueba_en_curso or self._fallos >= self.umbral_fallos:
+                self._abierto_desde = time.monotonic()
+            self._prueba_en_curso = False
+
+
+_circuitos = {}
+_lock_circuitos = threading.Lock()
+
+
+def obtener_circuito(agente):
+    """
+    Circuit breaker del agente (uno por nombre, compartido por todo el proceso)
+    """
+    with _lock_circuitos:
+        circuito = _circuitos.get(agente)
+        if circuito is None:
+            circuito = _circuitos[agente] = CircuitBreaker(CIRCUITO_UMBRAL_FALLOS, CIRCUITO_ENFRIAMIENTO_SEGUNDOS)
+        return circuito
+
+
+@contextmanager
+def contexto_presupuesto(segundos):
+    """
+    Abre el presupuesto de latencia de una solicitud (los hilos que copian el
+    contexto, como el de buró, comparten el mismo límite)
+    """
+    token = _limite_solicitud.set(time.monotonic() + segundos if segundos else None)
+    try:
+        yield
+    finally:
+        _limite_solicitud.reset(token)
+
+
+def tiempo_restante():
+    """
+    Segundos que le quedan a la solicitud en curso (None si no hay presupuesto)
+    """
+    limite = _limite_solicitud.get()
+    if limite is None:
+        return None
+    return limite - time.monotonic()
+
+
+def presupuesto_holgado(margen=MARGEN_ETAPAS_OPCIONALES_SEGUNDOS):
+    """
+    Indica si queda tiempo para una etapa opcional (pulido de oferta, resumen con LLM)
+    """
+    restante = tiempo_restante()
+    return restante is None or restante > margen
+
+
+def es_throttling(error):
+    """
+    Reconoce throttling de Bedrock, venga como ClientError de botocore o como
+    excepción de strands (ModelThrottledException)
+    """
+    if type(error).__name__ == "ModelThrottledException":
+        return True
+    respuesta = getattr(error, "response", None)
+    if isinstance(respuesta, dict):
+        return respuesta.get("Error", {}).get("Code") in CODIGOS_THROTTLING
+    return False
+
+
+def es_falla_servicio(error):
+    """
+    Errores que indican un servicio degradado y abren el circuito (throttling, 5xx,
+    conexión). Los errores de validación o de programación no cuentan.
+    """
+    if es_throttling(error) or type(error).__name__ in ERRORES_CONEXION:
+        return True
+    respuesta = getattr(error, "response", None)
+    if isinstance(respuesta, dict):
+        return respuesta.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) >= 500
+    return False
+
+
+def espera_backoff(intento, base=BACKOFF_BASE_SEGUNDOS, maximo=BACKOFF_MAX_SEGUNDOS):
+    """
+    Backoff exponencial con jitter completo: uniforme entre 0 y min(maximo, base * 2^intento)
+    """
+    return random.uniform(0, min(maximo, base * (2 ** intento)))
+
+
+def _contar(agente, campo):
+    with _lock_estadisticas:
+        conteo = ESTADISTICAS_RESILIENCIA.setdefault(
+            agente, {"llamadas": 0, "reintentos": 0, "timeouts": 0, "errores": 0, "circuito_abierto": 0}
+        )
+        conteo[campo] += 1
+
+
+def _timeout_llamada(agente):
+    """
+    Deadline de la llamada: el del agente, recortado a lo que le queda a la solicitud
+    """
+    timeout = TIMEOUT_AGENTES.get(agente, TIMEOUT_AGENTE_DEFECTO)
+    restante = tiempo_restante()
+    if restante is not None:
+        timeout = min(timeout, restante)
+    return timeout
+
+
+def callback_con_abandono(callback_handler=None):
+    """
+    callback_handler de strands que corta la llamada si ya venció su deadline: lanza
+    LlamadaAbandonadaError en el siguiente evento del stream (el Agent deja de leer y se
+    cierra la conexión) y no reenvía más tokens al cliente
+    """
+    def handler(**kwargs):
+        abandono = _abandono_llamada.get()
+        if abandono is not None and abandono.is_set():
+            raise LlamadaAbandonadaError("Llamada abandonada por deadline")
+        if callback_handler is not None:
+            callback_handler(**kwargs)
+
+    return handler
+
+
+def llamar_con_deadline(funcion, timeout):
+    """
+    Ejecuta funcion() con un límite de tiempo. Al vencer se lanza TiempoAgotadoError y
+    la llamada se marca como abandonada.
+
+    Python no permite interrumpir el hilo: la llamada abandonada sigue ocupando un worker
+    de LLAMADAS_MODELO_MAX_WORKERS hasta que se corta en el siguiente evento del stream
+    (agentes creados con callback_con_abandono) o hasta el read_timeout de botocore
+    (MODEL_READ_TIMEOUT_SEGUNDOS) si el modelo deja de enviar datos. Los tokens que ya
+    generó el modelo se cobran igual.
+    """
+    if timeout <= 0:
+        raise TiempoAgotadoError("Presupuesto de la solicitud agotado")
+
+    abandono = threading.Event()
+    contexto = contextvars.copy_context()
+    contexto.run(_abandono_llamada.set, abandono)
+    futuro = _executor_llamadas.submit(contexto.run, funcion)
+    try:
+        return futuro.result(timeout=timeout)
+    except FuturesTimeoutError:
+        abandono.set()
+        futuro.cancel()
+        raise TiempoAgotadoError(f"Sin respuesta en {timeout:.1f}s")
+
+
+def invocar_resiliente(agente, funcion):
+    """
+    Ejecuta la llamada al modelo de un agente con deadline, reintentos con backoff ante
+    throttling y circuit breaker
+
+    Estos son los únicos reintentos: botocore (MODEL_BOTO_CONFIG) y el Agent de strands
+    (crear_agente) se configuran sin reintentos propios, así que una llamada hace como
+    máximo REINTENTOS_MAX + 1 intentos.
+
+    Args:
+        agente (str): Nombre del agente (define deadline y circuito)
+        funcion (callable): Llamada real al modelo, sin argumentos
+
+    Raises:
+        CircuitoAbiertoError, TiempoAgotadoError o el último error del modelo
+    """
+    circuito = obtener_circuito(agente)
+
+    for intento in range(REINTENTOS_MAX + 1):
+        if not circuito.permitir():
+            _contar(agente, "circuito_abierto")
+            raise CircuitoAbiertoError(f"Circuito abierto para el agente {agente}")
+
+        _contar(agente, "llamadas")
+        try:
+            resultado = llamar_con_deadline(funcion, _timeout_llamada(agente))
+        except TiempoAgotadoError:
+            _contar(agente, "timeouts")
+            circuito.registrar_fallo()
+            logger.warning("Agente %s: tiempo agotado", agente)
+            raise
+        except Exception as e:
+            if es_falla_servicio(e):
+                circuito.registrar_fallo()
+            else:
+                circuito.liberar_prueba()
+            if not es_throttling(e) or intento == REINTENTOS_MAX:
+                _contar(agente, "errores")
+                raise
+
+            espera = espera_backoff(intento)
+            restante = tiempo_restante()
+            if restante is not None and espera >= restante:
+                _contar(agente, "errores")
+                raise
+            _contar(agente, "reintentos")
+            logger.warning("Agente %s: throttling, reintento %s/%s en %.2fs", agente, intento + 1, REINTENTOS_MAX, espera)
+            time.sleep(espera)
+            continue
+
+        circuito.registrar_exito()
+        return resultado
+
+
+def obtener_estadisticas_resiliencia():
+    """
+    Llamadas, reintentos, timeouts, errores y estado del circuito por agente
+    """
+    with _lock_estadisticas:
+        estadisticas = {agente: dict(conteo) for agente, conteo in ESTADISTICAS_RESILIENCIA.items()}
+    with _lock_circuitos:
+        circuitos = dict(_circuitos)
+    for agente, circuito in circuitos.items():
+        estadisticas.setdefault(agente, {})["estado_circuito"] = circuito.estado
+    return estadisticas
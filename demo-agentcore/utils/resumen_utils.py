@@ -0,0 +1,143 @@
+# utils/resumen_utils.py
+# Resúmenes conversacionales generados con plantillas (sin llamada al modelo)
+
+from .main_utils import formatear_explicacion_dual_analisis
+
+
+def _lista_texto(elementos, maximo=3):
+    """
+    Convierte una lista en viñetas de texto (máximo N elementos, sin vacíos)
+    """
+    elementos = [str(e) for e in (elementos or []) if e][:maximo]
+    return "".join(f"\n- {e}" for e in elementos)
+
+
+def _explicacion_dual(scoring_details, buro_details, analisis_combinado, contexto, decision_final):
+    """
+    Explicación dual (interno + buró) ya formateada, sin scores técnicos
+    """
+    score_interno = (scoring_details or {}).get("score", 0) or 0
+    score_buro = buro_details.get("score_buro") if buro_details else None
+    return formatear_explicacion_dual_analisis(
+        score_interno,
+        score_buro,
+        decision_final,
+        (contexto or {}).get("es_cliente_existente", False)
+    )
+
+
+def resumen_rechazo(company_name, scoring_details, buro_details, analisis_combinado, contexto, **_):
+    """
+    Resumen para solicitudes no aprobadas tras el análisis documental completo
+    """
+    decision_final = analisis_combinado.get("decision_final") if analisis_combinado else "pending"
+    scoring_details = scoring_details or {}
+
+    texto = f"Gracias por compartir la información de {company_name}. Ya completamos la evaluación crediticia.\n\n"
+    texto += _explicacion_dual(scoring_details, buro_details, analisis_combinado, contexto, decision_final)
+
+    factores = (analisis_combinado or {}).get("factores_determinantes") or scoring_details.get("factores_riesgo")
+    if factores:
+        texto += "\n\nLos factores que más pesaron en la decisión fueron:" + _lista_texto(factores)
+
+    fortalezas = scoring_details.get("fortalezas_principales") or (analisis_combinado or {}).get("fortalezas_identificadas")
+    if fortalezas:
+        texto += "\n\nTambién identificamos fortalezas importantes:" + _lista_texto(fortalezas)
+
+    recomendaciones = scoring_details.get("recomendaciones") or scoring_details.get("areas_mejora")
+    texto += "\n\n¿Cómo seguir desde aquí?"
+    if recomendaciones:
+        texto += _lista_texto(recomendaciones)
+    texto += "\n- Podemos evaluar un monto menor o un desembolso por etapas"
+    texto += "\n- Puedes aportar garantías adicionales o un codeudor para fortalecer la solicitud"
+    texto += "\n- Con estados financieros actualizados podemos repetir la evaluación más adelante"
+    texto += "\n\n¿Quieres que exploremos alguna de estas alternativas?"
+
+    return texto
+
+
+def resumen_scoring_directo(company_name, scoring_details, buro_details, analisis_combinado, contexto, decision_final=None, **_):
+    """
+    Resumen del scoring directo (aprobado, condicional o rechazado)
+    """
+    scoring_details = scoring_details or {}
+    if decision_final is None:
+        decision_final = (analisis_combinado or {}).get("decision_final") or scoring_details.get("decision", "pending")
+
+    texto = f"Terminamos la evaluación crediticia de {company_name}.\n\n"
+    texto += _explicacion_dual(scoring_details, buro_details, analisis_combinado, contexto, decision_final)
+
+    fortalezas = scoring_details.get("fortalezas_principales") or (analisis_combinado or {}).get("fortalezas_identificadas")
+    if fortalezas:
+        texto += "\n\nFactores a favor:" + _lista_texto(fortalezas)
+
+    factores = scoring_details.get("factores_riesgo") or (analisis_combinado or {}).get("factores_determinantes")
+    if factores:
+        texto += "\n\nAspectos a tener en cuenta:" + _lista_texto(factores)
+
+    if decision_final in ["APROBADO", "approved", "CONDICIONAL"]:
+        if scoring_details.get("condiciones") and decision_final == "CONDICIONAL":
+            texto += f"\n\nCondiciones: {scoring_details['condiciones']}"
+        texto += "\n\nPróximo paso: con este resultado podemos preparar tu oferta crediticia. ¿Te la presento?"
+    else:
+        recomendaciones = scoring_details.get("recomendaciones") or scoring_details.get("areas_mejora")
+        texto += "\n\nPróximos pasos recomendados:"
+        if recomendaciones:
+            texto += _lista_texto(recomendaciones)
+        texto += "\n- Evaluar un monto menor o aportar garantías adicionales"
+        texto += "\n\n¿Quieres que revisemos alguna de estas alternativas?"
+
+    return texto
+
+
+def resumen_datos_insuficientes(financial_data, contexto, **_):
+    """
+    Respuesta empática cuando el documento no permite evaluar
+    """
+    extraction_summary = (financial_data or {}).get("extraction_summary", {}) or {}
+    nombre = (contexto or {}).get("nombre_empresa") or (contexto or {}).get("company_name")
+
+    texto = "Gracias por enviarnos la información"
+    texto += f" de {nombre}." if nombre else "."
+    texto += (" Revisamos el documento, pero no encontramos datos financieros suficientes"
+              " para completar la evaluación crediticia.")
+
+    if extraction_summary:
+        encontrados = [str(clave).replace("_", " ") for clave, valor in extraction_summary.items() if valor]
+        if encontrados:
+            texto += "\n\nAlcanzamos a identificar:" + _lista_texto(encontrados, maximo=5)
+
+    texto += """
+
+Para evaluarte necesitamos:
+- Balance general (activos, pasivos y patrimonio) del último año
+- Estado de resultados (ingresos, costos, utilidad operacional y neta)
+- Idealmente, las cifras del año anterior para ver la tendencia
+
+Lo más fácil es subir el PDF de los estados financieros 2024 (firmados por contador o revisor fiscal). Si el archivo es escaneado, verifica que sea legible.
+
+¿Puedes compartirnos esos documentos?"""
+
+    return texto
+
+
+PLANTILLAS_RESUMEN = {
+    "rechazo": resumen_rechazo,
+    "scoring_directo": resumen_scoring_directo,
+    "datos_insuficientes": resumen_datos_insuficientes
+}
+
+
+def generar_resumen(plantilla, **datos):
+    """
+    Genera el resumen conversacional con la plantilla indicada
+
+    Args:
+        plantilla (str): "rechazo", "scoring_directo" o "datos_insuficientes"
+        **datos: company_name, scoring_details, buro_details, analisis_combinado,
+                 contexto, financial_data, decision_final (según la plantilla)
+    """
+    if plantilla not in PLANTILLAS_RESUMEN:
+        raise ValueError(f"Plantilla de resumen desconocida: {plantilla}")
+
+    return PLANTILLAS_RESUMEN[plantilla](**datos)
@@ -0,0 +1,232 @@
+# utils/routing_utils.py
+# Routing determinista: aplica las PRIORIDADES DE DECISIÓN del orquestador en código
+
+import re
+import threading
+from typing import NamedTuple, Optional
+
+from .main_utils import clean_markdown, extraer_objeto_json
+from .verificador_utils import extraer_nit_de_mensaje, validar_formato_nit, parsear_nit
+from .ofertador_utils import procesar_respuesta_continuidad
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Contadores de rutas tomadas en el proceso (reglas vs LLM)
+_lock_estadisticas = threading.Lock()
+ESTADISTICAS_ROUTING = {
+    "total": 0,
+    "reglas": 0,
+    "llm": 0,
+    "por_ruta": {}
+}
+
+# Cómo se interpretó cada salida del orquestador (incluye los fallos por tipo)
+ESTADISTICAS_PARSEO = {
+    "estructurada": 0,        # decisión por salida estructurada (sin parseo)
+    "json": 0,                # JSON limpio
+    "json_mixto": 0,          # JSON rodeado de texto o markdown
+    "texto_plano": 0,         # "next_agent" recuperado de un JSON inválido
+    "resumen": 0,             # sin decisión: resumen narrativo
+    "agente_desconocido": 0,  # next_agent fuera de AGENTES_ENRUTABLES
+    "vacio": 0                # salida vacía
+}
+
+AGENTES_ENRUTABLES = ("conversacional", "verificador", "ofertador", "financiero", "scoring", "end")
+
+# Etapas en las que la oferta ya se generó o se resolvió: no se vuelve a ofertar
+ETAPAS_OFERTA_RESUELTA = ("esperando_respuesta_oferta", "oferta_generada", "proceso_formalizado",
+                          "oferta_declinada", "revision_manual_oferta")
+
+_PATRON_NEXT_AGENT = re.compile(r'"next_agent"\s*:\s*"([^"]+)"')
+
+
+class SalidaOrquestador(NamedTuple):
+    """
+    Resultado del orquestador: una ruta (next_agent + info) o un resumen narrativo (texto)
+    """
+    tipo: str                   # "ruta" o "resumen"
+    next_agent: Optional[str] = None
+    info: Optional[str] = None
+    texto: Optional[str] = None
+    origen: Optional[str] = None  # clave de ESTADISTICAS_PARSEO
+
+
+def detectar_senales_conversacion(message, context):
+    """
+    Calcula las detecciones que usa el orquestador para decidir la ruta
+    """
+    context = context or {}
+
+    # Detectar si hay un NIT en el mensaje
+    nit_detectado = extraer_nit_de_mensaje(message or "")
+    nit_valido = False
+    nit_rechazado = False
+    if nit_detectado:
+        nit_valido, _ = validar_formato_nit(nit_detectado)
+        # Con forma de NIT pero rechazado (DV incorrecto): se responde sin llamar agentes
+        nit_rechazado = not nit_valido and parsear_nit(nit_detectado) is not None
+
+    # Detectar si es cliente pre-aprobado que necesita oferta
+    analysis_completed = context.get("analysis_completed", False)
+    decision = context.get("decision", "")
+    stage = context.get("stage", "")
+
+    oferta_resuelta = (stage in ETAPAS_OFERTA_RESUELTA or
+                       context.get("oferta_generada") or
+                       context.get("respuesta_cliente"))
+
+    es_pre_aprobado = (analysis_completed and
+                      decision in ["approved", "APROBADO"] and
+                      not oferta_resuelta)
+
+    return {
+        "nit_detectado": nit_detectado,
+        "nit_valido": nit_valido,
+        "nit_rechazado": nit_rechazado,
+        "es_pre_aprobado": es_pre_aprobado,
+        "esperando_respuesta": stage == "esperando_respuesta_oferta",
+        "analysis_completed": analysis_completed,
+        "decision": decision,
+        "stage": stage
+    }
+
+
+def decidir_ruta_determinista(payload):
+    """
+    Aplica la tabla de PRIORIDADES DE DECISIÓN sin llamar al orquestador
+
+    Returns:
+        tuple: (next_agent, razón) si las reglas resuelven la ruta, (None, None) si se
+        requiere el criterio del LLM
+    """
+    interaction_type = payload.get("type", "message")
+
+    if interaction_type == "message":
+        senales = detectar_senales_conversacion(
+            payload.get("message", ""),
+            payload.get("conversation_context", {})
+        )
+
+        # 1. Esperando respuesta y el mensaje es un SÍ/NO claro → handler de la respuesta a
+        # la oferta (sin LLM: formaliza o declina y actualiza la etapa). Preguntas y
+        # respuestas ambiguas quedan para el orquestador
+        if senales["esperando_respuesta"]:
+            respuesta = procesar_respuesta_continuidad(payload.get("message", ""))
+            if respuesta["decision"] in ("SI", "NO"):
+                return "respuesta_oferta", f"respuesta {respuesta['decision']} a la oferta"
+            return None, None
+
+        # 2. Pre-aprobado sin oferta → ofertador
+        if senales["es_pre_aprobado"]:
+            return "ofertador", "cliente pre-aprobado sin oferta"
+
+        # 3. NIT válido → verificador (un DV inválido se rechaza allí, sin llamar al agente)
+        if senales["nit_valido"]:
+            return "verificador", "NIT válido detectado"
+        if senales["nit_rechazado"]:
+            return "verificador", "NIT con dígito de verificación inválido"
+
+        # 4. Consultas generales: el LLM distingue chat, pedidos de documentos, etc.
+        return None, None
+
+    if interaction_type == "document":
+        # 5. Documento con datos estructurados y tablas → financiero
+        financial_data = payload.get("financial_data", {})
+        tables = payload.get("tables", [])
+        if financial_data and tables:
+            return "financiero", "documento financiero con tablas"
+
+        # Datos parciales o vacíos: el LLM decide entre scoring y end
+        return None, None
+
+    return None, None
+
+
+def _contar_parseo(tipo):
+    with _lock_estadisticas:
+        ESTADISTICAS_PARSEO[tipo] += 1
+
+
+def _salida_estructurada_orquestador(decision):
+    """
+    SalidaOrquestador desde la salida estructurada {"next_agent", "info", "resumen"}
+    """
+    if decision.get("next_agent"):
+        _contar_parseo("estructurada")
+        return SalidaOrquestador(tipo="ruta", next_agent=decision["next_agent"], info=decision.get("info"), origen="estructurada")
+
+    texto = clean_markdown(decision.get("resumen") or "")
+    if not texto:
+        _contar_parseo("vacio")
+        return SalidaOrquestador(tipo="ruta", next_agent="end", info="salida vacía del orquestador", origen="vacio")
+
+    _contar_parseo("resumen")
+    return SalidaOrquestador(tipo="resumen", texto=texto, origen="estructurada")
+
+
+def parsear_salida_orquestador(output):
+    """
+    Interpreta la salida del orquestador en una sola pasada
+
+    Orden de recuperación: JSON con next_agent (limpio o mezclado con texto), luego
+    "next_agent": "..." dentro de un JSON inválido; si no hay decisión, es un resumen.
+    Un dict es la salida estructurada (DecisionOrquestador) y no requiere parseo.
+
+    Returns:
+        SalidaOrquestador
+    """
+    if isinstance(output, dict):
+        return _salida_estructurada_orquestador(output)
+
+    texto = clean_markdown(output)
+    if not texto:
+        _contar_parseo("vacio")
+        return SalidaOrquestador(tipo="ruta", next_agent="end", info="salida vacía del orquestador", origen="vacio")
+
+    decision = extraer_objeto_json(texto, esquema="orquestador")
+    if decision is not None:
+        origen = "json" if texto.startswith("{") and texto.endswith("}") else "json_mixto"
+        next_agent, info = decision["next_agent"], decision.get("info")
+    else:
+        match = _PATRON_NEXT_AGENT.search(texto)
+        if match is None:
+            _contar_parseo("resumen")
+            return SalidaOrquestador(tipo="resumen", texto=texto, origen="resumen")
+        origen = "texto_plano"
+        next_agent, info = match.group(1), "extraído de texto plano"
+
+    _contar_parseo(origen)
+    if next_agent not in AGENTES_ENRUTABLES:
+        _contar_parseo("agente_desconocido")
+        logger.warning("Orquestador devolvió un agente desconocido: %s", next_agent)
+
+    return SalidaOrquestador(tipo="ruta", next_agent=next_agent, info=info, origen=origen)
+
+
+def registrar_ruta(next_agent, origen):
+    """
+    Registra la ruta tomada y su origen ("reglas" o "llm")
+    """
+    with _lock_estadisticas:
+        ESTADISTICAS_ROUTING["total"] += 1
+        ESTADISTICAS_ROUTING[origen] = ESTADISTICAS_ROUTING.get(origen, 0) + 1
+
+        por_ruta = ESTADISTICAS_ROUTING["por_ruta"].setdefault(next_agent, {"reglas": 0, "llm": 0})
+        por_ruta[origen] = por_ruta.get(origen, 0) + 1
+
+
+def obtener_estadisticas_routing():
+    """
+    Devuelve una copia de las estadísticas de routing con el porcentaje resuelto por reglas
+    """
+    with _lock_estadisticas:
+        total = ESTADISTICAS_ROUTING["total"]
+        return {
+            "total": total,
+            "reglas": ESTADISTICAS_ROUTING["reglas"],
+            "llm": ESTADISTICAS_ROUTING["llm"],
+            "porcentaje_reglas": round(ESTADISTICAS_ROUTING["reglas"] * 100 / total, 1) if total else 0.0,
+            "por_ruta": {ruta: dict(conteo) for ruta, conteo in ESTADISTICAS_ROUTING["por_ruta"].items()},
+            "parseo_orquestador": dict(ESTADISTICAS_PARSEO)
+        }
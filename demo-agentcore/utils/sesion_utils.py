@@ -0,0 +1,267 @@
+# utils/sesion_utils.py
+# Estado de conversación en el servidor: el cliente envía solo el mensaje y un
+# session_token, y recibe diffs del contexto e historial en lugar del estado completo
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import SESIONES_BACKEND, SESIONES_RUTA_SQLITE, SESIONES_TTL_SEGUNDOS, SESIONES_MAX
+
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
+
+
+class ConflictoVersionError(Exception):
+    """
+    La sesión cambió desde que se leyó (otra solicitud concurrente la actualizó)
+    """
+
+
+class SesionesMemoria:
+    """
+    Backend en memoria con TTL, desalojo LRU y versión por sesión
+    """
+
+    def __init__(self, max_entradas=10000, ttl_segundos=86400):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()  # session_id -> (expira_en, estado)
+        self._lock = threading.Lock()
+
+    def obtener(self, session_id):
+        with self._lock:
+            entrada = self._entradas.get(session_id)
+            if entrada is None:
+                return None
+
+            expira_en, estado = entrada
+            if expira_en < time.time():
+                del self._entradas[session_id]
+                return None
+
+            self._entradas.move_to_end(session_id)
+            return dict(estado)
+
+    def guardar(self, session_id, estado, version_esperada):
+        """
+        Guarda el estado si la versión almacenada es version_esperada (0 = sesión nueva)
+
+        Returns:
+            int: nueva versión
+        """
+        with self._lock:
+            entrada = self._entradas.get(session_id)
+            version_actual = entrada[1]["version"] if entrada and entrada[0] >= time.time() else 0
+            if version_actual != version_esperada:
+                raise ConflictoVersionError(f"Versión {version_esperada} desactualizada (actual {version_actual})")
+
+            nueva_version = version_actual + 1
+            self._entradas[session_id] = (time.time() + self.ttl_segundos, {**estado, "version": nueva_version})
+            self._entradas.move_to_end(session_id)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+            return nueva_version
+
+    def eliminar(self, session_id):
+        with self._lock:
+            return self._entradas.pop(session_id, None) is not None
+
+    def tamano(self):
+        with self._lock:
+            return len(self._entradas)
+
+
+class SesionesSQLite:
+    """
+    Backend SQLite con TTL y versión por sesión, compartible entre procesos
+    (la actualización condicionada a la versión es atómica)
+    """
+
+    def __init__(self, ruta, max_entradas=100000, ttl_segundos=86400):
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._lock = threading.Lock()
+
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS sesiones ("
+            " session_id TEXT PRIMARY KEY,"
+            " estado TEXT NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " expira_en REAL NOT NULL)"
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_sesiones_expira ON sesiones (expira_en)")
+        self._conexion.commit()
+
+    def obtener(self, session_id):
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT estado, version FROM sesiones WHERE session_id = ? AND expira_en >= ?",
+                (session_id, time.time())
+            ).fetchone()
+        if fila is None:
+            return None
+        return {**json.loads(fila[0]), "version": fila[1]}
+
+    def guardar(self, session_id, estado, version_esperada):
+        ahora = time.time()
+        datos = json.dumps({k: v for k, v in estado.items() if k != "version"}, ensure_ascii=False, default=str)
+        with self._lock:
+            with self._conexion:
+                if version_esperada == 0:
+                    # Sesión nueva (o expirada): se reemplaza solo si no hay una vigente
+                    cursor = self._conexion.execute(
+                        "INSERT INTO sesiones (session_id, estado, version, expira_en) VALUES (?, ?, 1, ?)"
+                        " ON CONFLICT(session_id) DO UPDATE SET estado = excluded.estado, version = 1,"
+                        " expira_en = excluded.expira_en WHERE sesiones.expira_en < ?",
+                        (session_id, datos, ahora + self.ttl_segundos, ahora)
+                    )
+                else:
+                    cursor = self._conexion.execute(
+                        "UPDATE sesiones SET estado = ?, version = version + 1, expira_en = ?"
+                        " WHERE session_id = ? AND version = ? AND expira_en >= ?",
+                        (datos, ahora + self.ttl_segundos, session_id, version_esperada, ahora)
+                    )
+                if cursor.rowcount != 1:
+                    raise ConflictoVersionError(f"Versión {version_esperada} desactualizada para la sesión")
+
+                self._conexion.execute("DELETE FROM sesiones WHERE expira_en < ?", (ahora,))
+                self._conexion.execute(
+                    "DELETE FROM sesiones WHERE session_id IN ("
+                    " SELECT session_id FROM sesiones ORDER BY expira_en DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entradas,)
+                )
+        return version_esperada + 1
+
+    def eliminar(self, session_id):
+        with self._lock:
+            with self._conexion:
+                cursor = self._conexion.execute("DELETE FROM sesiones WHERE session_id = ?", (session_id,))
+        return cursor.rowcount == 1
+
+    def tamano(self):
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT COUNT(*) FROM sesiones WHERE expira_en >= ?", (time.time(),)
+            ).fetchone()[0]
+
+
+if SESIONES_BACKEND == "sqlite":
+    _almacen_sesiones = SesionesSQLite(SESIONES_RUTA_SQLITE, SESIONES_MAX, SESIONES_TTL_SEGUNDOS)
+else:
+    _almacen_sesiones = SesionesMemoria(SESIONES_MAX, SESIONES_TTL_SEGUNDOS)
+
+
+def configurar_almacen_sesiones(backend):
+    """
+    Reemplaza el backend de sesiones (SesionesMemoria, SesionesSQLite u otro con la misma interfaz)
+    """
+    global _almacen_sesiones
+    _almacen_sesiones = backend
+
+
+def obtener_almacen_sesiones():
+    return _almacen_sesiones
+
+
+def diff_contexto(anterior, nuevo):
+    """
+    Diferencia de primer nivel entre dos contextos
+
+    Returns:
+        dict: {"set": claves nuevas o cambiadas, "unset": claves eliminadas}
+    """
+    anterior = anterior or {}
+    nuevo = nuevo or {}
+    return {
+        "set": {clave: valor for clave, valor in nuevo.items() if clave not in anterior or anterior[clave] != valor},
+        "unset": [clave for clave in anterior if clave not in nuevo]
+    }
+
+
+def diff_historial(anterior, nuevo):
+    """
+    Mensajes agregados al historial. El historial es una ventana: el cliente agrega
+    "append" y conserva los últimos "length" mensajes.
+    """
+    anterior = anterior or []
+    nuevo = nuevo or []
+    for agregados in range(len(nuevo) + 1):
+        conservados = len(nuevo) - agregados
+        if conservados <= len(anterior) and nuevo[:conservados] == anterior[len(anterior) - conservados:]:
+            return {"append": nuevo[conservados:], "length": len(nuevo)}
+    return {"append": nuevo, "length": len(nuevo)}
+
+
+def procesar_con_sesion(payload, resolver):
+    """
+    Resuelve una solicitud con el estado guardado en el servidor
+
+    El payload trae "session_token" (vacío o null para abrir una sesión) y solo el
+    mensaje nuevo. La respuesta trae "session_token", "session_version" y, en lugar de
+    conversation_context / conversation_history completos, "context_diff" y "history_diff".
+
+    Args:
+        payload (dict): Solicitud del cliente
+        resolver (callable): resolver(payload) -> dict de respuesta del pipeline
+    """
+    session_id = payload.get("session_token") or secrets.token_urlsafe(24)
+    sesion = _almacen_sesiones.obtener(session_id) if payload.get("session_token") else None
+
+    if payload.get("session_token") and sesion is None:
+        return {"success": False, "error": "Sesión inexistente o expirada", "session_expired": True}
+
+    sesion = sesion or {"user_id": payload.get("user_id"), "contexto": {}, "historial": [], "version": 0}
+    if payload.get("user_id") and sesion["user_id"] and payload["user_id"] != sesion["user_id"]:
+        return {"success": False, "error": "La sesión pertenece a otro usuario"}
+
+    # El pipeline recibe el estado como si lo hubiera enviado el cliente
+    solicitud = {
+        **payload,
+        "user_id": payload.get("user_id") or sesion["user_id"],
+        "conversation_context": dict(sesion["contexto"]),
+        "conversation_history": list(sesion["historial"])
+    }
+    if not solicitud["user_id"]:
+        solicitud["user_id"] = f"user_{session_id[:8]}"
+
+    resultado = resolver(solicitud)
+    if not isinstance(resultado, dict) or not resultado.get("success", True):
+        return resultado
+
+    contexto = resultado.pop("conversation_context", sesion["contexto"])
+    historial = resultado.pop("conversation_history", sesion["historial"])
+
+    try:
+        version = _almacen_sesiones.guardar(
+            session_id,
+            {"user_id": solicitud["user_id"], "contexto": contexto, "historial": historial},
+            sesion["version"]
+        )
+    except ConflictoVersionError as e:
+        logger.warning("Conflicto de versión en sesión: %s", e)
+        return {
+            "success": False,
+            "error": "La sesión fue actualizada por otra solicitud; reintente",
+            "session_conflict": True,
+            "session_token": session_id
+        }
+
+    resultado.update({
+        "session_token": session_id,
+        "session_version": version,
+        "context_diff": diff_contexto(sesion["contexto"], contexto),
+        "history_diff": diff_historial(sesion["historial"], historial)
+    })
+    return resultado
@@ -0,0 +1,82 @@
+# utils/streaming_utils.py
+# Eventos de progreso y tokens para respuestas en streaming
+
+import contextvars
+import queue
+import threading
+
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
+
+# Emisor de eventos de la solicitud en curso (None si no se pidió streaming)
+_emisor_actual = contextvars.ContextVar("emisor_eventos", default=None)
+
+_FIN_STREAM = object()
+
+
+def streaming_activo():
+    """
+    Indica si la solicitud en curso se está respondiendo en streaming
+    """
+    return _emisor_actual.get() is not None
+
+
+def emitir_evento(evento, **datos):
+    """
+    Emite un evento hacia el cliente si hay streaming activo (no-op en caso contrario)
+    """
+    emisor = _emisor_actual.get()
+    if emisor is not None:
+        emisor({"event": evento, **datos})
+
+
+def emitir_progreso(etapa, **datos):
+    """
+    Emite el fin de una etapa del pipeline (ratios, score, buro, decision...)
+    """
+    emitir_evento("progress", stage=etapa, **datos)
+
+
+def crear_callback_tokens(agente):
+    """
+    Crea un callback_handler de strands que reenvía cada fragmento de texto como evento
+    """
+    emisor = _emisor_actual.get()
+
+    def callback_handler(**kwargs):
+        fragmento = kwargs.get("data")
+        if fragmento and emisor is not None:
+            emisor({"event": "token", "agent": agente, "data": fragmento})
+
+    return callback_handler
+
+
+def ejecutar_en_streaming(funcion, *args):
+    """
+    Ejecuta funcion(*args) en un hilo y va entregando sus eventos a medida que ocurren
+
+    Yields:
+        dict: eventos "progress" y "token", y un último evento "final" con el mismo
+        resultado que devolvería la ejecución sin streaming
+    """
+    eventos = queue.Queue()
+    contexto = contextvars.copy_context()
+
+    def trabajador():
+        _emisor_actual.set(eventos.put)
+        try:
+            resultado = funcion(*args)
+        except Exception as e:
+            logger.exception("Error en la solicitud con streaming: %s", e)
+            resultado = {"success": False, "error": str(e)}
+        eventos.put({"event": "final", "result": resultado})
+        eventos.put(_FIN_STREAM)
+
+    threading.Thread(target=contexto.run, args=(trabajador,), daemon=True).start()
+
+    while True:
+        evento = eventos.get()
+        if evento is _FIN_STREAM:
+            break
+        yield evento
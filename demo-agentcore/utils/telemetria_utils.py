@@ -0,0 +1,140 @@
+# utils/telemetria_utils.py
+# Telemetría por etapa: spans de OpenTelemetry (si está instalado) e histogramas de
+# latencia en proceso (p50/p95/p99) con tokens, aciertos de cache y parseo por etapa
+
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+from config import TELEMETRIA_OTEL, TELEMETRIA_MUESTRAS
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("creditbot") if TELEMETRIA_OTEL else None
+except ImportError:
+    _tracer = None
+
+# Atributos de la etapa en curso, para que el código interno los complete (tokens, cache...)
+_etapa_actual = contextvars.ContextVar("etapa_actual", default=None)
+
+_lock_metricas = threading.Lock()
+_metricas = {}  # etapa -> contadores y últimas latencias
+
+# Atributos que se acumulan como contadores en el snapshot
+_CONTADORES = ("input_tokens", "output_tokens", "prompt_tokens")
+
+
+def _nueva_etapa():
+    return {
+        "latencias": deque(maxlen=TELEMETRIA_MUESTRAS),
+        "total": 0,
+        "errores": 0,
+        "cache_hits": 0,
+        "parse_ok": 0,
+        "parse_fallidos": 0,
+        **{contador: 0 for contador in _CONTADORES}
+    }
+
+
+def _registrar(etapa, duracion_ms, atributos, fallo):
+    with _lock_metricas:
+        metricas = _metricas.get(etapa)
+        if metricas is None:
+            metricas = _metricas[etapa] = _nueva_etapa()
+        if duracion_ms is not None:
+            metricas["latencias"].append(duracion_ms)
+        metricas["total"] += 1
+        metricas["errores"] += 1 if fallo else 0
+        metricas["cache_hits"] += 1 if atributos.get("cache_hit") else 0
+        if "parse_ok" in atributos:
+            metricas["parse_ok" if atributos["parse_ok"] else "parse_fallidos"] += 1
+        for contador in _CONTADORES:
+            metricas[contador] += atributos.get(contador) or 0
+
+
+@contextmanager
+def medir_etapa(etapa, **atributos):
+    """
+    Mide una etapa (llamada a agente, flujo, solicitud): abre un span de OpenTelemetry
+    como hijo del span en curso y registra la latencia en el histograma de la etapa
+
+    Yields:
+        dict: atributos de la etapa; lo que se agregue antes de salir queda en el span
+        y en las métricas ("success": False cuenta como error)
+    """
+    atributos = dict(atributos)
+    token = _etapa_actual.set(atributos)
+    inicio = time.perf_counter()
+    fallo = False
+
+    with (_tracer.start_as_current_span(etapa) if _tracer else nullcontext()) as span:
+        try:
+            yield atributos
+        except Exception:
+            fallo = True
+            raise
+        finally:
+            _etapa_actual.reset(token)
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            fallo = fallo or atributos.get("success") is False
+            _registrar(etapa, duracion_ms, atributos, fallo)
+
+            if span is not None:
+                span.set_attribute("creditbot.duration_ms", round(duracion_ms, 1))
+                for clave, valor in atributos.items():
+                    if isinstance(valor, (str, bool, int, float)):
+                        span.set_attribute(f"creditbot.{clave}", valor)
+
+
+def anotar_etapa(**atributos):
+    """
+    Agrega atributos a la etapa en curso (no-op si no hay ninguna abierta)
+    """
+    actual = _etapa_actual.get()
+    if actual is not None:
+        actual.update(atributos)
+
+
+def registrar_parseo(agente, exito):
+    """
+    Registra si la salida de un agente se pudo interpretar (etapa "parseo.<agente>")
+    """
+    _registrar(f"parseo.{agente}", None, {"parse_ok": bool(exito)}, not exito)
+
+
+def percentil(valores_ordenados, p):
+    """
+    Percentil por rango más cercano sobre una lista ya ordenada
+    """
+    if not valores_ordenados:
+        return None
+    indice = min(len(valores_ordenados) - 1, max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1))
+    return round(valores_ordenados[indice], 1)
+
+
+def obtener_snapshot_telemetria():
+    """
+    Latencias (p50/p95/p99/max sobre las últimas TELEMETRIA_MUESTRAS) y contadores por etapa
+    """
+    with _lock_metricas:
+        copia = {etapa: {**metricas, "latencias": sorted(metricas["latencias"])} for etapa, metricas in _metricas.items()}
+
+    snapshot = {}
+    for etapa, metricas in sorted(copia.items()):
+        latencias = metricas.pop("latencias")
+        snapshot[etapa] = {
+            **metricas,
+            "p50_ms": percentil(latencias, 50),
+            "p95_ms": percentil(latencias, 95),
+            "p99_ms": percentil(latencias, 99),
+            "max_ms": round(latencias[-1], 1) if latencias else None
+        }
+    return snapshot
+
+
+def reiniciar_telemetria():
+    with _lock_metricas:
+        _metricas.clear()
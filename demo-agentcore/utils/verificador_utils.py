@@ -8,14 +8,25 @@ import os
 try:
     # Intento 1: Importación relativa desde el paquete
     from ..data.clientes_bd import consultar_cliente
+    from ..data.nit import parsear_nit
 except ImportError:
     try:
         # Intento 2: Importación absoluta
         from data.clientes_bd import consultar_cliente
+        from data.nit import parsear_nit
     except ImportError:
         # Intento 3: Agregar ruta manualmente
         sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         from data.clientes_bd import consultar_cliente
+        from data.nit import parsear_nit
+
+from config import VALIDAR_DIGITO_VERIFICACION
+
+from .mensaje_utils import extraer_features_mensaje
+from .historial_utils import construir_seccion_historial
+from .log_utils import obtener_logger
+
+logger = obtener_logger(__name__)
 
 def construir_input_verificador(nit, contexto_conversacion=None):
     """
@@ -225,44 +236,29 @@ def extraer_nit_de_mensaje(mensaje):
     """
     Extrae el NIT del mensaje del usuario usando expresiones regulares
     """
-    import re
-    
-    # Patrones comunes para NITs en Colombia
-    patrones_nit = [
-        r'\b(\d{9}-\d)\b',  # Formato: 123456789-0
-        r'\b(\d{9})\b',     # Solo números: 123456789
-        r'\b(\d{3}\.?\d{3}\.?\d{3}-\d)\b',  # Con puntos: 123.456.789-0
-    ]
-    
-    for patron in patrones_nit:
-        match = re.search(patron, mensaje)
-        if match:
-            nit_encontrado = match.group(1)
-            # Limpiar y formatear
-            nit_limpio = nit_encontrado.replace(".", "").replace(" ", "")
-            return nit_limpio
-    
-    return None
+    return extraer_features_mensaje(mensaje).nit
 
 def validar_formato_nit(nit):
     """
-    Valida que el NIT tenga formato colombiano válido
+    Valida que el NIT tenga formato colombiano válido y, si se informó, su dígito de
+    verificación DIAN (rechaza DV incorrectos solo con VALIDAR_DIGITO_VERIFICACION)
     """
-    import re
-    
     if not nit:
         return False, "NIT vacío"
     
-    # Limpiar NIT
-    nit_limpio = str(nit).replace("-", "").replace(".", "").replace(" ", "")
-    
-    # Verificar longitud (8-10 dígitos)
-    if len(nit_limpio) < 8 or len(nit_limpio) > 10:
+    nit_normalizado = parsear_nit(nit)
+    if nit_normalizado is None:
+        digitos = str(nit).replace("-", "").replace(".", "").replace(" ", "")
+        if not digitos.isdecimal():
+            return False, "NIT debe contener solo números"
         return False, "NIT debe tener entre 8 y 10 dígitos"
     
-    # Verificar que solo contenga números
-    if not nit_limpio.isdigit():
-        return False, "NIT debe contener solo números"
+    if not nit_normalizado.dv_valido:
+        mensaje = (f"El dígito de verificación no corresponde: para {nit_normalizado.base} "
+                   f"debería ser {nit_normalizado.dv_calculado}")
+        if VALIDAR_DIGITO_VERIFICACION:
+            return False, mensaje
+        logger.warning("NIT %s: %s", nit, mensaje)
     
     return True, "NIT válido"
 
@@ -287,151 +283,26 @@ def procesar_respuesta_verificador(respuesta_agente, nit):
     
 def extraer_info_credito_del_mensaje(mensaje):
     """
-    Extrae información completa usando comprensión de lenguaje natural de Claude
-    VERSIÓN MEJORADA - Sin regex, con comprensión contextual
+    Extrae tipo de crédito, monto y propósito del mensaje
+    (palabras clave y patrones precompilados, ver utils.mensaje_utils)
     """
-    import re
-    
     info = {}
-    mensaje_lower = mensaje.lower()
-    
-    print(f"[LOG] Analizando mensaje para extracción: {mensaje[:100]}...")
-    
-    # EXTRAER TIPO DE CRÉDITO usando comprensión natural
-    tipos_credito = {
-        # Más específico a menos específico
-        "capital de trabajo": "crédito empresarial",
-        "crédito de capital de trabajo": "crédito empresarial", 
-        "crédito empresarial": "crédito empresarial",
-        "crédito comercial": "crédito empresarial",
-        "credito empresarial": "crédito empresarial",
-        "credito comercial": "crédito empresarial",
-        "empresarial": "crédito empresarial",
-        "comercial": "crédito empresarial",
-        "expansión": "crédito empresarial",
-        "expansion": "crédito empresarial",
-        "crecimiento": "crédito empresarial",
-        "inversión": "crédito empresarial",
-        "inversion": "crédito empresarial",
-        "financiamiento": "crédito empresarial",
-        
-        # Línea rotativa
-        "línea de crédito": "línea rotativa",
-        "linea de credito": "línea rotativa", 
-        "línea rotativa": "línea rotativa",
-        "linea rotativa": "línea rotativa",
-        "rotativo": "línea rotativa",
-        "rotativa": "línea rotativa",
-        
-        # Hipotecario
-        "hipotecario": "hipotecario comercial",
-        "hipoteca": "hipotecario comercial",
-        "inmueble": "hipotecario comercial",
-        "propiedad": "hipotecario comercial",
-        
-        # Factoring
-        "factoring": "factoring",
-        "cartera": "factoring",
-        "cuentas por cobrar": "factoring"
-    }
-    
-    for palabra_clave, tipo_estandar in tipos_credito.items():
-        if palabra_clave in mensaje_lower:
-            info["tipo_credito"] = tipo_estandar
-            info["tipo_original"] = palabra_clave
-            print(f"[LOG] Tipo detectado: {palabra_clave} -> {tipo_estandar}")
-            break
-    
-    # EXTRAER MONTO usando comprensión natural mejorada
-    # Patrones más inteligentes y flexibles
-    patrones_monto = [
-        # Números con palabras explícitas
-        r'(\d{1,4})\s*mil\s*millones?',  # 5 mil millones
-        r'(\d{1,3}(?:[.,]\d{3})*)\s*millones?',  # 500 millones, 1.000 millones
-        r'\$\s*(\d{1,3}(?:[.,]\d{3})*)\s*millones?',  # $500 millones
-        
-        # Formato con M
-        r'\$?\s*(\d{1,4})\s*[Mm](?:[Mm])?',  # 500M, $300MM
-        
-        # Números grandes sin millones explícito
-        r'\$\s*(\d{3,}(?:[.,]\d{3})*)',  # $500,000,000
-        
-        # Casos especiales en texto
-        r'quinientos?\s*millones?',  # quinientos millones -> 500
-        r'mil\s*millones?',  # mil millones -> 1000 (cuando no hay número antes)
-    ]
-    
-    for i, patron in enumerate(patrones_monto):
-        match = re.search(patron, mensaje, re.IGNORECASE)
-        if match:
-            if patron == r'quinientos?\s*millones?':
-                numero = 500
-            elif patron == r'mil\s*millones?':
-                numero = 1000
-            else:
-                numero_str = match.group(1).replace('.', '').replace(',', '')
-                try:
-                    numero = int(numero_str)
-                except ValueError:
-                    continue
-            
-            # Calcular monto final
-            if 'mil millones' in match.group(0).lower():
-                monto_final = numero * 1000000000
-                formato = f"${numero} mil millones"
-            elif 'millones' in match.group(0).lower() or 'M' in match.group(0):
-                monto_final = numero * 1000000  
-                formato = f"${numero}M"
-            elif numero >= 100000000:  # Si es un número grande sin palabra
-                monto_final = numero
-                formato = f"${numero//1000000}M"
-            else:
-                monto_final = numero * 1000000
-                formato = f"${numero}M"
-            
-            # Validar rango razonable
-            if monto_final < 1000000:  # Menos de 1M
-                print(f"[WARNING] Monto muy pequeño: ${monto_final:,}")
-                continue
-            elif monto_final > 50000000000:  # Más de 50 mil millones
-                print(f"[WARNING] Monto muy grande: ${monto_final:,}")
-                monto_final = 5000000000  # Limitar a 5 mil millones
-                formato = "$5,000M"
-            
-            info["monto_solicitado"] = monto_final
-            info["monto_formato"] = formato
-            
-            print(f"[LOG] Monto detectado (patrón {i+1}): {match.group(0)} -> ${monto_final:,}")
-            break
-    
-    # EXTRAER PROPÓSITO usando comprensión natural
-    propositos = {
-        "capital de trabajo": "capital de trabajo",
-        "flujo de caja": "capital de trabajo", 
-        "inventario": "capital de trabajo",
-        "operativo": "capital de trabajo",
-        "operación": "capital de trabajo",
-        "expansión": "expansión",
-        "expansion": "expansión", 
-        "crecimiento": "expansión",
-        "ampliación": "expansión",
-        "inversión": "inversión",
-        "inversion": "inversión",
-        "equipos": "compra de equipos",
-        "maquinaria": "compra de equipos",
-        "tecnología": "compra de equipos",
-        "inmueble": "compra de inmueble",
-        "local": "compra de inmueble",
-        "oficina": "compra de inmueble"
-    }
-    
-    for palabra_clave, proposito_estandar in propositos.items():
-        if palabra_clave in mensaje_lower:
-            info["proposito"] = proposito_estandar
-            print(f"[LOG] Propósito detectado: {proposito_estandar}")
-            break
-    
-    print(f"[LOG] Información extraída: {info}")
+    features = extraer_features_mensaje(mensaje)
+
+    logger.debug("Analizando mensaje para extracción: %.100s...", mensaje)
+
+    if features.tipo_credito:
+        info["tipo_credito"] = features.tipo_credito
+        info["tipo_original"] = features.tipo_original
+
+    if features.monto_solicitado is not None:
+        info["monto_solicitado"] = features.monto_solicitado
+        info["monto_formato"] = features.monto_formato
+
+    if features.proposito:
+        info["proposito"] = features.proposito
+
+    logger.debug("Información extraída: %s", info)
     return info
 
 
@@ -488,14 +359,7 @@ CONTEXTO DE LA CONVERSACIÓN:
 - Esperando respuesta del cliente (SÍ/NO)
 """
 
-    history_section = ""
-    if history and len(history) > 0:
-        recent_messages = history[-6:]
-        history_section = "\nHISTORIAL RECIENTE:\n"
-        for msg in recent_messages:
-            sender = "Usuario" if msg.get('sender') == 'user' else "CreditBot"
-            message_text = msg.get('message', '')[:200]
-            history_section += f"{sender}: {message_text}\n"
+    history_section, _ = construir_seccion_historial(history, context)
 
     return f"""{context_section}{history_section}
 MENSAJE ACTUAL DEL USUARIO:
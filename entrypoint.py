@@ -1,14 +1,12 @@
 # entrypoint.py - VERSIÓN FINAL COMPLETA CON TODOS LOS AGENTES
+import contextvars
 import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
+from anyio import to_thread
 from bedrock_agentcore import BedrockAgentCoreApp
-from agents.orquestador import orquestador
-from agents.financiero import financiero
-from agents.scoring import scoring
-from agents.conversacional import conversacional
-from agents.verificador import verificador
-from agents.buro import buro
-from agents.ofertador import ofertador
+from agents.agent_pool import invocar_agente, invocar_agente_estructurado, obtener_estadisticas_pool
 from utils.main_utils import clean_markdown, parse_json, validar_coherencia_solicitud
 from utils.verificador_utils import (
     construir_input_verificador, 
@@ -23,54 +21,175 @@ from utils.buro_utils import (
     combinar_analisis_interno_buro
 )
 from utils.ofertador_utils import (
-    construir_input_ofertador,
+    renderizar_oferta,
+    mensaje_oferta_no_disponible,
+    construir_input_pulido_oferta,
     procesar_respuesta_continuidad,
     generar_mensaje_confirmacion_si,
     generar_mensaje_despedida_no
 )
+from utils.routing_utils import (
+    detectar_senales_conversacion,
+    decidir_ruta_determinista,
+    parsear_salida_orquestador,
+    registrar_ruta,
+    obtener_estadisticas_routing
+)
+from utils.streaming_utils import ejecutar_en_streaming, emitir_progreso, emitir_evento
+from utils.resumen_utils import generar_resumen
+from utils.prompt_utils import compactar_documento, estimar_tokens
+from utils.historial_utils import (
+    agregar_mensajes,
+    construir_seccion_historial,
+    registrar_costo_turno,
+    contexto_turno,
+    crear_entradas_turno
+)
+from utils.mensaje_utils import extraer_features_mensaje
+from utils.resiliencia_utils import contexto_presupuesto, presupuesto_holgado, obtener_estadisticas_resiliencia
+from utils.telemetria_utils import medir_etapa, registrar_parseo, obtener_snapshot_telemetria
+from utils.cache_utils import obtener_estadisticas_cache
+from utils.sesion_utils import procesar_con_sesion
+from utils.log_utils import obtener_logger, contexto_log
+from data.almacen import contexto_consultas
+from data.clientes_bd import consultar_cliente
+from config import (
+    ROUTING_DETERMINISTA,
+    BURO_CONCURRENTE,
+    BURO_MAX_WORKERS,
+    OFERTADOR_LLM,
+    RESUMEN_LLM,
+    PROMPT_COMPACTO,
+    FORMATO_TABLAS_PROMPT,
+    PRESUPUESTO_TOKENS_TEXTO,
+    PRESUPUESTO_TOKENS_TABLAS,
+    PRESUPUESTO_TOKENS_DATOS,
+    REPORTE_COMPACTACION,
+    PRESUPUESTO_SOLICITUD_SEGUNDOS,
+    CONCURRENCIA_MAX_SOLICITUDES
+)
+
+logger = obtener_logger(__name__)
+
+
+@asynccontextmanager
+async def ampliar_hilos_solicitudes(app):
+    """
+    Al arrancar, sube el límite de hilos de anyio (40 por defecto) con el que el runtime
+    despacha el entrypoint síncrono a CONCURRENCIA_MAX_SOLICITUDES. Es todo lo que cambia:
+    el pipeline sigue siendo bloqueante y ocupa un hilo por solicitud en curso.
+    """
+    to_thread.current_default_thread_limiter().total_tokens = CONCURRENCIA_MAX_SOLICITUDES
+    yield
+
+
+app = BedrockAgentCoreApp(lifespan=ampliar_hilos_solicitudes)
+
+# Pool para ejecutar el análisis de buró en paralelo con financiero + scoring: cada
+# solicitud en curso lanza a lo sumo una tarea, así que tiene al menos tantos hilos como
+# solicitudes admite el proceso (con menos, el buró hace cola detrás de otras solicitudes)
+buro_executor = ThreadPoolExecutor(max_workers=max(BURO_MAX_WORKERS, CONCURRENCIA_MAX_SOLICITUDES),
+                                   thread_name_prefix="buro")
 
-app = BedrockAgentCoreApp()
 
-@app.entrypoint
 def invoke(payload):
     """
-    Entrypoint que SIEMPRE pasa por el orquestador primero
+    Entrypoint: con "stream": true en el payload responde en streaming (eventos de
+    progreso, tokens y un evento final con el mismo JSON); si no, devuelve el dict final
+    """
+    if payload.get("stream"):
+        return ejecutar_en_streaming(procesar_solicitud, payload)
+    
+    return procesar_solicitud(payload)
+
+
+app.entrypoint(invoke)
+
+
+def procesar_solicitud(payload):
+    """
+    Procesa una solicitud dentro de su propio ámbito de consultas
+    (cada NIT se consulta una sola vez por solicitud) y de su presupuesto de latencia.
+    Con "session_token" en el payload el estado de la conversación vive en el servidor.
+    Con type "metrics" devuelve el snapshot de métricas del proceso.
+    Todos los logs de la solicitud llevan su request_id (el del payload o uno generado).
+    """
+    if payload.get("type") == "metrics":
+        return {"success": True, "metrics": obtener_metricas()}
+    
+    with contexto_log(request_id=payload.get("request_id"), user_id=payload.get("user_id")) as request_id, \
+            contexto_consultas(), contexto_presupuesto(PRESUPUESTO_SOLICITUD_SEGUNDOS), contexto_turno(), \
+            medir_etapa("solicitud", request_id=request_id, type=payload.get("type", "message"), stream=bool(payload.get("stream"))) as atributos:
+        if "session_token" in payload:
+            resultado = procesar_con_sesion(payload, resolver_solicitud)
+        else:
+            resultado = resolver_solicitud(payload)
+        atributos["success"] = resultado.get("success", True) if isinstance(resultado, dict) else True
+        return resultado
+
+
+def obtener_metricas():
+    """
+    Snapshot de métricas del proceso: latencias por etapa (p50/p95/p99), tokens,
+    routing, pool de agentes, cache y resiliencia
+    """
+    return {
+        "etapas": obtener_snapshot_telemetria(),
+        "routing": obtener_estadisticas_routing(),
+        "pool": obtener_estadisticas_pool(),
+        "cache": obtener_estadisticas_cache(),
+        "resiliencia": obtener_estadisticas_resiliencia()
+    }
+
+
+def resolver_solicitud(payload):
+    """
+    Resuelve la ruta con reglas deterministas y solo consulta
+    al orquestador cuando las reglas no alcanzan
     """
     try:
         interaction_type = payload.get("type", "message")
         user_id = payload.get("user_id", f"user_{hash(str(payload)) % 10000}")
         
-        print(f"[LOG] Iniciando procesamiento - Tipo: {interaction_type}, Usuario: {user_id}")
+        logger.info("Iniciando procesamiento - Tipo: %s, Usuario: %s", interaction_type, user_id)
         
-        # PASO 1: SIEMPRE llamar al orquestador primero
+        # PASO 0: Fast-path con las PRIORIDADES DE DECISIÓN aplicadas en código
+        if ROUTING_DETERMINISTA:
+            next_agent, razon = decidir_ruta_determinista(payload)
+            if next_agent:
+                registrar_ruta(next_agent, "reglas")
+                logger.info("Routing determinista: %s (%s) - %s%% por reglas", next_agent, razon, obtener_estadisticas_routing()["porcentaje_reglas"])
+                return execute_agent_flow(payload, next_agent, user_id)
+        
+        # PASO 1: Llamar al orquestador cuando las reglas no resuelven la ruta
         orchestrator_input = build_orchestrator_input(payload)
         
-        print(f"[LOG] Llamando a orquestador...")
-        orq_result = orquestador(orchestrator_input)
-        orq_output = orq_result.message['content'][0]['text']
+        logger.debug("Llamando a orquestador...")
+        orq_output = invocar_agente_estructurado("orquestador", orchestrator_input, user_id)
+        if orq_output is None:
+            orq_output = invocar_agente("orquestador", orchestrator_input, user_id)
         
-        print(f"[LOG] Orquestador respondió: {orq_output[:100]}...")
+        logger.debug("Orquestador respondió: %.100s...", orq_output)
         
-        # Detectar si es decisión de routing o resumen final
-        if is_routing_decision(orq_output):
-            # Es una decisión de routing
-            orq_decision = parse_json(clean_markdown(orq_output), {"next_agent": "end"})
-            next_agent = orq_decision.get("next_agent", "end")
-            
-            print(f"[LOG] Decisión de routing: {next_agent}")
+        # Decisión de routing o resumen final, interpretado en una sola pasada
+        salida = parsear_salida_orquestador(orq_output)
+        if salida.tipo == "ruta":
+            logger.info("Decisión de routing: %s (%s)", salida.next_agent, salida.origen)
+            registrar_ruta(salida.next_agent, "llm")
             
-            return execute_agent_flow(payload, next_agent, user_id)
+            return execute_agent_flow(payload, salida.next_agent, user_id)
         else:
             # Es un resumen final, devolverlo directamente
+            registrar_ruta("resumen", "llm")
             return {
                 "success": True,
-                "message": clean_markdown(orq_output),
+                "message": salida.texto,
                 "conversation_mode": "dynamic",
                 "user_id": user_id
             }
             
     except Exception as e:
-        print(f"[ERROR] {str(e)}")
+        logger.exception("Error procesando la solicitud: %s", e)
         return {"success": False, "error": str(e)}
 
 
@@ -85,23 +204,15 @@ def build_orchestrator_input(payload):
         message = payload.get("message", "")
         context = payload.get("conversation_context", {})
         
-        # Detectar si hay un NIT en el mensaje
-        nit_detectado = extraer_nit_de_mensaje(message)
-        nit_valido = False
-        if nit_detectado:
-            nit_valido, _ = validar_formato_nit(nit_detectado)
-        
-        # Detectar si es cliente pre-aprobado que necesita oferta
-        analysis_completed = context.get("analysis_completed", False)
-        decision = context.get("decision", "")
-        stage = context.get("stage", "")
-        
-        es_pre_aprobado = (analysis_completed and 
-                          decision in ["approved", "APROBADO"] and 
-                          stage not in ["esperando_respuesta_oferta", "oferta_generada"])
-        
-        # Detectar respuestas a ofertas previas
-        esperando_respuesta = (stage == "esperando_respuesta_oferta")
+        # Mismas detecciones que usa el routing determinista
+        senales = detectar_senales_conversacion(message, context)
+        nit_detectado = senales["nit_detectado"]
+        nit_valido = senales["nit_valido"]
+        es_pre_aprobado = senales["es_pre_aprobado"]
+        esperando_respuesta = senales["esperando_respuesta"]
+        analysis_completed = senales["analysis_completed"]
+        decision = senales["decision"]
+        stage = senales["stage"]
         
         input_text = f"""
 TIPO: CONVERSACIÓN
@@ -173,63 +284,19 @@ Decide qué agente debe procesar este documento.
     return input_text
 
 
-def extract_routing_decision(output):
-    """
-    Extrae la decisión de routing del output del orquestador, manejando respuestas mixtas
-    """
-    try:
-        # Primero intentar con parse_json mejorado
-        decision = parse_json(output, None)
-        if decision and "next_agent" in decision:
-            return decision
-        
-        # Si eso falla, buscar manualmente el JSON en el texto
-        cleaned = clean_markdown(output)
-        
-        # Buscar patrón {"next_agent": "xxx"}
-        import re
-        pattern = r'\{\s*"next_agent"\s*:\s*"([^"]+)"[^}]*\}'
-        match = re.search(pattern, cleaned)
-        
-        if match:
-            return {
-                "next_agent": match.group(1),
-                "info": "extraído de respuesta mixta"
-            }
-        
-        # Como último recurso, buscar next_agent en texto plano
-        pattern2 = r'"next_agent"\s*:\s*"([^"]+)"'
-        match2 = re.search(pattern2, cleaned)
-        
-        if match2:
-            return {
-                "next_agent": match2.group(1),
-                "info": "extraído de texto plano"
-            }
-        
-        print(f"[WARNING] No se pudo extraer decisión de routing de: {output[:200]}...")
-        return {"next_agent": "end", "info": "fallback por error de parsing"}
-        
-    except Exception as e:
-        print(f"[ERROR] Error extrayendo decisión de routing: {e}")
-        return {"next_agent": "end", "info": "fallback por excepción"}
-
-
-def is_routing_decision(output):
+def execute_agent_flow(payload, next_agent, user_id):
     """
-    Detecta si el output del orquestador es una decisión de routing (JSON) o un resumen final (texto)
+    Ejecuta el flujo según la decisión del orquestador, medido en la etapa "flujo.<ruta>"
     """
-    try:
-        cleaned = clean_markdown(output)
-        parsed = json.loads(cleaned)
-        return "next_agent" in parsed
-    except:
-        return False
+    with medir_etapa(f"flujo.{next_agent}", route=next_agent) as atributos:
+        resultado = ejecutar_flujo(payload, next_agent, user_id)
+        atributos["success"] = resultado.get("success", True) if isinstance(resultado, dict) else True
+        return resultado
 
 
-def execute_agent_flow(payload, next_agent, user_id):
+def ejecutar_flujo(payload, next_agent, user_id):
     """
-    Ejecuta el flujo según la decisión del orquestador
+    Despacha al handler de la ruta
     """
     if next_agent == "conversacional":
         return handle_conversational_agent(payload, user_id)
@@ -240,6 +307,14 @@ def execute_agent_flow(payload, next_agent, user_id):
     elif next_agent == "ofertador":
         return handle_ofertador_flow(payload, user_id)
     
+    elif next_agent == "respuesta_oferta":
+        return handle_respuesta_oferta(
+            payload.get("message", ""),
+            payload.get("conversation_context", {}),
+            payload.get("conversation_history", []),
+            user_id
+        )
+    
     elif next_agent == "financiero":
         return handle_financial_flow(payload, user_id)
     
@@ -250,7 +325,7 @@ def execute_agent_flow(payload, next_agent, user_id):
         return handle_insufficient_data(payload, user_id)
     
     else:
-        print(f"[WARNING] Agente desconocido: {next_agent}")
+        logger.warning("Agente desconocido: %s", next_agent)
         return handle_conversational_agent(payload, user_id)
 
 
@@ -259,7 +334,7 @@ def handle_verification_flow(payload, user_id):
     Maneja el flujo de verificación de clientes existentes
     VERSIÓN COMPLETA CORREGIDA - Con validación de coherencia
     """
-    print(f"[LOG] Ejecutando agente verificador...")
+    logger.debug("Ejecutando agente verificador...")
     
     message = payload.get("message", "")
     conversation_context = payload.get("conversation_context", {})
@@ -269,7 +344,7 @@ def handle_verification_flow(payload, user_id):
     nit_detectado = extraer_nit_de_mensaje(message)
     
     if not nit_detectado:
-        print(f"[WARNING] No se pudo extraer NIT del mensaje, redirigiendo a conversacional")
+        logger.warning("No se pudo extraer NIT del mensaje, redirigiendo a conversacional")
         return handle_conversational_agent(payload, user_id)
     
     # Validar formato del NIT
@@ -308,12 +383,11 @@ Por favor, proporciona el NIT en uno de estos formatos:
     # Construir input para el verificador CON la información del crédito
     verificador_input = construir_input_verificador(nit_detectado, contexto_con_info_credito)
     
-    print(f"[LOG] Consultando cliente con NIT: {nit_detectado}")
-    print(f"[LOG] Info crédito extraída: {info_credito}")
+    logger.info("Consultando cliente con NIT: %s", nit_detectado)
+    logger.debug("Info crédito extraída: %s", info_credito)
     
     # Llamar al agente verificador
-    verificador_result = verificador(verificador_input)
-    respuesta_verificador = verificador_result.message['content'][0]['text']
+    respuesta_verificador = invocar_agente("verificador", verificador_input, user_id, streaming=True)
     
     # Procesar la respuesta del verificador
     info_procesada = procesar_respuesta_verificador(respuesta_verificador, nit_detectado)
@@ -335,11 +409,11 @@ Por favor, proporciona el NIT en uno de estos formatos:
         )
         
         # Log para debugging
-        print(f"[LOG] Validación coherencia: {validacion_coherencia}")
+        logger.debug("Validación coherencia: %s", validacion_coherencia)
         
         # Si la solicitud es muy incoherente, agregar advertencia al contexto
         if not validacion_coherencia["es_coherente"]:
-            print(f"[WARNING] Solicitud incoherente - Solicitado: ${info_credito['monto_solicitado']:,}, Sugerido: ${validacion_coherencia['monto_sugerido']:,}")
+            logger.warning("Solicitud incoherente - Solicitado: $%s, Sugerido: $%s", info_credito["monto_solicitado"], validacion_coherencia["monto_sugerido"])
     
     # Actualizar contexto conversacional con TODA la información
     updated_context = {
@@ -367,7 +441,6 @@ Por favor, proporciona el NIT en uno de estos formatos:
         
         # Agregar información sectorial si está disponible
         # Buscar en la base de datos del cliente para obtener el sector
-        from data.clientes_bd import consultar_cliente
         datos_cliente = consultar_cliente(nit_detectado)
         if datos_cliente.get("sector"):
             updated_context["sector"] = datos_cliente["sector"]
@@ -377,8 +450,8 @@ Por favor, proporciona el NIT en uno de estos formatos:
         conversation_history, message, respuesta_verificador
     )
     
-    print(f"[LOG] Verificación completada - Cliente: {info_procesada['es_cliente_existente']}")
-    print(f"[LOG] Contexto actualizado con: {info_credito}")
+    logger.info("Verificación completada - Cliente: %s", info_procesada["es_cliente_existente"])
+    logger.debug("Contexto actualizado con: %s", info_credito)
     
     return {
         "success": True,
@@ -405,7 +478,7 @@ def handle_ofertador_flow(payload, user_id):
     """
     Maneja el flujo del ofertador - genera ofertas para clientes pre-aprobados
     """
-    print(f"[LOG] Ejecutando agente ofertador...")
+    logger.debug("Ejecutando agente ofertador...")
     
     message = payload.get("message", "")
     conversation_context = payload.get("conversation_context", {})
@@ -416,7 +489,7 @@ def handle_ofertador_flow(payload, user_id):
     analysis_completed = conversation_context.get("analysis_completed", False)
     
     if not analysis_completed or decision not in ["approved", "APROBADO"]:
-        print(f"[WARNING] Cliente no pre-aprobado, redirigiendo a conversacional")
+        logger.warning("Cliente no pre-aprobado, redirigiendo a conversacional")
         return handle_conversational_agent(payload, user_id)
     
     # Detectar si es respuesta a oferta previa (SÍ/NO)
@@ -427,18 +500,14 @@ def handle_ofertador_flow(payload, user_id):
     tipo_producto = extraer_tipo_producto(message, conversation_context)
     monto_solicitado = extraer_monto_solicitado(message)
     
-    # Construir input para ofertador
-    ofertador_input = construir_input_ofertador(
-        conversation_context, 
-        tipo_producto, 
-        monto_solicitado
-    )
+    logger.debug("Generando oferta para %s...", tipo_producto)
     
-    print(f"[LOG] Generando oferta para {tipo_producto}...")
+    # Oferta calculada y renderizada en código (pulido LLM opcional)
+    oferta_response = generar_oferta(conversation_context, tipo_producto, monto_solicitado, user_id)
     
-    # Llamar al agente ofertador
-    ofertador_result = ofertador(ofertador_input)
-    oferta_response = ofertador_result.message['content'][0]['text']
+    if oferta_response is None:
+        return oferta_en_revision_manual(message, conversation_context, conversation_history,
+                                         tipo_producto, monto_solicitado, user_id)
     
     # Actualizar contexto - ahora esperamos respuesta del cliente
     updated_context = {
@@ -455,7 +524,7 @@ def handle_ofertador_flow(payload, user_id):
         conversation_history, message, oferta_response
     )
     
-    print(f"[LOG] Oferta generada exitosamente")
+    logger.info("Oferta generada exitosamente")
     
     return {
         "success": True,
@@ -469,18 +538,78 @@ def handle_ofertador_flow(payload, user_id):
     }
 
 
+def oferta_en_revision_manual(message, conversation_context, conversation_history, tipo_producto, monto_solicitado, user_id):
+    """
+    La oferta no se pudo calcular: se informa al cliente sin cifras y la solicitud pasa a
+    revisión manual de un asesor (no se espera respuesta SÍ/NO)
+    """
+    logger.warning("Oferta no calculable para %s: pasa a revisión manual", conversation_context.get("nit_empresa"))
+    mensaje = mensaje_oferta_no_disponible(conversation_context.get("nombre_empresa") or "tu empresa")
+    emitir_evento("token", agent="ofertador", data=mensaje)
+    
+    updated_context = {
+        **conversation_context,
+        "stage": "revision_manual_oferta",
+        "oferta_generada": False,
+        "tipo_producto_ofertado": tipo_producto,
+        "monto_ofertado": monto_solicitado,
+        "fecha_revision_manual": datetime.now().isoformat()
+    }
+    
+    return {
+        "success": True,
+        "message": mensaje,
+        "offer_generated": False,
+        "awaiting_response": False,
+        "manual_review": True,
+        "conversation_context": updated_context,
+        "conversation_history": update_conversation_history(conversation_history, message, mensaje),
+        "conversation_mode": "dynamic",
+        "user_id": user_id
+    }
+
+
+def generar_oferta(contexto_analisis, tipo_producto, monto_solicitado, user_id):
+    """
+    Genera el mensaje de oferta desde los parámetros calculados en código.
+    Con OFERTADOR_LLM, el agente ofertador pule la redacción sin cambiar las cifras,
+    salvo que el presupuesto de latencia no alcance o el agente falle.
+    Devuelve None si la oferta no se pudo calcular.
+    """
+    oferta_renderizada = renderizar_oferta(contexto_analisis, tipo_producto, monto_solicitado)
+    if oferta_renderizada is None:
+        return None
+    
+    if OFERTADOR_LLM and presupuesto_holgado():
+        pulido_input = construir_input_pulido_oferta(
+            contexto_analisis, 
+            tipo_producto, 
+            monto_solicitado, 
+            oferta_renderizada
+        )
+        try:
+            return invocar_agente("ofertador", pulido_input, user_id, streaming=True)
+        except Exception as e:
+            logger.warning("Pulido de oferta omitido: %s", e)
+    elif OFERTADOR_LLM:
+        logger.info("Presupuesto de latencia bajo: oferta sin pulido")
+    
+    emitir_evento("token", agent="ofertador", data=oferta_renderizada)
+    return oferta_renderizada
+
+
 def handle_respuesta_oferta(respuesta_usuario, conversation_context, conversation_history, user_id):
     """
     Maneja la respuesta del usuario a una oferta (SÍ/NO)
     Mantiene estado completo sin resetear
     """
-    print(f"[LOG] Procesando respuesta a oferta: {respuesta_usuario[:50]}...")
+    logger.debug("Procesando respuesta a oferta: %.50s...", respuesta_usuario)
     
     # Procesar respuesta usando la utilidad existente
     respuesta_procesada = procesar_respuesta_continuidad(respuesta_usuario)
     decision_usuario = respuesta_procesada["decision"]
     
-    print(f"[LOG] Decisión del usuario: {decision_usuario}")
+    logger.debug("Decisión del usuario: %s", decision_usuario)
     
     # Generar mensaje según la decisión
     if decision_usuario == "SI":
@@ -545,7 +674,7 @@ Por favor responde claramente **SÍ** o **NO**. ¿Cuál es tu decisión?
         conversation_history, respuesta_usuario, mensaje_respuesta
     )
     
-    print(f"[LOG] Respuesta procesada - Decisión: {decision_usuario}, Proceso iniciado: {proceso_iniciado}")
+    logger.info("Respuesta procesada - Decisión: %s, Proceso iniciado: %s", decision_usuario, proceso_iniciado)
     
     return {
         "success": True,
@@ -568,7 +697,7 @@ def handle_conversational_agent(payload, user_id):
     Maneja solicitudes que van al agente conversacional
     VERSIÓN CORREGIDA - Extrae y guarda información del crédito
     """
-    print(f"[LOG] Ejecutando agente conversacional...")
+    logger.debug("Ejecutando agente conversacional...")
     
     message = payload.get("message", "")
     conversation_context = payload.get("conversation_context", {})
@@ -583,37 +712,36 @@ def handle_conversational_agent(payload, user_id):
     if info_credito.get("tipo_credito"):
         updated_context["tipo_credito"] = info_credito["tipo_credito"]
         updated_context["tipo_credito_original"] = info_credito.get("tipo_original", info_credito["tipo_credito"])
-        print(f"[LOG] Tipo de crédito detectado: {info_credito['tipo_credito']}")
+        logger.debug("Tipo de crédito detectado: %s", info_credito["tipo_credito"])
     
     if info_credito.get("monto_solicitado"):
         updated_context["monto_solicitado"] = info_credito["monto_solicitado"]
         updated_context["monto_formato"] = f"${info_credito['monto_solicitado']//1000000}M"
-        print(f"[LOG] Monto detectado: ${info_credito['monto_solicitado']:,}")
+        logger.debug("Monto detectado: $%s", info_credito["monto_solicitado"])
     
     if info_credito.get("proposito"):
         updated_context["proposito"] = info_credito["proposito"]
-        print(f"[LOG] Propósito detectado: {info_credito['proposito']}")
+        logger.debug("Propósito detectado: %s", info_credito["proposito"])
     
     # Marcar si la solicitud está completa
     if info_credito.get("tipo_credito") and info_credito.get("monto_solicitado"):
         updated_context["solicitud_completa"] = True
-        print(f"[LOG] Solicitud completa detectada: {info_credito['tipo_credito']} por ${info_credito['monto_solicitado']:,}")
+        logger.debug("Solicitud completa detectada: %s por $%s", info_credito["tipo_credito"], info_credito["monto_solicitado"])
     
     # Construir input para el agente conversacional con contexto actualizado
     conv_input = build_conversational_input(message, updated_context, conversation_history)
     
-    print(f"[LOG] Contexto enviado al agente: tipo={updated_context.get('tipo_credito')}, monto={updated_context.get('monto_solicitado')}")
+    logger.debug("Contexto enviado al agente: tipo=%s, monto=%s", updated_context.get("tipo_credito"), updated_context.get("monto_solicitado"))
     
     # Llamar al agente conversacional
-    conv_result = conversacional(conv_input)
-    bot_response = conv_result.message['content'][0]['text']
+    bot_response = invocar_agente("conversacional", conv_input, user_id, streaming=True)
     
     # Actualizar contexto y historial conservando toda la información
     final_context, updated_history = update_conversation_data(
         updated_context, conversation_history, message, bot_response
     )
     
-    print(f"[LOG] Agente conversacional completado")
+    logger.debug("Agente conversacional completado")
     
     return {
         "success": True,
@@ -622,6 +750,7 @@ def handle_conversational_agent(payload, user_id):
         "conversation_history": updated_history,
         "conversation_mode": "dynamic",
         "user_id": user_id,
+        "prompt_tokens": estimar_tokens(conv_input),
         # AGREGAR información extraída para debugging
         "extracted_info": {
             "tipo_credito": info_credito.get("tipo_credito"),
@@ -637,37 +766,41 @@ def handle_financial_flow(payload, user_id):
     Maneja el flujo financiero completo (financiero → scoring → buró → resumen/oferta)
     VERSIÓN COMPLETA MEJORADA - Con validación de coherencia y montos realistas
     """
-    print(f"[LOG] Ejecutando flujo financiero completo...")
+    logger.debug("Ejecutando flujo financiero completo...")
     
     financial_data = payload.get("financial_data", {})
     extracted_text = payload.get("extracted_text", "")
     tables = payload.get("tables", [])
     conversation_context = payload.get("conversation_context", {})
+    nit_empresa = conversation_context.get("nit_empresa")
+    
+    # El buró solo depende del NIT y el contexto: arrancarlo ya, en paralelo
+    buro_future = iniciar_analisis_buro(nit_empresa, conversation_context, user_id)
     
     # PASO 1: Agente financiero
-    print(f"[LOG] Paso 1: Análisis financiero...")
+    logger.debug("Paso 1: Análisis financiero...")
     fin_input = build_financial_input(financial_data, extracted_text, tables)
-    fin_result = financiero(fin_input)
-    fin_output = fin_result.message['content'][0]['text']
-    financial_ratios = parse_json(fin_output)
+    financial_ratios = invocar_agente_json("financiero", fin_input, user_id)
     
     if not financial_ratios:
+        if buro_future:
+            buro_future.cancel()
         return handle_insufficient_data(payload, user_id)
     
-    print(f"[LOG] Ratios financieros calculados: {list(financial_ratios.keys()) if financial_ratios else 'Error'}")
+    logger.debug("Ratios financieros calculados: %s", list(financial_ratios) if financial_ratios else "Error")
+    emitir_progreso("ratios", financial_ratios=financial_ratios)
     
     # PASO 2: Agente scoring interno
-    print(f"[LOG] Paso 2: Scoring interno...")
+    logger.debug("Paso 2: Scoring interno...")
     scr_input = build_scoring_input(financial_ratios, financial_data, conversation_context)
-    scr_result = scoring(scr_input)
-    scr_output = scr_result.message['content'][0]['text']
-    scoring_details = parse_json(scr_output)
+    scoring_details = invocar_agente_json("scoring", scr_input, user_id)
     
     score_interno = scoring_details.get("score", 0)
     monto_recomendado_scoring = scoring_details.get("monto_recomendado", 0)
     
-    print(f"[LOG] Score interno calculado: {score_interno}")
-    print(f"[LOG] Monto recomendado por scoring: ${monto_recomendado_scoring:,}" if monto_recomendado_scoring else "[LOG] No se calculó monto en scoring")
+    logger.info("Score interno calculado: %s", score_interno)
+    emitir_progreso("score", score=score_interno, decision=scoring_details.get("decision", "pending"))
+    logger.debug("Monto recomendado por scoring: $%s", monto_recomendado_scoring or "no calculado")
     
     # *** VALIDACIÓN DE COHERENCIA CON MONTO SOLICITADO ***
     monto_solicitado = conversation_context.get("monto_solicitado")
@@ -684,25 +817,22 @@ def handle_financial_flow(payload, user_id):
             conversation_context.get("es_cliente_existente", False)
         )
         
-        print(f"[LOG] Validación coherencia en flujo financiero: {validacion_coherencia}")
+        logger.debug("Validación coherencia en flujo financiero: %s", validacion_coherencia)
         
         # Si la solicitud es muy alta vs la recomendación del scoring
         if monto_recomendado_scoring > 0 and monto_solicitado > (monto_recomendado_scoring * 1.5):
-            print(f"[WARNING] Monto solicitado (${monto_solicitado:,}) muy superior al recomendado por scoring (${monto_recomendado_scoring:,})")
+            logger.warning("Monto solicitado ($%s) muy superior al recomendado por scoring ($%s)", monto_solicitado, monto_recomendado_scoring)
     
     # PASO 3: Agente buró de crédito
-    print(f"[LOG] Paso 3: Análisis de buró...")
-    nit_empresa = conversation_context.get("nit_empresa")
+    logger.debug("Paso 3: Análisis de buró...")
     
     if nit_empresa:
-        buro_input = construir_input_buro(nit_empresa, conversation_context)
-        buro_result = buro(buro_input)
-        buro_output = buro_result.message['content'][0]['text']
-        buro_details = procesar_respuesta_buro(buro_output, nit_empresa)
-        print(f"[LOG] Análisis de buró completado")
+        buro_details = obtener_analisis_buro(buro_future, nit_empresa, conversation_context, user_id)
+        logger.debug("Análisis de buró completado")
+        emitir_progreso("buro", score_buro=buro_details.get("score_buro"), recomendacion_buro=buro_details.get("recomendacion_buro"))
         
         # PASO 4: Combinar análisis interno + buró
-        print(f"[LOG] Paso 4: Combinando análisis...")
+        logger.debug("Paso 4: Combinando análisis...")
         analisis_combinado = combinar_analisis_interno_buro(
             score_interno, 
             buro_details, 
@@ -713,13 +843,14 @@ def handle_financial_flow(payload, user_id):
         score_combinado = analisis_combinado["score_combinado"]
         
     else:
-        print(f"[LOG] Sin NIT disponible, solo análisis interno")
+        logger.info("Sin NIT disponible, solo análisis interno")
         buro_details = None
         decision_final = scoring_details.get("decision", "pending")
         score_combinado = score_interno
         analisis_combinado = None
     
-    print(f"[LOG] Decisión final: {decision_final}, Score combinado: {score_combinado}")
+    logger.info("Decisión final: %s, Score combinado: %s", decision_final, score_combinado)
+    emitir_progreso("decision", decision=normalize_decision(decision_final), score=score_combinado or score_interno)
     
     # PASO 5: Preparar contexto base para la respuesta
     company_name = conversation_context.get("nombre_empresa") or financial_data.get("company_info", {}).get("name", "tu empresa")
@@ -748,7 +879,7 @@ def handle_financial_flow(payload, user_id):
     
     # PASO 6: Decidir si generar oferta o solo resumen
     if decision_final in ["APROBADO", "CONDICIONAL"]:
-        print(f"[LOG] Cliente pre-aprobado, generando oferta...")
+        logger.debug("Cliente pre-aprobado, generando oferta...")
         
         # *** CONSTRUIR INPUT MEJORADO PARA OFERTADOR ***
         contexto_para_oferta = {
@@ -760,16 +891,30 @@ def handle_financial_flow(payload, user_id):
         }
         
         # Generar oferta automáticamente
-        print(f"[LOG] Generando oferta con monto recomendado: ${monto_recomendado_scoring:,}" if monto_recomendado_scoring else "[LOG] Generando oferta sin monto específico del scoring")
+        logger.debug("Generando oferta con monto recomendado: $%s", monto_recomendado_scoring or "sin monto del scoring")
         
-        ofertador_input = construir_input_ofertador(
+        oferta_response = generar_oferta(
             contexto_para_oferta,
             conversation_context.get("tipo_credito", "credito_empresarial"),
-            monto_solicitado
+            monto_solicitado,
+            user_id
         )
         
-        ofertador_result = ofertador(ofertador_input)
-        oferta_response = ofertador_result.message['content'][0]['text']
+        # Sin oferta calculable: revisión manual, sin cifras ni espera de SÍ/NO
+        if oferta_response is None:
+            resultado = oferta_en_revision_manual(
+                payload.get("message", ""),
+                contexto_para_oferta,
+                payload.get("conversation_history", []),
+                conversation_context.get("tipo_credito", "credito_empresarial"),
+                monto_solicitado,
+                user_id
+            )
+            # Como en la ruta con oferta, el flujo de documentos no devuelve historial
+            resultado.pop("conversation_history", None)
+            resultado["decision"] = normalize_decision(decision_final)
+            resultado["score"] = int(score_combinado) if score_combinado else int(score_interno)
+            return resultado
         
         # Contexto final con oferta
         updated_context = {
@@ -805,17 +950,25 @@ def handle_financial_flow(payload, user_id):
     
     else:
         # RECHAZADO - Solo resumen sin oferta
-        print(f"[LOG] Cliente rechazado, generando resumen...")
+        logger.debug("Cliente rechazado, generando resumen...")
         
-        # Resumen conversacional del orquestador para rechazos
-        summary_input = build_financial_summary_input(
-            financial_ratios, scoring_details, buro_details, analisis_combinado, 
-            financial_data, contexto_base, company_name
+        # Resumen conversacional para rechazos (plantilla, u orquestador si RESUMEN_LLM)
+        conversational_summary = generar_resumen_conversacional(
+            "rechazo",
+            {
+                "company_name": company_name,
+                "scoring_details": scoring_details,
+                "buro_details": buro_details,
+                "analisis_combinado": analisis_combinado,
+                "contexto": contexto_base
+            },
+            lambda: build_financial_summary_input(
+                financial_ratios, scoring_details, buro_details, analisis_combinado, 
+                financial_data, contexto_base, company_name
+            ),
+            user_id
         )
         
-        summary_result = orquestador(summary_input)
-        conversational_summary = clean_markdown(summary_result.message['content'][0]['text'])
-        
         # Contexto final sin oferta
         updated_context = {
             **contexto_base
@@ -848,32 +1001,32 @@ def handle_direct_scoring(payload, user_id):
     """
     Maneja scoring directo (sin análisis financiero previo) con buró
     """
-    print(f"[LOG] Ejecutando scoring directo con buró...")
+    logger.debug("Ejecutando scoring directo con buró...")
     
     financial_data = payload.get("financial_data", {})
     extracted_text = payload.get("extracted_text", "")
     tables = payload.get("tables", [])
     conversation_context = payload.get("conversation_context", {})
+    nit_empresa = conversation_context.get("nit_empresa")
+    
+    # El buró no depende del scoring: arrancarlo en paralelo
+    buro_future = iniciar_analisis_buro(nit_empresa, conversation_context, user_id)
     
     # PASO 1: Scoring directo
-    print(f"[LOG] Paso 1: Scoring directo...")
+    logger.debug("Paso 1: Scoring directo...")
     scr_input = build_direct_scoring_input(financial_data, extracted_text, tables)
-    scr_result = scoring(scr_input)
-    scr_output = scr_result.message['content'][0]['text']
-    scoring_details = parse_json(scr_output)
+    scoring_details = invocar_agente_json("scoring", scr_input, user_id)
     
     score_interno = scoring_details.get("score", 0)
-    print(f"[LOG] Score directo calculado: {score_interno}")
+    logger.info("Score directo calculado: %s", score_interno)
+    emitir_progreso("score", score=score_interno, decision=scoring_details.get("decision", "pending"))
     
     # PASO 2: Agente buró de crédito
-    print(f"[LOG] Paso 2: Análisis de buró...")
-    nit_empresa = conversation_context.get("nit_empresa")
+    logger.debug("Paso 2: Análisis de buró...")
     
     if nit_empresa:
-        buro_input = construir_input_buro(nit_empresa, conversation_context)
-        buro_result = buro(buro_input)
-        buro_output = buro_result.message['content'][0]['text']
-        buro_details = procesar_respuesta_buro(buro_output, nit_empresa)
+        buro_details = obtener_analisis_buro(buro_future, nit_empresa, conversation_context, user_id)
+        emitir_progreso("buro", score_buro=buro_details.get("score_buro"), recomendacion_buro=buro_details.get("recomendacion_buro"))
         
         # PASO 3: Combinar análisis
         analisis_combinado = combinar_analisis_interno_buro(
@@ -890,28 +1043,27 @@ def handle_direct_scoring(payload, user_id):
         score_combinado = score_interno
         analisis_combinado = None
     
-    print(f"[LOG] Decisión combinada: {decision_final}")
+    logger.info("Decisión combinada: %s", decision_final)
+    emitir_progreso("decision", decision=normalize_decision(decision_final), score=score_combinado or score_interno)
     
-    # Resumen conversacional del orquestador
+    # Resumen conversacional (plantilla, u orquestador si RESUMEN_LLM)
     company_name = conversation_context.get("nombre_empresa") or financial_data.get("company_info", {}).get("name", "tu empresa")
     
-    summary_input = f"""
-GENERAR RESUMEN CONVERSACIONAL FINAL:
-
-Empresa evaluada: {company_name}
-Resultado del scoring directo: {json.dumps(scoring_details, indent=2)}
-Análisis de buró: {json.dumps(buro_details, indent=2) if buro_details else "No disponible"}
-Análisis combinado: {json.dumps(analisis_combinado, indent=2) if analisis_combinado else "Solo análisis interno"}
-Contexto conversacional: {json.dumps(conversation_context, indent=2)}
-
-Presenta estos resultados de forma conversacional natural, como un asesor crediticio experto.
-Incluye la decisión, factores clave, y próximos pasos recomendados.
-Si hay información de buró, inclúyela de forma natural.
-NO uses formato JSON, responde en texto natural.
-"""
-    
-    summary_result = orquestador(summary_input)
-    conversational_summary = clean_markdown(summary_result.message['content'][0]['text'])
+    conversational_summary = generar_resumen_conversacional(
+        "scoring_directo",
+        {
+            "company_name": company_name,
+            "scoring_details": scoring_details,
+            "buro_details": buro_details,
+            "analisis_combinado": analisis_combinado,
+            "contexto": conversation_context,
+            "decision_final": decision_final
+        },
+        lambda: build_direct_scoring_summary_input(
+            company_name, scoring_details, buro_details, analisis_combinado, conversation_context
+        ),
+        user_id
+    )
     
     updated_context = {
         **conversation_context,
@@ -946,29 +1098,167 @@ NO uses formato JSON, responde en texto natural.
     }
 
 
+def reevaluar_cliente(nit, estados=None, user_id=None):
+    """
+    Reevaluación de un cliente de la cartera: verificación contra la base interna,
+    buró actualizado y combinación con el score interno (ver utils.cartera_utils)
+
+    Con estados financieros (dict con financial_data, tables y extracted_text, como un
+    payload de documento) el score interno se recalcula con financiero + scoring; si no,
+    se usa el score histórico del cliente. Cada NIT corre en su propio ámbito de
+    consultas, presupuesto de latencia y logs, como una solicitud.
+    """
+    user_id = user_id or "cartera"
+    with contexto_log(request_id=f"cartera-{nit}", user_id=user_id), contexto_consultas(), \
+            contexto_presupuesto(PRESUPUESTO_SOLICITUD_SEGUNDOS), \
+            medir_etapa("reevaluacion", con_estados=bool(estados)) as atributos:
+        nit_valido, mensaje_validacion = validar_formato_nit(nit)
+        if not nit_valido:
+            atributos["success"] = False
+            return {"nit": nit, "estado": "nit_invalido", "error": mensaje_validacion}
+        
+        # PASO 1: Verificación contra la base interna (sin agente: no hay conversación)
+        cliente = consultar_cliente(nit)
+        if not cliente.get("es_cliente"):
+            return {"nit": nit, "estado": "no_cliente", "nombre_empresa": cliente.get("nombre")}
+        
+        contexto = {
+            "nit_empresa": nit,
+            "nombre_empresa": cliente.get("nombre"),
+            "es_cliente_existente": True,
+            "sector": cliente.get("sector", "general"),
+            "score_interno": cliente.get("score_interno_historico"),
+            "clasificacion_riesgo": cliente.get("clasificacion_riesgo")
+        }
+        score_interno = cliente.get("score_interno_historico", 0)
+        clasificacion_interna = cliente.get("clasificacion_riesgo")
+        financial_ratios = None
+        scoring_details = None
+        
+        # PASO 2: Score interno actualizado si hay estados financieros
+        if estados:
+            financial_data = estados.get("financial_data", {})
+            fin_input = build_financial_input(financial_data, estados.get("extracted_text", ""), estados.get("tables", []))
+            financial_ratios = invocar_agente_json("financiero", fin_input, user_id)
+            if financial_ratios:
+                scoring_details = invocar_agente_json("scoring", build_scoring_input(financial_ratios, financial_data, contexto), user_id)
+            if scoring_details and scoring_details.get("score"):
+                score_interno = scoring_details["score"]
+                clasificacion_interna = scoring_details.get("decision", clasificacion_interna)
+        
+        # PASO 3: Buró actualizado y combinación
+        buro_details = analizar_buro(nit, contexto, user_id)
+        analisis_combinado = combinar_analisis_interno_buro(score_interno, buro_details, clasificacion_interna)
+        
+        logger.info("Reevaluación %s: %s, score combinado %s", nit, analisis_combinado["decision_final"], analisis_combinado["score_combinado"])
+        
+        return {
+            "nit": nit,
+            "estado": "ok",
+            "nombre_empresa": cliente.get("nombre"),
+            "sector": cliente.get("sector"),
+            "clasificacion_riesgo": cliente.get("clasificacion_riesgo"),
+            "score_interno": score_interno,
+            "fuente_score_interno": "estados_financieros" if scoring_details else "historico",
+            "score_buro": buro_details.get("score_buro"),
+            "recomendacion_buro": buro_details.get("recomendacion_buro"),
+            "score_combinado": analisis_combinado["score_combinado"],
+            "decision_final": analisis_combinado["decision_final"],
+            "decision": normalize_decision(analisis_combinado["decision_final"]),
+            "alertas_criticas": analisis_combinado.get("alertas_criticas", []),
+            "detalles": {
+                "financiero": financial_ratios,
+                "scoring": scoring_details,
+                "buro": buro_details,
+                "combinado": analisis_combinado
+            }
+        }
+
+
+def generar_resumen_conversacional(plantilla, datos, construir_input_llm, user_id):
+    """
+    Genera el resumen para el usuario con la plantilla indicada, sin llamada al modelo.
+    Con RESUMEN_LLM el orquestador redacta el resumen a partir de construir_input_llm(),
+    salvo que el presupuesto de latencia no alcance o el agente falle.
+    """
+    if RESUMEN_LLM and presupuesto_holgado():
+        try:
+            return clean_markdown(invocar_agente("orquestador", construir_input_llm(), user_id, streaming=True))
+        except Exception as e:
+            logger.warning("Resumen con LLM omitido: %s", e)
+    elif RESUMEN_LLM:
+        logger.info("Presupuesto de latencia bajo: resumen con plantilla")
+    
+    resumen = generar_resumen(plantilla, **datos)
+    emitir_evento("token", agent="resumen", data=resumen)
+    return resumen
+
+
+def invocar_agente_json(nombre, prompt, user_id=None):
+    """
+    Respuesta JSON del agente como dict: salida estructurada si está disponible,
+    si no texto + parse_json con el esquema del agente (None si no hay JSON válido)
+    """
+    resultado = invocar_agente_estructurado(nombre, prompt, user_id)
+    if resultado is None:
+        resultado = parse_json(invocar_agente(nombre, prompt, user_id), esquema=nombre)
+    registrar_parseo(nombre, resultado is not None)
+    return resultado
+
+
+def analizar_buro(nit_empresa, conversation_context, user_id=None):
+    """
+    Consulta el agente de buró y devuelve su análisis estructurado
+    """
+    buro_input = construir_input_buro(nit_empresa, conversation_context)
+    buro_output = invocar_agente_estructurado("buro", buro_input, user_id)
+    if buro_output is None:
+        buro_output = invocar_agente("buro", buro_input, user_id)
+    return procesar_respuesta_buro(buro_output, nit_empresa)
+
+
+def iniciar_analisis_buro(nit_empresa, conversation_context, user_id=None):
+    """
+    Lanza el análisis de buró en segundo plano si hay NIT y el modo concurrente está activo
+    """
+    if not nit_empresa or not BURO_CONCURRENTE:
+        return None
+    
+    logger.debug("Iniciando análisis de buró en paralelo...")
+    # Propagar el contexto de la solicitud (streaming, etc.) al hilo del buró
+    contexto = contextvars.copy_context()
+    return buro_executor.submit(contexto.run, analizar_buro, nit_empresa, conversation_context, user_id)
+
+
+def obtener_analisis_buro(buro_future, nit_empresa, conversation_context, user_id=None):
+    """
+    Espera el análisis de buró lanzado en paralelo, o lo ejecuta en línea si no se lanzó
+    """
+    if buro_future is None:
+        return analizar_buro(nit_empresa, conversation_context, user_id)
+    
+    # Los errores del hilo se propagan igual que en la ejecución secuencial
+    return buro_future.result()
+
+
 def handle_insufficient_data(payload, user_id):
     """
     Maneja casos con datos insuficientes
     """
-    print(f"[LOG] Datos insuficientes - usando orquestador para respuesta")
+    logger.info("Datos insuficientes - generando respuesta")
     
     financial_data = payload.get("financial_data", {})
-    extracted_text = payload.get("extracted_text", "")
     conversation_context = payload.get("conversation_context", {})
     
-    insufficient_input = f"""
-GENERAR RESPUESTA PARA DATOS INSUFICIENTES:
-
-Contexto: No se pudieron extraer datos financieros suficientes para evaluación
-Datos disponibles: {json.dumps(financial_data.get('extraction_summary', {}), indent=2)}
-Contexto conversacional: {json.dumps(conversation_context, indent=2)}
-
-Explica de forma conversacional y empática que no hay suficientes datos, 
-qué documentos se necesitan, y cómo proceder.
-"""
-    
-    insufficient_result = orquestador(insufficient_input)
-    response_message = clean_markdown(insufficient_result.message['content'][0]['text'])
+    response_message = generar_resumen_conversacional(
+        "datos_insuficientes",
+        {
+            "financial_data": financial_data,
+            "contexto": conversation_context
+        },
+        lambda: build_insufficient_data_input(financial_data, conversation_context),
+        user_id
+    )
     
     return {
         "success": True,
@@ -981,31 +1271,15 @@ qué documentos se necesitan, y cómo proceder.
     }
 
 
-def update_conversation_history(history, user_message, bot_response):
+def update_conversation_history(history, user_message, bot_response, agent=None):
     """
-    Actualiza solo el historial de conversación
+    Actualiza solo el historial de conversación (ventana por presupuesto de tokens;
+    los mensajes desalojados pasan al resumen acumulado)
+
+    Cada entrada lleva timestamp UTC real, marca monotónica y secuencia; la del bot
+    además el agente, la latencia del turno y el uso de tokens de sus llamadas al modelo.
     """
-    updated_history = history.copy() if history else []
-    
-    # Agregar nuevos mensajes
-    updated_history.extend([
-        {
-            "sender": "user",
-            "message": user_message,
-            "timestamp": "2024-01-01T00:00:00Z"
-        },
-        {
-            "sender": "bot", 
-            "message": bot_response,
-            "timestamp": "2024-01-01T00:00:01Z"
-        }
-    ])
-    
-    # Mantener solo últimos 20 mensajes
-    if len(updated_history) > 20:
-        updated_history = updated_history[-20:]
-    
-    return updated_history
+    return agregar_mensajes(history, crear_entradas_turno(history, user_message, bot_response, agent))
 
 
 # FUNCIONES AUXILIARES
@@ -1048,21 +1322,21 @@ CONTEXTO DE LA CONVERSACIÓN:
 - Esperando respuesta del cliente (SÍ/NO)
 """
 
-    history_section = ""
-    if history and len(history) > 0:
-        recent_messages = history[-6:]
-        history_section = "\nHISTORIAL RECIENTE:\n"
-        for msg in recent_messages:
-            sender = "Usuario" if msg.get('sender') == 'user' else "CreditBot"
-            message_text = msg.get('message', '')[:200]
-            history_section += f"{sender}: {message_text}\n"
+    # Hechos clave, resumen y mensajes recientes dentro del presupuesto de tokens
+    history_section, costo_historial = construir_seccion_historial(history, context)
 
-    return f"""{context_section}{history_section}
+    conv_input = f"""{context_section}{history_section}
 MENSAJE ACTUAL DEL USUARIO:
 {message}
 
 Responde de forma natural y conversacional como un asesor crediticio experto.
 """
+    registrar_costo_turno(
+        "conversacional",
+        {"contexto": estimar_tokens(context_section), **costo_historial, "mensaje": estimar_tokens(message)},
+        estimar_tokens(conv_input)
+    )
+    return conv_input
 
 
 def build_financial_summary_input(financial_ratios, scoring_details, buro_details, analisis_combinado, financial_data, conversation_context, company_name):
@@ -1105,9 +1379,42 @@ La respuesta debe ser conversacional, transparente sobre el proceso dual, pero s
     return input_base
 
 
+def build_direct_scoring_summary_input(company_name, scoring_details, buro_details, analisis_combinado, conversation_context):
+    """Construye input para el resumen conversacional del scoring directo (modo LLM)"""
+    return f"""
+GENERAR RESUMEN CONVERSACIONAL FINAL:
+
+Empresa evaluada: {company_name}
+Resultado del scoring directo: {json.dumps(scoring_details, indent=2)}
+Análisis de buró: {json.dumps(buro_details, indent=2) if buro_details else "No disponible"}
+Análisis combinado: {json.dumps(analisis_combinado, indent=2) if analisis_combinado else "Solo análisis interno"}
+Contexto conversacional: {json.dumps(conversation_context, indent=2)}
+
+Presenta estos resultados de forma conversacional natural, como un asesor crediticio experto.
+Incluye la decisión, factores clave, y próximos pasos recomendados.
+Si hay información de buró, inclúyela de forma natural.
+NO uses formato JSON, responde en texto natural.
+"""
+
+
+def build_insufficient_data_input(financial_data, conversation_context):
+    """Construye input para la respuesta de datos insuficientes (modo LLM)"""
+    return f"""
+GENERAR RESPUESTA PARA DATOS INSUFICIENTES:
+
+Contexto: No se pudieron extraer datos financieros suficientes para evaluación
+Datos disponibles: {json.dumps(financial_data.get('extraction_summary', {}), indent=2)}
+Contexto conversacional: {json.dumps(conversation_context, indent=2)}
+
+Explica de forma conversacional y empática que no hay suficientes datos, 
+qué documentos se necesitan, y cómo proceder.
+"""
+
+
 def build_financial_input(financial_data, extracted_text, tables):
     """Construye input para el agente financiero"""
-    fin_input = f"""
+    if not PROMPT_COMPACTO:
+        return f"""
 Analiza los siguientes datos financieros extraídos con Textract:
 
 DATOS ESTRUCTURADOS:
@@ -1119,6 +1426,29 @@ TEXTO EXTRAÍDO:
 TABLAS FINANCIERAS:
 {json.dumps(tables, indent=2)}
 
+Calcula los ratios financieros según las instrucciones del sistema.
+"""
+
+    secciones = compactar_documento(
+        financial_data, extracted_text, tables,
+        formato=FORMATO_TABLAS_PROMPT,
+        max_tokens_texto=PRESUPUESTO_TOKENS_TEXTO,
+        max_tokens_tablas=PRESUPUESTO_TOKENS_TABLAS,
+        max_tokens_datos=PRESUPUESTO_TOKENS_DATOS,
+        nombre_reporte="financiero" if REPORTE_COMPACTACION else None
+    )
+    fin_input = f"""
+Analiza los siguientes datos financieros extraídos con Textract:
+
+DATOS ESTRUCTURADOS:
+{secciones["datos"]}
+
+TEXTO EXTRAÍDO (sin las cifras ya incluidas en las tablas):
+{secciones["texto"]}
+
+TABLAS FINANCIERAS:
+{secciones["tablas"]}
+
 Calcula los ratios financieros según las instrucciones del sistema.
 """
     return fin_input
@@ -1173,7 +1503,8 @@ Recuerda: NO uses $5,000,000,000 - calcula montos reales basados en capacidad de
 
 def build_direct_scoring_input(financial_data, extracted_text, tables):
     """Construye input para scoring directo"""
-    scr_input = f"""
+    if not PROMPT_COMPACTO:
+        return f"""
 Evalúa directamente los siguientes datos financieros:
 
 DATOS EXTRAÍDOS:
@@ -1185,6 +1516,32 @@ TEXTO DEL DOCUMENTO:
 TABLAS:
 {json.dumps(tables[:5], indent=2)}
 
+Calcula ratios y asigna puntaje crediticio.
+"""
+
+    # Mismo alcance que la versión original: 2000 caracteres de texto y 5 tablas
+    texto_original = (extracted_text or "")[:2000]
+    tablas_originales = (tables or [])[:5]
+    secciones = compactar_documento(
+        financial_data, texto_original, tablas_originales,
+        formato=FORMATO_TABLAS_PROMPT,
+        max_tokens_texto=PRESUPUESTO_TOKENS_TEXTO,
+        max_tokens_tablas=PRESUPUESTO_TOKENS_TABLAS,
+        max_tokens_datos=PRESUPUESTO_TOKENS_DATOS,
+        nombre_reporte="scoring_directo" if REPORTE_COMPACTACION else None
+    )
+    scr_input = f"""
+Evalúa directamente los siguientes datos financieros:
+
+DATOS EXTRAÍDOS:
+{secciones["datos"]}
+
+TEXTO DEL DOCUMENTO:
+{secciones["texto"]}
+
+TABLAS:
+{secciones["tablas"]}
+
 Calcula ratios y asigna puntaje crediticio.
 """
     return scr_input
@@ -1208,52 +1565,17 @@ def update_conversation_data(context, history, user_message, bot_response):
 def extract_user_info(user_message):
     """Extrae información relevante del mensaje del usuario"""
     info = {}
-    message_lower = user_message.lower()
-    
-    # Detectar nombre de empresa
-    import re
-    company_patterns = [
-        r"empresa\s+([A-Za-z][A-Za-z\s&.,]+?)(?:\s|$|,)",
-        r"compañía\s+([A-Za-z][A-Za-z\s&.,]+?)(?:\s|$|,)",
-        r"([A-Za-z][A-Za-z\s&.,]*?)\s+(?:s\.a\.s\.|sas|ltda|s\.a\.|sa)(?:\s|$|,)"
-    ]
-    
-    for pattern in company_patterns:
-        match = re.search(pattern, user_message, re.IGNORECASE)
-        if match:
-            info["company_name"] = match.group(1).strip()
-            break
-    
-    # Detectar sector empresarial
-    sectors_map = {
-        "construcción": ["construcción", "construc", "obra", "inmobiliaria", "constructor"],
-        "comercio": ["comercio", "ventas", "retail", "tienda", "almacén"],
-        "servicios": ["servicios", "consultoría", "asesoría", "consulting"],
-        "manufactura": ["manufactura", "producción", "fábrica", "industrial", "manufactur"],
-        "tecnología": ["tecnología", "software", "desarrollo", "IT", "tech"],
-        "salud": ["salud", "médico", "clínica", "hospital", "farmac"],
-        "transporte": ["transporte", "logística", "carga", "fletes"],
-        "agricultura": ["agricultura", "agrícola", "campo", "agro", "cultivo"]
-    }
-    
-    for sector, keywords in sectors_map.items():
-        if any(keyword in message_lower for keyword in keywords):
-            info["sector"] = sector
-            break
-    
-    # Detectar años de operación
-    years_match = re.search(r"(\d+)\s+años", message_lower)
-    if years_match:
-        info["years_operating"] = int(years_match.group(1))
-    
-    # Detectar etapa de conversación
-    if any(word in message_lower for word in ["documentos", "subir", "pdf", "archivo"]):
-        info["stage"] = "document_upload"
-    elif any(word in message_lower for word in ["monto", "cuánto", "cantidad", "simulación"]):
-        info["stage"] = "amount_inquiry"
-    elif any(word in message_lower for word in ["siguiente", "pasos", "formalizar", "firmar"]):
-        info["stage"] = "formalization"
-    
+    features = extraer_features_mensaje(user_message)
+
+    if features.company_name:
+        info["company_name"] = features.company_name
+    if features.sector:
+        info["sector"] = features.sector
+    if features.years_operating is not None:
+        info["years_operating"] = features.years_operating
+    if features.stage:
+        info["stage"] = features.stage
+
     return info
 
 
@@ -1261,17 +1583,9 @@ def extraer_tipo_producto(mensaje, contexto):
     """
     Extrae el tipo de producto crediticio del mensaje o contexto
     """
-    mensaje_lower = mensaje.lower()
-    
-    # Detectar tipos específicos en el mensaje
-    if any(word in mensaje_lower for word in ["hipotecario", "hipoteca", "inmueble", "local", "oficina"]):
-        return "hipotecario_comercial"
-    elif any(word in mensaje_lower for word in ["rotativo", "rotativa", "línea", "linea", "flexible"]):
-        return "linea_credito_rotativa"  
-    elif any(word in mensaje_lower for word in ["factoring", "cartera", "cuentas por cobrar", "descuento"]):
-        return "factoring"
-    elif any(word in mensaje_lower for word in ["empresarial", "comercial", "capital", "expansion", "inversion"]):
-        return "credito_empresarial"
+    tipo_producto = extraer_features_mensaje(mensaje).tipo_producto
+    if tipo_producto:
+        return tipo_producto
     
     # Si no se detecta tipo específico, usar contexto
     sector = contexto.get("sector", "")
@@ -1287,37 +1601,7 @@ def extraer_monto_solicitado(mensaje):
     """
     Extrae el monto solicitado del mensaje usando regex
     """
-    import re
-    
-    # Patrones para detectar montos
-    patrones_monto = [
-        r'(\d{1,3}(?:\.\d{3})*(?:\.\d{3})*)\s*(?:millones?|mill?)',  # 500 millones
-        r'\$\s*(\d{1,3}(?:\.\d{3})*(?:\.\d{3})*)\s*(?:millones?|mill?)',  # $500 millones
-        r'(\d{1,3}(?:\,\d{3})*(?:\,\d{3})*)\s*(?:millones?|mill?)',  # 500,000 millones (formato US)
-        r'\$\s*(\d{1,3}(?:\,\d{3})*(?:\,\d{3})*)\s*(?:COP|cop|pesos?)?',  # $500,000,000
-        r'(\d{1,3}(?:\.\d{3})*)\s*(?:mil millones?)',  # 5 mil millones
-    ]
-    
-    for patron in patrones_monto:
-        match = re.search(patron, mensaje, re.IGNORECASE)
-        if match:
-            numero_str = match.group(1).replace('.', '').replace(',', '')
-            try:
-                numero = int(numero_str)
-                
-                # Ajustar según el patrón encontrado
-                if 'millones' in match.group(0).lower():
-                    if 'mil millones' in match.group(0).lower():
-                        return numero * 1000000000  # mil millones
-                    else:
-                        return numero * 1000000  # millones normales
-                else:
-                    return numero  # Número directo en pesos
-                    
-            except ValueError:
-                continue
-    
-    return None  # No se encontró monto específico
+    return extraer_features_mensaje(mensaje).monto_pesos
 
 
 def normalize_decision(decision):
@@ -0,0 +1,69 @@
+# reevaluacion_cartera.py
+# Reevaluación mensual de la cartera: verificación → buró → combinación para cada NIT,
+# en paralelo, con salida JSONL reanudable (ver demo-agentcore/utils/cartera_utils.py)
+#
+# Uso:
+#   python reevaluacion_cartera.py --todos-clientes --salida cartera/2026-10.jsonl
+#   python reevaluacion_cartera.py --nits nits.csv --estados estados/ --workers 32 \
+#       --salida cartera/2026-10.jsonl --parquet cartera/2026-10.parquet
+#
+# Si se interrumpe (Ctrl+C), volver a ejecutar el mismo comando continúa donde quedó.
+
+import argparse
+import os
+import signal
+import sys
+import threading
+
+# Los módulos del sistema viven en demo-agentcore/ (el utils.py de la raíz es el legado)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "demo-agentcore"))
+
+from config import CARTERA_MAX_WORKERS
+from entrypoint import reevaluar_cliente
+from data.clientes_bd import nits_clientes_activos
+from utils.cartera_utils import cargar_nits, reevaluar_cartera, exportar_parquet
+
+
+def principal():
+    parser = argparse.ArgumentParser(description="Reevaluación masiva de la cartera con buró actualizado")
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument("--nits", help="Archivo de NITs (.csv con columna nit, .jsonl o uno por línea)")
+    origen.add_argument("--todos-clientes", action="store_true", help="Todos los clientes con es_cliente=True")
+    parser.add_argument("--estados", help="Directorio con estados financieros <nit>.json (opcional)")
+    parser.add_argument("--salida", required=True, help="Archivo JSONL de resultados (también es el checkpoint)")
+    parser.add_argument("--parquet", help="Exportar además los resultados consolidados a Parquet")
+    parser.add_argument("--workers", type=int, default=CARTERA_MAX_WORKERS)
+    parser.add_argument("--sin-reanudar", action="store_true", help="Evaluar todos los NITs aunque ya estén en la salida")
+    args = parser.parse_args()
+
+    nits = nits_clientes_activos() if args.todos_clientes else cargar_nits(args.nits)
+
+    # Ctrl+C: dejar de lanzar NITs y esperar los que están en vuelo
+    detener = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: detener.set())
+    signal.signal(signal.SIGTERM, lambda *_: detener.set())
+
+    resumen = reevaluar_cartera(
+        nits,
+        lambda nit, estados: reevaluar_cliente(nit, estados, user_id="cartera"),
+        args.salida,
+        directorio_estados=args.estados,
+        max_workers=args.workers,
+        reanudar=not args.sin_reanudar,
+        detener=detener
+    )
+
+    print(f"[LOG] {resumen['evaluados']} NITs evaluados en {resumen['duracion_segundos']}s "
+          f"({resumen['nits_por_segundo']} NIT/s), {resumen['omitidos']} omitidos: {resumen['por_estado']}")
+    if resumen["interrumpida"]:
+        print("[WARNING] Corrida interrumpida: ejecutar el mismo comando para continuar")
+        return 1
+
+    if args.parquet:
+        filas = exportar_parquet(args.salida, args.parquet)
+        print(f"[LOG] {filas} NITs exportados a {args.parquet}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(principal())